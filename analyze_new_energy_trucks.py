@@ -6,60 +6,310 @@
 
 import pandas as pd
 import numpy as np
+from functools import partial
 from pathlib import Path
 from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
 
+from data_io import map_weeks, read_detail_csv
+from data_schema import new_energy_truck
+from kpi_cube import ROW_COUNT, build_cube, rollup, stack_cubes, weekly_series
+from kpi_grading import load_grader
+from report_templates import render_sections
+from run_metrics import RunRecorder, measure_call
+from segment_index import read_segment
+
 # 分析配置
 START_WEEK = 28
 END_WEEK = 43
 DATA_FOLDER = "2025年保单"
 OUTPUT_FOLDER = "周报"
+LOAD_WORKERS = 1    # 并行加载进程数 (1 = 串行)
+TRUCK_CUBE_DIMENSIONS = ['third_level_organization', 'business_type_category']
+CACHE_FOLDER = ".cache"
+ENABLE_DATA_CACHE = True    # 启用列式缓存与分段索引 (关闭时分块筛选读取)
+ENABLE_METRICS_TABLE = False    # 控制台实时打印各阶段耗时/内存表
+
+# 立即行动建议 (按最新赔付率档位)
+IMMEDIATE_ACTIONS = {
+    'high_risk': [
+        "1. **暂停高风险机构新单承保**：对赔付率超过80%的机构立即暂停新单自动核保",
+        "2. **启动大案调查**：调取最近4周案均赔款超过5万元的所有案件进行复核",
+        "3. **紧急风险评估**：召集风控、核保、理赔部门紧急会议，评估业务持续性",
+    ],
+    'warning': [
+        "1. **加强核保审核**：提高高风险机构的人工审核比例至100%",
+        "2. **理赔审核升级**：5000元以上案件需二次核定",
+        "3. **客户资质复查**：对车队客户进行运营资质和车况复查",
+    ],
+    'stable': [
+        "1. **持续监控**：保持现有风控策略，密切监控关键指标变化",
+        "2. **数据跟踪**：每周更新趋势分析，及时发现异常",
+    ],
+}
+
+# 报告模板 (各章节独立渲染后顺序拼接)
+REPORT_TEMPLATES = {
+    'summary': """# 2025保单新能源货车专项分析报告
+## 分析周期：第{start_week}周 至 第{end_week}周
+
+---
+
+## 一、执行摘要
+
+### 核心结论
+新能源货车业务{status_phrase}，最新周次（第{latest_week}周）赔付率{ratio_verb}**{kpi[赔付率(%)]}%**，业务规模为**{kpi[签单保费(万元)]}万元**，累计承保**{kpi[保单件数]}件**保单。
+
+### 关键指标（第{latest_week}周累计值）
+
+| 指标 | 数值 | 状态 |
+|------|------|------|
+| 签单保费 | {kpi[签单保费(万元)]:.2f}万元 | - |
+| 满期保费 | {kpi[满期保费(万元)]:.2f}万元 | - |
+| 保单件数 | {kpi[保单件数]:,}件 | - |
+| 赔付率 | {kpi[赔付率(%)]}% | {status[loss_ratio]} |
+| 费用率 | {kpi[费用率(%)]}% | {status[expense_ratio]} |
+| 边际贡献率 | {kpi[边际贡献率(%)]}% | {status[contribution_margin_ratio]} |
+| 出险率 | {kpi[出险率(%)]}% | {status[matured_claim_ratio]} |
+| 案均赔款 | {kpi[案均赔款(元)]:,.0f}元 | - |
+| 单均保费 | {kpi[单均保费(元)]:,.0f}元 | - |
+
+---
+
+""",
+
+    'trend': """## 二、趋势分析
+
+### 分析周期表现
+分析周期：第{start_week}周 - 第{end_week}周，共{week_count}周
+
+{% if trend[insights] %}
+### 核心发现
+
+{% for insight in trend[insights] %}
+- {insight}
+{% endfor %}
+
+{% endif %}
+### 统计指标
+
+- 平均赔付率: {trend[loss_ratio_avg]}%
+- 赔付率标准差: {trend[loss_ratio_std]}
+- 赔付率变化: {trend[loss_ratio_change]:+.2f}个百分点
+- 保费增长率: {trend[premium_growth_rate]:+.2f}%
+
+### 各周详细指标
+
+| 周次 | 签单保费(万) | 保单件数 | 赔付率(%) | 出险率(%) | 案均赔款(元) | 边际贡献率(%) |
+|------|-------------|----------|-----------|-----------|-------------|---------------|
+{% for kpi in weekly %}
+| 第{kpi[周次]}周 | {kpi[签单保费(万元)]:.2f} | {kpi[保单件数]:,} | {kpi[赔付率(%)]} | {kpi[出险率(%)]} | {kpi[案均赔款(元)]:,.0f} | {kpi[边际贡献率(%)]} |
+{% endfor %}
+
+---
+
+""",
+
+    'problem_weeks': """## 三、异常周次识别
+
+{% if problem_weeks %}
+以下周次存在异常指标，需要重点关注：
+
+{% for problem in problem_weeks %}
+### 第{problem[周次]}周
+- **问题**: {problem[问题]}
+- 赔付率: {problem[赔付率]}%
+- 案均赔款: {problem[案均赔款]:,.0f}元
+
+{% endfor %}
+{% else %}
+✅ 未发现明显异常周次
+
+{% endif %}
+---
+
+""",
+
+    'regional': """## 四、区域表现分析
+
+### 各机构业务表现（按赔付率降序）
+
+| 机构 | 签单保费(万) | 保单件数 | 赔付率(%) | 出险率(%) | 案均赔款(元) | 风险等级 |
+|------|-------------|----------|-----------|-----------|-------------|----------|
+{% for region in regions %}
+| {region[机构]} | {region[签单保费(万元)]:.2f} | {region[保单件数]:,} | {region[赔付率(%)]} | {region[出险率(%)]} | {region[案均赔款(元)]:,.0f} | {region[风险等级]} |
+{% endfor %}
+
+{% if high_risk_orgs %}
+### ⚠️ 高风险机构（赔付率>80%）
+
+共有**{high_risk_count}个机构**需要重点关注：
+
+{% for org in high_risk_orgs %}
+- **{org[机构]}**: 赔付率{org[赔付率(%)]}%, 保费规模{org[签单保费(万元)]:.2f}万元
+{% endfor %}
+
+{% endif %}
+---
+
+""",
+
+    'business': """{% if businesses %}
+## 五、货车类型分析
+
+| 业务类型 | 签单保费(万) | 保单件数 | 赔付率(%) |
+|----------|-------------|----------|----------|
+{% for biz in businesses %}
+| {biz[业务类型]} | {biz[签单保费(万元)]:.2f} | {biz[保单件数]:,} | {biz[赔付率(%)]} |
+{% endfor %}
+
+---
+
+{% endif %}
+""",
+
+    'recommendations': """## 六、战略建议与行动计划
+
+### 🚨 立即行动（24小时内）
+
+{% for action in immediate_actions %}
+{action}
+{% endfor %}
+
+### ⏰ 本周内完成（7天）
+
+1. **问题机构专项复盘**：对高赔付率机构进行业务质量专项调查
+2. **费率充足性评估**：重新评估新能源货车费率水平，考虑调整
+3. **客户分层管理**：建立客户风险分级体系，差异化承保策略
+4. **理赔数据分析**：分析高赔付案件特征，识别共性风险因素
+
+### 📊 中期优化（1个月内）
+
+1. **定价模型优化**：基于累计数据优化新能源货车定价模型
+2. **风控规则升级**：建立新能源货车专项风控规则库
+3. **客户筛选机制**：完善客户准入标准，提高业务质量
+4. **区域策略调整**：根据各地表现制定差异化区域策略
+
+### 🎯 长期战略（3个月内）
+
+1. **数据能力建设**：接入车辆运行数据（BMS、GPS等），实现动态定价
+2. **合作伙伴开发**：寻找优质车队客户，建立长期合作关系
+3. **产品创新**：开发适配新能源货车特点的创新保险产品
+4. **服务生态构建**：打造充电、维修、救援一体化服务生态
+
+---
+
+""",
+
+    'appendix': """## 附录：分析说明
+
+### 数据来源
+- 数据源：2025年保单变动成本明细表
+- 分析周期：第{start_week}周 - 第{end_week}周
+- 筛选条件：is_new_energy_vehicle = True 且 business_type_category 包含"货车"
+- 统计口径：累计值（非当周发生值）
+
+### 关键指标定义
+- **赔付率** = 已报告赔款 / 满期保费 × 100%
+- **费用率** = 费用总额 / 签单保费 × 100%
+- **边际贡献率** = 100% - 赔付率 - 费用率
+- **出险率** = 赔案件数 / 保单件数 × 100%
+- **案均赔款** = 已报告赔款 / 赔案件数
+- **单均保费** = 签单保费 / 保单件数
+
+### 风险等级标准
+{% for line in risk_legend %}
+- {line}
+{% endfor %}
+
+---
+
+*报告生成时间：{generated_at}*
+*分析工具：新能源货车专项分析器 v1.0*
+""",
+}
+
+def _load_truck_week(week, data_folder, cache_folder=None):
+    """读取单周明细并筛选新能源货车 (模块级函数, 供进程池调用)
+
+    cache_folder 不为空时经分段索引取数, 否则分块读取时筛选。
+    仅返回按机构×业务类型预聚合的立方体, 明细不跨周驻留内存。
+    返回 (状态, 数据): ok/empty/error/missing
+    """
+    file_pattern = f"2025保单第{week}周变动成本明细表.csv"
+    file_path = Path(data_folder) / file_pattern
+
+    if not file_path.exists():
+        return 'missing', None
+
+    try:
+        # 筛选新能源货车数据
+        # is_new_energy_vehicle = True 且 business_type_category 包含"货车"
+        if cache_folder:
+            truck_df = read_segment(file_path, cache_folder, is_new_energy_vehicle=True, is_truck=True)
+        else:
+            truck_df = read_detail_csv(file_path, predicates=(new_energy_truck,))
+    except Exception as e:
+        return 'error', str(e)
+
+    if len(truck_df) == 0:
+        return 'empty', None
+
+    return 'ok', build_cube(truck_df, TRUCK_CUBE_DIMENSIONS)
+
 
 class NewEnergyTruckAnalyzer:
     """新能源货车专项分析器"""
 
-    def __init__(self, data_folder, start_week, end_week):
+    def __init__(self, data_folder, start_week, end_week, recorder=None):
         self.data_folder = Path(data_folder)
+        self.recorder = recorder    # run_metrics.RunRecorder (可选)
         self.start_week = start_week
         self.end_week = end_week
         self.weekly_data = {}
-        self.cumulative_data = {}
+        self.cumulative_cubes = {}
 
-    def load_data(self):
-        """加载指定周次的数据"""
+    def load_data(self, workers=None):
+        """加载指定周次的数据 (workers>1 时多进程并行读取)"""
         print(f"\n📊 加载第{self.start_week}-{self.end_week}周数据...")
 
         available_weeks = []
         missing_weeks = []
 
-        for week in range(self.start_week, self.end_week + 1):
-            file_pattern = f"2025保单第{week}周变动成本明细表.csv"
-            file_path = self.data_folder / file_pattern
-
-            if file_path.exists():
-                try:
-                    df = pd.read_csv(file_path, encoding='utf-8-sig')
-
-                    # 筛选新能源货车数据
-                    # is_new_energy_vehicle = True 且 business_type_category 包含"货车"
-                    truck_df = df[
-                        (df['is_new_energy_vehicle'] == True) &
-                        (df['business_type_category'].str.contains('货车', na=False))
-                    ].copy()
-
-                    if len(truck_df) > 0:
-                        self.cumulative_data[week] = truck_df
-                        available_weeks.append(week)
-                        print(f"  ✅ 第{week}周: {len(truck_df):,}条新能源货车记录")
-                    else:
-                        print(f"  ⚠️  第{week}周: 无新能源货车数据")
-                        missing_weeks.append(week)
-
-                except Exception as e:
-                    print(f"  ❌ 第{week}周: 加载失败 - {e}")
-                    missing_weeks.append(week)
+        workers = LOAD_WORKERS if workers is None else workers
+        weeks = list(range(self.start_week, self.end_week + 1))
+        load_week = partial(
+            _load_truck_week,
+            data_folder=str(self.data_folder),
+            cache_folder=CACHE_FOLDER if ENABLE_DATA_CACHE else None
+        )
+        if self.recorder is not None:
+            # 在读取进程内计量, 指标随结果返回
+            load_week = partial(measure_call, load_week)
+        results = map_weeks(load_week, weeks, workers)
+
+        for week in weeks:
+            if self.recorder is not None:
+                (status, payload), metrics = results[week]
+                self.recorder.add(
+                    f"load_week_{week}", metrics,
+                    output_rows=int(payload[ROW_COUNT].sum()) if status == 'ok' else None,
+                    status=status
+                )
+            else:
+                status, payload = results[week]
+
+            if status == 'ok':
+                self.cumulative_cubes[week] = payload
+                available_weeks.append(week)
+                print(f"  ✅ 第{week}周: {payload[ROW_COUNT].sum():,}条新能源货车记录")
+            elif status == 'empty':
+                print(f"  ⚠️  第{week}周: 无新能源货车数据")
+                missing_weeks.append(week)
+            elif status == 'error':
+                print(f"  ❌ 第{week}周: 加载失败 - {payload}")
+                missing_weeks.append(week)
             else:
                 print(f"  ❌ 第{week}周: 文件不存在")
                 missing_weeks.append(week)
@@ -71,73 +321,92 @@ class NewEnergyTruckAnalyzer:
         return available_weeks, missing_weeks
 
     def calculate_weekly_kpis(self):
-        """计算各周核心KPI"""
+        """计算各周核心KPI (累计值, 并附当周发生值)"""
         print("\n📈 计算各周核心指标...")
 
-        weekly_kpis = {}
-
-        for week in sorted(self.cumulative_data.keys()):
-            df = self.cumulative_data[week]
-
-            # 基础指标
-            signed_premium = df['signed_premium_yuan'].sum()
-            matured_premium = df['matured_premium_yuan'].sum()
-            total_claims = df['reported_claim_payment_yuan'].sum()
-            total_expenses = df['expense_amount_yuan'].sum()
-            policy_count = df['policy_count'].sum()
-            claim_cases = df['claim_case_count'].sum()
+        # 一次分组得到累计序列与当周发生序列
+        cumulative, weekly = weekly_series(stack_cubes(self.cumulative_cubes))
+        cumulative_kpis = self._kpi_table(cumulative)
+        weekly_kpis_occurred = self._kpi_table(weekly.dropna())
 
-            # 计算率值
-            loss_ratio = (total_claims / matured_premium * 100) if matured_premium > 0 else 0
-            expense_ratio = (total_expenses / signed_premium * 100) if signed_premium > 0 else 0
-            claim_frequency = (claim_cases / policy_count * 100) if policy_count > 0 else 0
-            avg_claim_amount = (total_claims / claim_cases) if claim_cases > 0 else 0
-            avg_premium = (signed_premium / policy_count) if policy_count > 0 else 0
+        weekly_kpis = {}
 
-            # 边际贡献率
-            contribution_margin = 100 - loss_ratio - expense_ratio
+        for week, kpi in cumulative_kpis.iterrows():
+            weekly_kpis[week] = {'周次': week, **kpi.to_dict()}
+            weekly_kpis[week]['保单件数'] = int(kpi['保单件数'])
+            weekly_kpis[week]['赔案件数'] = int(kpi['赔案件数'])
 
-            weekly_kpis[week] = {
-                '周次': week,
-                '签单保费(万元)': round(signed_premium / 10000, 2),
-                '满期保费(万元)': round(matured_premium / 10000, 2),
-                '已报告赔款(万元)': round(total_claims / 10000, 2),
-                '费用总额(万元)': round(total_expenses / 10000, 2),
-                '保单件数': int(policy_count),
-                '赔案件数': int(claim_cases),
-                '赔付率(%)': round(loss_ratio, 2),
-                '费用率(%)': round(expense_ratio, 2),
-                '边际贡献率(%)': round(contribution_margin, 2),
-                '出险率(%)': round(claim_frequency, 2),
-                '案均赔款(元)': round(avg_claim_amount, 0),
-                '单均保费(元)': round(avg_premium, 0)
-            }
+            # 当周发生值 (上一周数据存在时)
+            if week in weekly_kpis_occurred.index:
+                for name, value in weekly_kpis_occurred.loc[week].items():
+                    weekly_kpis[week][f'当周{name}'] = value
 
-            print(f"  第{week}周: 赔付率 {loss_ratio:.1f}%, 保费 {signed_premium/10000:.2f}万元, 保单 {policy_count}件")
+            totals = cumulative.loc[week]
+            loss_ratio = kpi['赔付率(%)']
+            print(f"  第{week}周: 赔付率 {loss_ratio:.1f}%, 保费 {totals['signed_premium_yuan']/10000:.2f}万元, "
+                  f"保单 {int(totals['policy_count'])}件")
 
         return weekly_kpis
 
+    @staticmethod
+    def _kpi_table(totals):
+        """由各周指标合计向量化计算KPI表 (列名与报告一致)"""
+        signed_premium = totals['signed_premium_yuan']
+        matured_premium = totals['matured_premium_yuan']
+        total_claims = totals['reported_claim_payment_yuan']
+        total_expenses = totals['expense_amount_yuan']
+        policy_count = totals['policy_count']
+        claim_cases = totals['claim_case_count']
+
+        def safe_ratio(numerator, denominator, scale=1):
+            return (numerator / denominator.where(denominator > 0) * scale).fillna(0)
+
+        # 计算率值
+        loss_ratio = safe_ratio(total_claims, matured_premium, 100)
+        expense_ratio = safe_ratio(total_expenses, signed_premium, 100)
+        claim_frequency = safe_ratio(claim_cases, policy_count, 100)
+        avg_claim_amount = safe_ratio(total_claims, claim_cases)
+        avg_premium = safe_ratio(signed_premium, policy_count)
+
+        # 边际贡献率
+        contribution_margin = 100 - loss_ratio - expense_ratio
+
+        return pd.DataFrame({
+            '签单保费(万元)': (signed_premium / 10000).round(2),
+            '满期保费(万元)': (matured_premium / 10000).round(2),
+            '已报告赔款(万元)': (total_claims / 10000).round(2),
+            '费用总额(万元)': (total_expenses / 10000).round(2),
+            '保单件数': policy_count,
+            '赔案件数': claim_cases,
+            '赔付率(%)': loss_ratio.round(2),
+            '费用率(%)': expense_ratio.round(2),
+            '边际贡献率(%)': contribution_margin.round(2),
+            '出险率(%)': claim_frequency.round(2),
+            '案均赔款(元)': avg_claim_amount.round(0),
+            '单均保费(元)': avg_premium.round(0)
+        }, index=totals.index)
+
     def analyze_regional_performance(self):
         """分析区域表现"""
         print("\n🗺️  区域表现分析...")
 
-        # 使用最新周的数据
-        latest_week = max(self.cumulative_data.keys())
-        latest_df = self.cumulative_data[latest_week]
+        # 使用最新周的立方体
+        latest_week = max(self.cumulative_cubes.keys())
+        latest_cube = self.cumulative_cubes[latest_week]
 
         regional_analysis = []
+        loss_ratios = []
 
-        for org in latest_df['third_level_organization'].unique():
+        for _, org_sums in rollup(latest_cube, ['third_level_organization']).iterrows():
+            org = org_sums['third_level_organization']
             if pd.isna(org) or org == '本部':
                 continue
 
-            org_df = latest_df[latest_df['third_level_organization'] == org]
-
-            signed_premium = org_df['signed_premium_yuan'].sum()
-            matured_premium = org_df['matured_premium_yuan'].sum()
-            total_claims = org_df['reported_claim_payment_yuan'].sum()
-            policy_count = org_df['policy_count'].sum()
-            claim_cases = org_df['claim_case_count'].sum()
+            signed_premium = org_sums['signed_premium_yuan']
+            matured_premium = org_sums['matured_premium_yuan']
+            total_claims = org_sums['reported_claim_payment_yuan']
+            policy_count = org_sums['policy_count']
+            claim_cases = org_sums['claim_case_count']
 
             # 只保留有一定业务规模的机构
             if signed_premium < 10000:  # 小于1万元的忽略
@@ -147,16 +416,6 @@ class NewEnergyTruckAnalyzer:
             claim_frequency = (claim_cases / policy_count * 100) if policy_count > 0 else 0
             avg_claim = (total_claims / claim_cases) if claim_cases > 0 else 0
 
-            # 判断风险等级
-            if loss_ratio >= 80:
-                risk_level = "🔴 高危"
-            elif loss_ratio >= 70:
-                risk_level = "🟠 预警"
-            elif loss_ratio >= 60:
-                risk_level = "🟡 关注"
-            else:
-                risk_level = "🟢 良好"
-
             regional_analysis.append({
                 '机构': org,
                 '签单保费(万元)': round(signed_premium / 10000, 2),
@@ -165,8 +424,13 @@ class NewEnergyTruckAnalyzer:
                 '赔付率(%)': round(loss_ratio, 2),
                 '出险率(%)': round(claim_frequency, 2),
                 '案均赔款(元)': round(avg_claim, 0),
-                '风险等级': risk_level
+                '风险等级': None
             })
+            loss_ratios.append(loss_ratio)
+
+        # 风险等级按配置整列评级
+        for item, risk_level in zip(regional_analysis, load_grader().badges('loss_ratio', loss_ratios)):
+            item['风险等级'] = risk_level
 
         # 按赔付率降序排序
         regional_analysis = sorted(regional_analysis, key=lambda x: x['赔付率(%)'], reverse=True)
@@ -177,21 +441,20 @@ class NewEnergyTruckAnalyzer:
         """分析不同货车类型"""
         print("\n🚛 货车类型分析...")
 
-        latest_week = max(self.cumulative_data.keys())
-        latest_df = self.cumulative_data[latest_week]
+        latest_week = max(self.cumulative_cubes.keys())
+        latest_cube = self.cumulative_cubes[latest_week]
 
         business_analysis = []
 
-        for business_type in latest_df['business_type_category'].unique():
+        for _, biz_sums in rollup(latest_cube, ['business_type_category']).iterrows():
+            business_type = biz_sums['business_type_category']
             if pd.isna(business_type):
                 continue
 
-            biz_df = latest_df[latest_df['business_type_category'] == business_type]
-
-            signed_premium = biz_df['signed_premium_yuan'].sum()
-            matured_premium = biz_df['matured_premium_yuan'].sum()
-            total_claims = biz_df['reported_claim_payment_yuan'].sum()
-            policy_count = biz_df['policy_count'].sum()
+            signed_premium = biz_sums['signed_premium_yuan']
+            matured_premium = biz_sums['matured_premium_yuan']
+            total_claims = biz_sums['reported_claim_payment_yuan']
+            policy_count = biz_sums['policy_count']
 
             if signed_premium < 10000:
                 continue
@@ -324,204 +587,63 @@ class NewEnergyTruckAnalyzer:
 
         return problem_weeks
 
-    def generate_report(self, weekly_kpis, regional_analysis, business_analysis, trend_analysis, problem_weeks):
-        """生成分析报告"""
-        print("\n📝 生成分析报告...")
-
+    def report_sections(self, weekly_kpis, regional_analysis, business_analysis, trend_analysis, problem_weeks):
+        """报告各章节 [(模板名, 数据模型), ...]"""
         weeks = sorted(weekly_kpis.keys())
         latest_week = weeks[-1]
         latest_kpi = weekly_kpis[latest_week]
-
-        report = f"""# 2025保单新能源货车专项分析报告
-## 分析周期：第{self.start_week}周 至 第{self.end_week}周
-
----
-
-## 一、执行摘要
-
-### 核心结论
-"""
-
-        # 生成核心结论
-        if latest_kpi['赔付率(%)'] > 80:
-            report += f"新能源货车业务处于**高风险状态**，最新周次（第{latest_week}周）赔付率达到**{latest_kpi['赔付率(%)']}%**，"
-        elif latest_kpi['赔付率(%)'] > 70:
-            report += f"新能源货车业务处于**风险预警状态**，最新周次（第{latest_week}周）赔付率为**{latest_kpi['赔付率(%)']}%**，"
-        else:
-            report += f"新能源货车业务表现**相对稳定**，最新周次（第{latest_week}周）赔付率为**{latest_kpi['赔付率(%)']}%**，"
-
-        report += f"业务规模为**{latest_kpi['签单保费(万元)']}万元**，累计承保**{latest_kpi['保单件数']}件**保单。\n\n"
-
-        # 关键指标
-        report += f"""### 关键指标（第{latest_week}周累计值）
-
-| 指标 | 数值 | 状态 |
-|------|------|------|
-| 签单保费 | {latest_kpi['签单保费(万元)']:.2f}万元 | - |
-| 满期保费 | {latest_kpi['满期保费(万元)']:.2f}万元 | - |
-| 保单件数 | {latest_kpi['保单件数']:,}件 | - |
-| 赔付率 | {latest_kpi['赔付率(%)']}% | {"🔴 高危" if latest_kpi['赔付率(%)'] > 80 else "🟠 预警" if latest_kpi['赔付率(%)'] > 70 else "🟡 关注" if latest_kpi['赔付率(%)'] > 60 else "🟢 良好"} |
-| 费用率 | {latest_kpi['费用率(%)']}% | - |
-| 边际贡献率 | {latest_kpi['边际贡献率(%)']}% | {"🔴 亏损" if latest_kpi['边际贡献率(%)'] < 0 else "🟠 微利" if latest_kpi['边际贡献率(%)'] < 5 else "🟢 健康"} |
-| 出险率 | {latest_kpi['出险率(%)']}% | {"⚠️ 过高" if latest_kpi['出险率(%)'] > 25 else "正常"} |
-| 案均赔款 | {latest_kpi['案均赔款(元)']:,.0f}元 | - |
-| 单均保费 | {latest_kpi['单均保费(元)']:,.0f}元 | - |
-
----
-
-## 二、趋势分析
-
-### 分析周期表现
-分析周期：第{self.start_week}周 - 第{self.end_week}周，共{len(weeks)}周
-
-"""
-
-        # 趋势洞察
-        if trend_analysis['insights']:
-            report += "### 核心发现\n\n"
-            for insight in trend_analysis['insights']:
-                report += f"- {insight}\n"
-            report += "\n"
-
-        # 统计指标
-        report += f"""### 统计指标
-
-- 平均赔付率: {trend_analysis['loss_ratio_avg']}%
-- 赔付率标准差: {trend_analysis['loss_ratio_std']}
-- 赔付率变化: {trend_analysis['loss_ratio_change']:+.2f}个百分点
-- 保费增长率: {trend_analysis['premium_growth_rate']:+.2f}%
-
-"""
-
-        # 各周详细数据
-        report += "### 各周详细指标\n\n"
-        report += "| 周次 | 签单保费(万) | 保单件数 | 赔付率(%) | 出险率(%) | 案均赔款(元) | 边际贡献率(%) |\n"
-        report += "|------|-------------|----------|-----------|-----------|-------------|---------------|\n"
-
-        for week in weeks:
-            kpi = weekly_kpis[week]
-            report += f"| 第{kpi['周次']}周 | {kpi['签单保费(万元)']:.2f} | {kpi['保单件数']:,} | {kpi['赔付率(%)']} | {kpi['出险率(%)']} | {kpi['案均赔款(元)']:,.0f} | {kpi['边际贡献率(%)']} |\n"
-
-        report += "\n---\n\n"
-
-        # 问题周次
-        if problem_weeks:
-            report += "## 三、异常周次识别\n\n"
-            report += "以下周次存在异常指标，需要重点关注：\n\n"
-
-            for problem in problem_weeks:
-                report += f"### 第{problem['周次']}周\n"
-                report += f"- **问题**: {problem['问题']}\n"
-                report += f"- 赔付率: {problem['赔付率']}%\n"
-                report += f"- 案均赔款: {problem['案均赔款']:,.0f}元\n\n"
+        loss_ratio = latest_kpi['赔付率(%)']
+        grader = load_grader()
+
+        # 核心结论与立即行动按最新赔付率档位
+        if loss_ratio > 80:
+            level, status_phrase, ratio_verb = 'high_risk', '处于**高风险状态**', '达到'
+        elif loss_ratio > 70:
+            level, status_phrase, ratio_verb = 'warning', '处于**风险预警状态**', '为'
         else:
-            report += "## 三、异常周次识别\n\n✅ 未发现明显异常周次\n\n"
-
-        report += "---\n\n"
-
-        # 区域分析
-        report += "## 四、区域表现分析\n\n"
-        report += "### 各机构业务表现（按赔付率降序）\n\n"
-        report += "| 机构 | 签单保费(万) | 保单件数 | 赔付率(%) | 出险率(%) | 案均赔款(元) | 风险等级 |\n"
-        report += "|------|-------------|----------|-----------|-----------|-------------|----------|\n"
-
-        for region in regional_analysis[:10]:  # 只显示前10个
-            report += f"| {region['机构']} | {region['签单保费(万元)']:.2f} | {region['保单件数']:,} | {region['赔付率(%)']} | {region['出险率(%)']} | {region['案均赔款(元)']:,.0f} | {region['风险等级']} |\n"
-
-        report += "\n"
+            level, status_phrase, ratio_verb = 'stable', '表现**相对稳定**', '为'
 
-        # 高风险机构
+        period = {'start_week': self.start_week, 'end_week': self.end_week}
         high_risk_orgs = [r for r in regional_analysis if r['赔付率(%)'] > 80]
-        if high_risk_orgs:
-            report += f"### ⚠️ 高风险机构（赔付率>80%）\n\n"
-            report += f"共有**{len(high_risk_orgs)}个机构**需要重点关注：\n\n"
-            for org in high_risk_orgs:
-                report += f"- **{org['机构']}**: 赔付率{org['赔付率(%)']}%, 保费规模{org['签单保费(万元)']:.2f}万元\n"
-            report += "\n"
-
-        report += "---\n\n"
-
-        # 业务类型分析
-        if business_analysis:
-            report += "## 五、货车类型分析\n\n"
-            report += "| 业务类型 | 签单保费(万) | 保单件数 | 赔付率(%) |\n"
-            report += "|----------|-------------|----------|----------|\n"
-
-            for biz in business_analysis:
-                report += f"| {biz['业务类型']} | {biz['签单保费(万元)']:.2f} | {biz['保单件数']:,} | {biz['赔付率(%)']} |\n"
-
-            report += "\n---\n\n"
-
-        # 战略建议
-        report += "## 六、战略建议与行动计划\n\n"
-        report += "### 🚨 立即行动（24小时内）\n\n"
-
-        if latest_kpi['赔付率(%)'] > 80:
-            report += "1. **暂停高风险机构新单承保**：对赔付率超过80%的机构立即暂停新单自动核保\n"
-            report += "2. **启动大案调查**：调取最近4周案均赔款超过5万元的所有案件进行复核\n"
-            report += "3. **紧急风险评估**：召集风控、核保、理赔部门紧急会议，评估业务持续性\n"
-        elif latest_kpi['赔付率(%)'] > 70:
-            report += "1. **加强核保审核**：提高高风险机构的人工审核比例至100%\n"
-            report += "2. **理赔审核升级**：5000元以上案件需二次核定\n"
-            report += "3. **客户资质复查**：对车队客户进行运营资质和车况复查\n"
-        else:
-            report += "1. **持续监控**：保持现有风控策略，密切监控关键指标变化\n"
-            report += "2. **数据跟踪**：每周更新趋势分析，及时发现异常\n"
-
-        report += "\n### ⏰ 本周内完成（7天）\n\n"
-        report += "1. **问题机构专项复盘**：对高赔付率机构进行业务质量专项调查\n"
-        report += "2. **费率充足性评估**：重新评估新能源货车费率水平，考虑调整\n"
-        report += "3. **客户分层管理**：建立客户风险分级体系，差异化承保策略\n"
-        report += "4. **理赔数据分析**：分析高赔付案件特征，识别共性风险因素\n"
-
-        report += "\n### 📊 中期优化（1个月内）\n\n"
-        report += "1. **定价模型优化**：基于累计数据优化新能源货车定价模型\n"
-        report += "2. **风控规则升级**：建立新能源货车专项风控规则库\n"
-        report += "3. **客户筛选机制**：完善客户准入标准，提高业务质量\n"
-        report += "4. **区域策略调整**：根据各地表现制定差异化区域策略\n"
 
-        report += "\n### 🎯 长期战略（3个月内）\n\n"
-        report += "1. **数据能力建设**：接入车辆运行数据（BMS、GPS等），实现动态定价\n"
-        report += "2. **合作伙伴开发**：寻找优质车队客户，建立长期合作关系\n"
-        report += "3. **产品创新**：开发适配新能源货车特点的创新保险产品\n"
-        report += "4. **服务生态构建**：打造充电、维修、救援一体化服务生态\n"
+        return [
+            ('summary', dict(period, latest_week=latest_week, kpi=latest_kpi,
+                             status_phrase=status_phrase, ratio_verb=ratio_verb,
+                             status={
+                                 'loss_ratio': grader.badge('loss_ratio', loss_ratio),
+                                 'expense_ratio': grader.badge('expense_ratio', latest_kpi['费用率(%)']),
+                                 'contribution_margin_ratio': grader.badge('contribution_margin_ratio',
+                                                                           latest_kpi['边际贡献率(%)']),
+                                 'matured_claim_ratio': grader.badge('matured_claim_ratio', latest_kpi['出险率(%)'])
+                             })),
+            ('trend', dict(period, week_count=len(weeks), trend=trend_analysis,
+                           weekly=[weekly_kpis[week] for week in weeks])),
+            ('problem_weeks', {'problem_weeks': problem_weeks}),
+            ('regional', {'regions': regional_analysis[:10],  # 只显示前10个
+                          'high_risk_orgs': high_risk_orgs, 'high_risk_count': len(high_risk_orgs)}),
+            ('business', {'businesses': business_analysis}),
+            ('recommendations', {'immediate_actions': IMMEDIATE_ACTIONS[level]}),
+            ('appendix', dict(period, risk_legend=grader.legend('loss_ratio'),
+                              generated_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+        ]
 
-        report += "\n---\n\n"
-
-        # 附录
-        report += f"""## 附录：分析说明
-
-### 数据来源
-- 数据源：2025年保单变动成本明细表
-- 分析周期：第{self.start_week}周 - 第{self.end_week}周
-- 筛选条件：is_new_energy_vehicle = True 且 business_type_category 包含"货车"
-- 统计口径：累计值（非当周发生值）
-
-### 关键指标定义
-- **赔付率** = 已报告赔款 / 满期保费 × 100%
-- **费用率** = 费用总额 / 签单保费 × 100%
-- **边际贡献率** = 100% - 赔付率 - 费用率
-- **出险率** = 赔案件数 / 保单件数 × 100%
-- **案均赔款** = 已报告赔款 / 赔案件数
-- **单均保费** = 签单保费 / 保单件数
-
-### 风险等级标准
-- 🟢 良好：赔付率 < 60%
-- 🟡 关注：60% ≤ 赔付率 < 70%
-- 🟠 预警：70% ≤ 赔付率 < 80%
-- 🔴 高危：赔付率 ≥ 80%
-
----
-
-*报告生成时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*
-*分析工具：新能源货车专项分析器 v1.0*
-"""
+    def generate_report(self, weekly_kpis, regional_analysis, business_analysis, trend_analysis, problem_weeks):
+        """生成分析报告"""
+        print("\n📝 生成分析报告...")
 
-        return report
+        sections = self.report_sections(weekly_kpis, regional_analysis, business_analysis,
+                                        trend_analysis, problem_weeks)
+        return "".join(render_sections(REPORT_TEMPLATES, sections))
 
 
-def main():
-    """主函数"""
+def main(start_week=None, end_week=None, data_folder=None, output_folder=None, workers=None,
+         metrics_table=ENABLE_METRICS_TABLE):
+    """主函数 (参数为None时取模块配置, 供命令行入口覆盖)"""
+    start_week = START_WEEK if start_week is None else start_week
+    end_week = END_WEEK if end_week is None else end_week
+    data_folder = DATA_FOLDER if data_folder is None else data_folder
+    output_folder = OUTPUT_FOLDER if output_folder is None else output_folder
+    workers = LOAD_WORKERS if workers is None else workers
 
     print("=" * 70)
     print("🚛 2025保单新能源货车专项分析")
@@ -529,44 +651,53 @@ def main():
 
     try:
         # 初始化分析器
-        analyzer = NewEnergyTruckAnalyzer(DATA_FOLDER, START_WEEK, END_WEEK)
+        recorder = RunRecorder('truck', live=metrics_table)
+        analyzer = NewEnergyTruckAnalyzer(data_folder, start_week, end_week, recorder=recorder)
 
         # 加载数据
-        available_weeks, missing_weeks = analyzer.load_data()
+        available_weeks, missing_weeks = analyzer.load_data(workers)
 
         if len(available_weeks) == 0:
             print("\n❌ 错误：未找到任何新能源货车数据")
             return False
 
         # 计算各周KPI
-        weekly_kpis = analyzer.calculate_weekly_kpis()
+        with recorder.stage('weekly_kpis', len(analyzer.cumulative_cubes)) as record:
+            weekly_kpis = analyzer.calculate_weekly_kpis()
+            record['output_rows'] = len(weekly_kpis)
 
         # 区域分析
-        regional_analysis = analyzer.analyze_regional_performance()
+        with recorder.stage('regional_analysis'):
+            regional_analysis = analyzer.analyze_regional_performance()
 
         # 业务类型分析
-        business_analysis = analyzer.analyze_business_types()
+        with recorder.stage('business_analysis'):
+            business_analysis = analyzer.analyze_business_types()
 
         # 趋势分析
-        trend_analysis = analyzer.analyze_trend(weekly_kpis)
+        with recorder.stage('trend_analysis', len(weekly_kpis)):
+            trend_analysis = analyzer.analyze_trend(weekly_kpis)
 
         # 识别问题周次
-        problem_weeks = analyzer.identify_problem_weeks(weekly_kpis)
+        with recorder.stage('problem_weeks', len(weekly_kpis)) as record:
+            problem_weeks = analyzer.identify_problem_weeks(weekly_kpis)
+            record['output_rows'] = len(problem_weeks)
 
         # 生成报告
-        report = analyzer.generate_report(
-            weekly_kpis,
-            regional_analysis,
-            business_analysis,
-            trend_analysis,
-            problem_weeks
-        )
+        with recorder.stage('report'):
+            report = analyzer.generate_report(
+                weekly_kpis,
+                regional_analysis,
+                business_analysis,
+                trend_analysis,
+                problem_weeks
+            )
 
         # 保存报告
-        output_path = Path(OUTPUT_FOLDER)
-        output_path.mkdir(exist_ok=True)
+        output_path = Path(output_folder)
+        output_path.mkdir(parents=True, exist_ok=True)
 
-        report_filename = f"2025保单新能源货车分析报告_第{START_WEEK}-{END_WEEK}周.md"
+        report_filename = f"2025保单新能源货车分析报告_第{start_week}-{end_week}周.md"
         report_filepath = output_path / report_filename
 
         with open(report_filepath, 'w', encoding='utf-8') as f:
@@ -575,6 +706,9 @@ def main():
         print(f"\n✅ 报告生成成功: {report_filename}")
         print(f"📁 保存位置: {report_filepath.absolute()}")
 
+        record_path = recorder.write(output_path, f"第{start_week}-{end_week}周")
+        print(f"⏱️  运行记录: {record_path.name} (总耗时{recorder.summary()['seconds']:.1f}秒)")
+
         # 输出关键摘要
         latest_week = max(weekly_kpis.keys())
         latest_kpi = weekly_kpis[latest_week]
@@ -582,7 +716,7 @@ def main():
         print("\n" + "=" * 70)
         print("📊 核心指标摘要")
         print("=" * 70)
-        print(f"分析周期: 第{START_WEEK}-{END_WEEK}周")
+        print(f"分析周期: 第{start_week}-{end_week}周")
         print(f"最新周次: 第{latest_week}周")
         print(f"  - 签单保费: {latest_kpi['签单保费(万元)']:.2f}万元")
         print(f"  - 保单件数: {latest_kpi['保单件数']:,}件")
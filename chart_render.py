@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图表渲染
+
+图表先整理为纯数据的图表描述 (画布尺寸、子图网格、各子图的数据与样式), 再由
+非交互式Agg后端绘制: 绘图库只在实际绘制时于工作进程中导入, 不依赖pyplot全局状态。
+
+- 缓存: 图表文件以 (图表描述 + 格式 + 分辨率 + 绘图代码) 的指纹为键存于缓存目录,
+  数据未变的图表直接复制, 不再绘制
+- 并行: 未命中缓存的图表分发到进程池, 提交后立即返回, 调用方可先生成文字报告
+- 格式: png (位图, 按dpi) 或 svg (矢量, 文字保留为文本, 体积小, 适合嵌入Markdown)
+
+图表描述示例:
+    {'name': '周度趋势', 'figsize': (16, 12), 'grid': (2, 2), 'panels': [
+        {'kind': 'line', 'x': [...], 'y': [...], 'fmt': 'ro-', 'title': '赔付率',
+         'hlines': [{'y': 70, 'color': 'orange', 'label': '警戒线70%'}]},
+        {'kind': 'bar', 'x': [...], 'y': [...], 'color': 'steelblue', 'xticklabels': [...]},
+    ]}
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from pipeline import source_fingerprint
+
+# 缓存格式版本 (调整图表描述结构时递增)
+CHART_VERSION = 1
+
+CHART_FORMATS = ('png', 'svg')
+
+CHART_STYLE = 'seaborn-v0_8'
+CHART_RC = {
+    'font.sans-serif': ['SimHei', 'Arial Unicode MS'],
+    'axes.unicode_minus': False,
+    'svg.fonttype': 'none',     # SVG中文字保留为文本, 不转为路径
+}
+
+
+def chart_fingerprint(spec, fmt, dpi):
+    """图表指纹: 图表描述 + 格式 + 分辨率 (svg与dpi无关) + 绘图代码"""
+    payload = {
+        'version': CHART_VERSION,
+        'spec': spec,
+        'format': fmt,
+        'dpi': dpi if fmt == 'png' else None,
+        'code': source_fingerprint(['chart_render'])
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=repr)
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+
+def _draw_panel(ax, panel):
+    x = panel['x']
+    if panel['kind'] == 'line':
+        ax.plot(x, panel['y'], panel.get('fmt', 'o-'), linewidth=2, markersize=6)
+    elif panel['kind'] == 'bar':
+        positions = range(len(x)) if panel.get('xticklabels') else x
+        ax.bar(positions, panel['y'], color=panel.get('color', 'steelblue'), alpha=0.7)
+        if panel.get('xticklabels'):
+            ax.set_xticks(list(positions))
+            ax.set_xticklabels(panel['xticklabels'], rotation=panel.get('rotation', 0))
+    else:
+        raise ValueError(f"未知图表类型: {panel['kind']}")
+
+    for line in panel.get('hlines', []):
+        ax.axhline(y=line['y'], color=line['color'], linestyle='--', alpha=0.7, label=line.get('label'))
+
+    ax.set_title(panel.get('title', ''), fontsize=14, fontweight='bold')
+    if panel.get('xlabel'):
+        ax.set_xlabel(panel['xlabel'])
+    if panel.get('ylabel'):
+        ax.set_ylabel(panel['ylabel'])
+    if panel.get('hlines'):
+        ax.legend()
+    ax.grid(True, alpha=0.3)
+
+
+def draw_chart(spec, path, fmt='png', dpi=300):
+    """按图表描述绘制并保存 (模块级函数, 供进程池调用) → 文件路径"""
+    import matplotlib
+    matplotlib.use('Agg')
+    # 缺少中文字体时逐个文本的回退告警不输出
+    logging.getLogger('matplotlib.font_manager').setLevel(logging.ERROR)
+    from matplotlib import style
+    from matplotlib.figure import Figure
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.tmp{path.suffix}")
+
+    with style.context(CHART_STYLE), matplotlib.rc_context(CHART_RC):
+        fig = Figure(figsize=spec['figsize'])
+        rows, cols = spec['grid']
+        axes = fig.subplots(rows, cols, squeeze=False).ravel()
+        for ax, panel in zip(axes, spec['panels']):
+            _draw_panel(ax, panel)
+        fig.tight_layout()
+        fig.savefig(tmp_path, format=fmt, dpi=dpi, bbox_inches='tight')
+
+    os.replace(tmp_path, path)
+    return str(path)
+
+
+class ChartBatch:
+    """一批图表的渲染任务: start() 复制命中缓存的图表并提交其余图表, wait() 等待全部完成
+
+    workers>1 时未命中的图表在进程池中后台绘制; 否则在 wait() 时于当前进程依次绘制。
+    """
+
+    def __init__(self, specs, output_folder, formats=('png',), dpi=300, cache_folder=None, workers=1):
+        for fmt in formats:
+            if fmt not in CHART_FORMATS:
+                raise ValueError(f"未知图表格式: {fmt}")
+
+        self.specs = list(specs)
+        self.output_folder = Path(output_folder)
+        self.formats = tuple(formats)
+        self.dpi = dpi
+        self.cache_folder = Path(cache_folder) if cache_folder else None
+        self.workers = workers
+        self.files = {}         # (图表名, 格式) → 输出文件
+        self.cached = 0
+        self._pending = []      # (图表名, 格式, 描述, 绘制路径)
+        self._futures = []
+        self._executor = None
+
+    def output_path(self, name, fmt):
+        return self.output_folder / f"{name}.{fmt}"
+
+    def start(self):
+        """复制命中缓存的图表, 提交未命中的图表 (不等待)"""
+        for spec in self.specs:
+            for fmt in self.formats:
+                target = self.output_path(spec['name'], fmt)
+                self.files[(spec['name'], fmt)] = target
+                if self.cache_folder is None:
+                    self._pending.append((spec['name'], fmt, spec, target))
+                    continue
+
+                cached = self.cache_folder / f"{chart_fingerprint(spec, fmt, self.dpi)}.{fmt}"
+                if cached.exists():
+                    shutil.copyfile(cached, target)
+                    self.cached += 1
+                else:
+                    self._pending.append((spec['name'], fmt, spec, cached))
+
+        if self.workers > 1 and len(self._pending) > 0:
+            self._executor = ProcessPoolExecutor(max_workers=min(self.workers, len(self._pending)))
+            self._futures = [
+                self._executor.submit(draw_chart, spec, path, fmt, self.dpi)
+                for _, fmt, spec, path in self._pending
+            ]
+        return self
+
+    def wait(self):
+        """等待全部图表完成 → {(图表名, 格式): 输出文件}"""
+        try:
+            if self._executor is None:
+                for _, fmt, spec, path in self._pending:
+                    draw_chart(spec, path, fmt, self.dpi)
+            else:
+                for future in self._futures:
+                    future.result()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+        # 缓存中新绘制的图表复制到输出目录
+        for name, fmt, _, path in self._pending:
+            target = self.files[(name, fmt)]
+            if Path(path) != target:
+                shutil.copyfile(path, target)
+        return self.files
+
+    @property
+    def rendered(self):
+        return len(self._pending)
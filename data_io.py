@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+变动成本明细表数据读写工具
+
+功能:
+- ✅ 列式缓存(内容哈希为键, Parquet优先, 无pyarrow时回退pickle)
+- ✅ 缓存命中时跳过CSV解析
+- ✅ 多周文件多进程并行读取
+- ✅ 按字段规范读取(列裁剪 + category维度列)
+- ✅ 分块读取时下推行筛选条件(被筛除的行不会形成完整DataFrame)
+- ✅ 流式分块读取(超出内存的大文件逐块处理, 内存占用以块大小为上限)
+"""
+
+import hashlib
+import json
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from data_schema import PIPELINE_COLUMNS, SCHEMA_VERSION, apply_schema, read_dtypes
+
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+# CSV默认读取参数
+CSV_ENCODING = 'utf-8-sig'
+
+# 哈希分块大小(1MB)
+HASH_CHUNK_SIZE = 1 << 20
+
+# 带筛选条件读取时的分块行数
+CHUNK_ROWS = 200_000
+
+# =======================================
+# 列式文件读写
+# =======================================
+
+def file_digest(file_path):
+    """计算文件内容SHA1"""
+    sha1 = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def write_frame(df, base_path):
+    """写入列式文件, 返回实际路径 (Parquet失败时回退pickle)"""
+    base_path = Path(base_path)
+    base_path.parent.mkdir(parents=True, exist_ok=True)
+
+    if PARQUET_AVAILABLE:
+        target = base_path.with_suffix('.parquet')
+        try:
+            df.to_parquet(target, index=False)
+            return target
+        except Exception:
+            # 混合类型的object列无法写入Parquet
+            target.unlink(missing_ok=True)
+
+    target = base_path.with_suffix('.pkl')
+    with open(target, 'wb') as f:
+        pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return target
+
+
+def read_frame(base_path):
+    """读取列式文件, 不存在时返回None"""
+    base_path = Path(base_path)
+
+    parquet_path = base_path.with_suffix('.parquet')
+    if PARQUET_AVAILABLE and parquet_path.exists():
+        return pd.read_parquet(parquet_path)
+
+    pickle_path = base_path.with_suffix('.pkl')
+    if pickle_path.exists():
+        with open(pickle_path, 'rb') as f:
+            return pickle.load(f)
+
+    return None
+
+# =======================================
+# 明细表列式缓存
+# =======================================
+
+class ColumnarCache:
+    """明细表列式缓存 - 以CSV内容哈希为键"""
+
+    def __init__(self, cache_folder=".cache", namespace="csv"):
+        self.cache_folder = Path(cache_folder) / namespace
+        self.index_path = self.cache_folder / "digests.json"
+        self._digest_index = None
+
+    def _load_digest_index(self):
+        """加载文件状态→哈希索引 (避免重复哈希未变动的大文件)"""
+        if self._digest_index is None:
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    self._digest_index = json.load(f)
+            except (OSError, ValueError):
+                self._digest_index = {}
+        return self._digest_index
+
+    def digest(self, csv_path):
+        """获取CSV内容哈希 (文件大小与修改时间未变时复用)"""
+        csv_path = Path(csv_path)
+        stat = csv_path.stat()
+        stamp = f"{stat.st_size}:{stat.st_mtime_ns}"
+
+        index = self._load_digest_index()
+        entry = index.get(str(csv_path.resolve()))
+        if entry and entry['stamp'] == stamp:
+            return entry['digest']
+
+        digest = file_digest(csv_path)
+        index[str(csv_path.resolve())] = {'stamp': stamp, 'digest': digest}
+
+        self.cache_folder.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+
+        return digest
+
+    def key(self, csv_path, variant="raw"):
+        """缓存键 = 内容哈希 + 读取口径"""
+        variant_hash = hashlib.sha1(variant.encode('utf-8')).hexdigest()[:8]
+        return f"{self.digest(csv_path)}-{variant_hash}"
+
+    def load(self, csv_path, variant="raw"):
+        """读取缓存, 未命中返回None"""
+        return read_frame(self.cache_folder / self.key(csv_path, variant))
+
+    def store(self, csv_path, df, variant="raw"):
+        """写入缓存"""
+        return write_frame(df, self.cache_folder / self.key(csv_path, variant))
+
+    def fetch(self, csv_path, variant, parse):
+        """优先读取缓存, 未命中时调用parse()解析并回填"""
+        df = self.load(csv_path, variant)
+        if df is not None:
+            return df
+
+        df = parse()
+        try:
+            self.store(csv_path, df, variant)
+        except OSError as e:
+            print(f"⚠️  缓存写入失败 {Path(csv_path).name}: {e}")
+
+        return df
+
+    def read_csv(self, csv_path, variant="raw", **read_kwargs):
+        """优先读取缓存, 未命中时解析CSV并回填"""
+        read_kwargs.setdefault('encoding', CSV_ENCODING)
+        return self.fetch(csv_path, variant, lambda: pd.read_csv(csv_path, **read_kwargs))
+
+# =======================================
+# 按字段规范读取
+# =======================================
+
+def _read_kwargs(columns):
+    """按字段规范的read_csv参数 (列裁剪 + 读取类型)"""
+    wanted = set(columns)
+    return dict(
+        encoding=CSV_ENCODING,
+        usecols=lambda col: col in wanted,
+        dtype=read_dtypes(columns)
+    )
+
+
+def iter_detail_chunks(csv_path, columns=None, predicates=(), chunksize=CHUNK_ROWS):
+    """按 chunksize 分块读取明细表, 逐块规范类型并筛选, 依次产出筛选后的数据块
+
+    同一时刻只有一个数据块驻留内存; 全部行被筛除的块产出为空块 (保留列与类型)。
+    """
+    columns = list(PIPELINE_COLUMNS if columns is None else columns)
+    with pd.read_csv(csv_path, chunksize=chunksize, **_read_kwargs(columns)) as reader:
+        for chunk in reader:
+            chunk = apply_schema(chunk)
+            if predicates:
+                mask = predicates[0](chunk)
+                for predicate in predicates[1:]:
+                    mask &= predicate(chunk)
+                chunk = chunk[mask]
+            yield chunk
+
+
+def read_detail_csv(csv_path, cache=None, columns=None, predicates=(), chunksize=CHUNK_ROWS):
+    """按字段规范读取明细表: 仅读取所需列, 维度列直接解析为category
+
+    predicates 为行筛选条件(返回布尔掩码的模块级函数), 多个条件取交集;
+    提供时按 chunksize 分块读取并逐块筛选, 仅保留命中行。
+    """
+    columns = list(PIPELINE_COLUMNS if columns is None else columns)
+    wanted = set(columns)
+
+    def parse():
+        if not predicates:
+            return apply_schema(pd.read_csv(csv_path, **_read_kwargs(columns)))
+
+        kept = []
+        empty = None
+        for chunk in iter_detail_chunks(csv_path, columns, predicates, chunksize):
+            if len(chunk) > 0:
+                kept.append(chunk)
+            elif empty is None:
+                empty = chunk
+
+        if not kept:
+            return empty if empty is not None else pd.DataFrame(columns=columns)
+        return concat_frames(kept) if len(kept) > 1 else kept[0].reset_index(drop=True)
+
+    if cache is None:
+        return parse()
+
+    variant = f"schema-v{SCHEMA_VERSION}:{','.join(sorted(wanted))}"
+    if predicates:
+        variant += "|" + ",".join(predicate.__name__ for predicate in predicates)
+    return cache.fetch(csv_path, variant, parse)
+
+
+def read_week_file(csv_path, week, cache=None, predicates=()):
+    """读取单个周度明细文件, 补充周次与来源文件列"""
+    df = read_detail_csv(csv_path, cache, predicates=predicates)
+    df['week_number'] = np.int16(week)
+    df['data_source'] = pd.Series(Path(csv_path).name, index=df.index, dtype='category')
+    return df
+
+
+def concat_frames(frames):
+    """合并多个明细表, 先统一category列的类别集合以免退化为object"""
+    frames = [df for df in frames if df is not None]
+    if len(frames) == 1:
+        return frames[0]
+
+    for col in frames[0].columns:
+        if all(col in df.columns and isinstance(df[col].dtype, pd.CategoricalDtype) for df in frames):
+            categories = union_categoricals([df[col] for df in frames]).categories
+            for df in frames:
+                df[col] = df[col].cat.set_categories(categories)
+
+    return pd.concat(frames, ignore_index=True)
+
+# =======================================
+# 多周并行读取
+# =======================================
+
+def map_weeks(func, weeks, workers=1):
+    """按周执行func并返回 {week: 结果}; workers>1 时使用进程池并行
+
+    func 需为模块级函数(或其functools.partial), 以便在子进程中反序列化。
+    """
+    weeks = list(weeks)
+    if workers is None or workers <= 1 or len(weeks) <= 1:
+        return {week: func(week) for week in weeks}
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(weeks))) as executor:
+        results = list(executor.map(func, weeks))
+
+    return dict(zip(weeks, results))
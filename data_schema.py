@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+变动成本明细表字段规范
+
+依据 参考文档/03_technical_design/dimensions_dictionary.md (维度, 枚举值以该文档为准)
+与 data_architecture.md (26个字段及类型) 整理, 作为全部加载器的统一读取口径:
+- 只读取流水线实际使用的列
+- 维度列在读取时直接解析为 category
+- 件数列压缩为 int32; 金额列保持 float64 (float32 仅约7位有效数字, 按元汇总会丢精度)
+"""
+
+import pandas as pd
+
+# 读取口径版本 (调整字段或类型时递增, 使列式缓存失效)
+SCHEMA_VERSION = 1
+
+# =======================================
+# 流水线字段分组
+# =======================================
+
+# 维度列 → category (取值以数据为准, 不强制枚举, 避免非规范值被置空)
+DIMENSION_COLUMNS = [
+    'policy_start_year',
+    'third_level_organization',
+    'customer_category_3',
+    'business_type_category',
+    'coverage_type',
+    'renewal_status',
+]
+
+# 布尔列 (True/False, 由解析器推断为bool)
+BOOLEAN_COLUMNS = [
+    'is_new_energy_vehicle',
+    'is_transferred_vehicle',
+]
+
+# 金额列 → float64
+AMOUNT_COLUMNS = [
+    'signed_premium_yuan',
+    'matured_premium_yuan',
+    'reported_claim_payment_yuan',
+    'expense_amount_yuan',
+]
+
+# 件数列 → int32 (存在小数或超出范围时保留float64)
+COUNT_COLUMNS = [
+    'policy_count',
+    'claim_case_count',
+]
+
+PIPELINE_COLUMNS = DIMENSION_COLUMNS + BOOLEAN_COLUMNS + AMOUNT_COLUMNS + COUNT_COLUMNS
+
+INT32_MAX = 2 ** 31 - 1
+
+
+def read_dtypes(columns=None):
+    """read_csv 的 dtype 参数 (仅维度列; 数值列读取后再规范化以兼容脏数据)"""
+    columns = PIPELINE_COLUMNS if columns is None else columns
+    return {col: 'category' for col in DIMENSION_COLUMNS if col in columns}
+
+
+def apply_schema(df):
+    """读取后的类型规范化: 件数列缺失补0并压缩为int32"""
+    for col in COUNT_COLUMNS:
+        if col not in df.columns:
+            continue
+
+        values = pd.to_numeric(df[col], errors='coerce').fillna(0)
+        if len(values) == 0 or ((values % 1 == 0).all() and values.abs().max() <= INT32_MAX):
+            values = values.astype('int32')
+        df[col] = values
+
+    return df
+
+# =======================================
+# 行筛选条件 (模块级函数, 可传入进程池; 入参为数据块, 返回布尔掩码)
+# =======================================
+
+def exclude_headquarters(df):
+    """剔除本部"""
+    return df['third_level_organization'] != '本部'
+
+
+def new_energy_truck(df):
+    """新能源货车: is_new_energy_vehicle = True 且 business_type_category 包含'货车'"""
+    return (
+        (df['is_new_energy_vehicle'] == True) &
+        (df['business_type_category'].str.contains('货车', na=False))
+    )
+
+
+def new_energy_operating_truck(df):
+    """新能源营业货车: is_new_energy_vehicle = True 且 customer_category_3 = 营业货车"""
+    return (df['is_new_energy_vehicle'] == True) & (df['customer_category_3'] == '营业货车')
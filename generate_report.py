@@ -4,29 +4,39 @@
 自动生成2024和2025保单的经营周报
 """
 
-import pandas as pd
 from pathlib import Path
 from datetime import datetime
 
+from data_io import read_detail_csv
+from data_schema import exclude_headquarters
+from kpi_cube import build_cube, measure_columns
+from kpi_grading import load_grader
+from report_manifest import ReportManifest
+from run_metrics import RunRecorder
+
 # ==================== 配置参数 ====================
 TARGET_WEEK = 44
 DATA_FOLDER = Path(".")
 OUTPUT_FOLDER = Path("./周报")
-
-# 创建输出目录
-OUTPUT_FOLDER.mkdir(parents=True, exist_ok=True)
+ENABLE_METRICS_TABLE = False  # 控制台实时打印各阶段耗时/内存表
+ENABLE_REPORT_MANIFEST = True  # 启用章节清单 (只重写数据变化的章节与报告)
 
 # ==================== KPI计算函数 ====================
 def calculate_kpis(df):
-    """计算KPI指标"""
+    """计算KPI指标 (df 可为明细或立方体)"""
+    return kpis_from_totals(df[measure_columns(df)].sum())
+
+
+def kpis_from_totals(totals):
+    """由可加指标合计计算KPI指标 (totals 为指标名→合计的映射)"""
     epsilon = 1e-10
 
-    signed_premium = max(df['signed_premium_yuan'].sum(), epsilon)
-    matured_premium = max(df['matured_premium_yuan'].sum(), epsilon)
-    policy_count = max(df['policy_count'].sum(), epsilon)
-    claim_case_count = max(df['claim_case_count'].sum(), epsilon)
-    reported_claim = df['reported_claim_payment_yuan'].sum()
-    expense_amount = df['expense_amount_yuan'].sum()
+    signed_premium = max(totals['signed_premium_yuan'], epsilon)
+    matured_premium = max(totals['matured_premium_yuan'], epsilon)
+    policy_count = max(totals['policy_count'], epsilon)
+    claim_case_count = max(totals['claim_case_count'], epsilon)
+    reported_claim = totals['reported_claim_payment_yuan']
+    expense_amount = totals['expense_amount_yuan']
 
     loss_ratio = (reported_claim / matured_premium) * 100
     expense_ratio = (expense_amount / signed_premium) * 100
@@ -43,262 +53,320 @@ def calculate_kpis(df):
 
 
 def judge_status(kpi_name, value):
-    """判断KPI状态"""
-    if kpi_name == '赔付率':
-        if value < 50: return '🟢 优秀'
-        if value < 60: return '🟢 健康'
-        if value < 70: return '🔵 中等'
-        if value < 80: return '🟡 预警'
-        return '🔴 危险'
-    elif kpi_name == '边贡率':
-        if value > 12: return '🟢 优秀'
-        if value >= 8: return '🟢 健康'
-        if value >= 6: return '🔵 中等'
-        if value >= 4: return '🟡 预警'
-        return '🔴 危险'
-    elif kpi_name == '费用率':
-        if value < 7.5: return '🟢 优秀'
-        if value < 12.5: return '🟢 健康'
-        if value < 17.5: return '🔵 中等'
-        if value < 22.5: return '🟡 预警'
-        return '🔴 危险'
-    return '⚪ 中性'
+    """判断KPI状态 (按率值指标区间状态值配置评级)"""
+    return load_grader().badge(kpi_name, value)
 
 
 # ==================== 渐进式下钻函数 ====================
-def drilldown_org(df_org, org_name, total_premium):
-    """对单个三级机构执行渐进式下钻分析"""
-
-    result = {
-        'org_name': org_name,
-        'org_kpis': None,
-        'energy_analysis': {}
-    }
+ORG = 'third_level_organization'
+ENERGY = 'is_new_energy_vehicle'
+BUSINESS = 'business_type_category'
+COVERAGE_ORDER = ['主全', '交三', '单交']
+RENEWAL_ORDER = ['新保', '续保', '转保']
+
+
+def _group_totals(cube, keys, sort=False):
+    """按维度一次性汇总立方体, 返回 {分组键: 指标合计}"""
+    measures = measure_columns(cube)
+    grouped = cube.groupby(keys, observed=True, sort=sort)[measures].sum()
+    return grouped.to_dict('index')
+
+
+def drilldown_orgs(cube, org_names):
+    """对多个三级机构执行渐进式下钻分析
+
+    机构 → 能源类型 → 业务类型 → 险别/新转续 各层合计均由立方体一次分组得到,
+    之后逐层只做字典查找, 耗时不随机构数增长。
+    """
+    org_totals = _group_totals(cube, [ORG])
+    energy_totals = _group_totals(cube, [ORG, ENERGY])
+    coverage_totals = _group_totals(cube, [ORG, ENERGY, BUSINESS, 'coverage_type'])
+    renewal_totals = _group_totals(cube, [ORG, ENERGY, BUSINESS, 'renewal_status'])
+
+    # 业务类型按类别顺序排列 (与逐机构groupby一致)
+    business_children = {}
+    for (org, energy, biz_type), totals in _group_totals(cube, [ORG, ENERGY, BUSINESS], sort=True).items():
+        business_children.setdefault((org, energy), []).append((biz_type, totals))
+
+    org_results = []
+    for org_name in org_names:
+        if org_name not in org_totals:
+            continue
 
-    # 机构整体KPI
-    org_kpis = calculate_kpis(df_org)
-    result['org_kpis'] = org_kpis
+        result = {
+            'org_name': org_name,
+            'org_kpis': None,
+            'energy_analysis': {}
+        }
 
-    # 第1层：能源类型分组
-    for energy_flag in [True, False]:
-        energy_name = "新能源车" if energy_flag else "传统车"
-        df_energy = df_org[df_org['is_new_energy_vehicle'] == energy_flag]
+        # 机构整体KPI
+        org_kpis = kpis_from_totals(org_totals[org_name])
+        result['org_kpis'] = org_kpis
 
-        if len(df_energy) == 0:
-            continue
+        # 第1层：能源类型分组
+        for energy_flag in [True, False]:
+            energy_name = "新能源车" if energy_flag else "传统车"
+            energy_key = (org_name, energy_flag)
 
-        kpis_energy = calculate_kpis(df_energy)
-        ratio = (kpis_energy['满期保费'] / org_kpis['满期保费']) * 100
+            if energy_key not in energy_totals:
+                continue
 
-        # 占比<1%跳过
-        if ratio < 1.0:
-            continue
+            kpis_energy = kpis_from_totals(energy_totals[energy_key])
+            ratio = (kpis_energy['满期保费'] / org_kpis['满期保费']) * 100
 
-        energy_healthy = kpis_energy['赔付率'] < 70 and kpis_energy['边贡率'] > 8
+            # 占比<1%跳过
+            if ratio < 1.0:
+                continue
 
-        result['energy_analysis'][energy_name] = {
-            'kpis': kpis_energy,
-            'ratio': ratio,
-            'healthy': energy_healthy,
-            'business_problems': []
-        }
+            energy_healthy = kpis_energy['赔付率'] < 70 and kpis_energy['边贡率'] > 8
 
-        # 如果健康，跳过第2层
-        if energy_healthy:
-            continue
+            result['energy_analysis'][energy_name] = {
+                'kpis': kpis_energy,
+                'ratio': ratio,
+                'healthy': energy_healthy,
+                'business_problems': []
+            }
 
-        # 第2层：业务类型下钻
-        business_groups = df_energy.groupby('business_type_category')
-        business_problems = []
+            # 如果健康，跳过第2层
+            if energy_healthy:
+                continue
 
-        for biz_type, df_biz in business_groups:
-            kpis_biz = calculate_kpis(df_biz)
-            biz_ratio = (kpis_biz['满期保费'] / kpis_energy['满期保费']) * 100
+            # 第2层：业务类型下钻
+            business_problems = []
 
-            # 占比<1%跳过
-            if biz_ratio < 1.0:
-                continue
+            for biz_type, biz_totals in business_children.get(energy_key, []):
+                kpis_biz = kpis_from_totals(biz_totals)
+                biz_ratio = (kpis_biz['满期保费'] / kpis_energy['满期保费']) * 100
 
-            # 计算严重度
-            loss_deviation = max(0, kpis_biz['赔付率'] - 70)
-            contrib_deviation = max(0, 6 - kpis_biz['边贡率'])
-            severity = (loss_deviation * 3 + contrib_deviation * 2.5) * biz_ratio
-
-            business_problems.append({
-                'business_type': biz_type,
-                'kpis': kpis_biz,
-                'ratio': biz_ratio,
-                'severity': severity,
-                'coverage_drilldown': [],
-                'renewal_drilldown': []
-            })
-
-        # 排序取TOP3
-        business_problems.sort(key=lambda x: x['severity'], reverse=True)
-        top3_problems = business_problems[:3]
-
-        # 第3层：对TOP3执行险别/新转续下钻
-        for problem in top3_problems:
-            biz_type = problem['business_type']
-            df_biz = df_energy[df_energy['business_type_category'] == biz_type]
-            biz_total = problem['kpis']['满期保费']
-
-            # 路径A：险别
-            for coverage in ['主全', '交三', '单交']:
-                df_c = df_biz[df_biz['coverage_type'] == coverage]
-                if len(df_c) == 0:
+                # 占比<1%跳过
+                if biz_ratio < 1.0:
                     continue
 
-                kpis_c = calculate_kpis(df_c)
-                c_ratio = (kpis_c['满期保费'] / biz_total) * 100
-
-                problem['coverage_drilldown'].append({
-                    'coverage': coverage,
-                    'kpis': kpis_c,
-                    'ratio': c_ratio
+                # 计算严重度
+                loss_deviation = max(0, kpis_biz['赔付率'] - 70)
+                contrib_deviation = max(0, 6 - kpis_biz['边贡率'])
+                severity = (loss_deviation * 3 + contrib_deviation * 2.5) * biz_ratio
+
+                business_problems.append({
+                    'business_type': biz_type,
+                    'kpis': kpis_biz,
+                    'ratio': biz_ratio,
+                    'severity': severity,
+                    'coverage_drilldown': [],
+                    'renewal_drilldown': []
                 })
 
-            # 按赔付率排序
-            problem['coverage_drilldown'].sort(key=lambda x: x['kpis']['赔付率'], reverse=True)
+            # 排序取TOP3
+            business_problems.sort(key=lambda x: x['severity'], reverse=True)
+            top3_problems = business_problems[:3]
 
-            # 路径B：新转续
-            for renewal in ['新保', '续保', '转保']:
-                df_r = df_biz[df_biz['renewal_status'] == renewal]
-                if len(df_r) == 0:
-                    continue
+            # 第3层：对TOP3执行险别/新转续下钻
+            for problem in top3_problems:
+                biz_key = energy_key + (problem['business_type'],)
+                biz_total = problem['kpis']['满期保费']
 
-                kpis_r = calculate_kpis(df_r)
-                r_ratio = (kpis_r['满期保费'] / biz_total) * 100
+                # 路径A：险别
+                for coverage in COVERAGE_ORDER:
+                    totals = coverage_totals.get(biz_key + (coverage,))
+                    if totals is None:
+                        continue
 
-                problem['renewal_drilldown'].append({
-                    'renewal': renewal,
-                    'kpis': kpis_r,
-                    'ratio': r_ratio
-                })
+                    kpis_c = kpis_from_totals(totals)
+                    problem['coverage_drilldown'].append({
+                        'coverage': coverage,
+                        'kpis': kpis_c,
+                        'ratio': (kpis_c['满期保费'] / biz_total) * 100
+                    })
 
-            # 按赔付率排序
-            problem['renewal_drilldown'].sort(key=lambda x: x['kpis']['赔付率'], reverse=True)
+                # 按赔付率排序
+                problem['coverage_drilldown'].sort(key=lambda x: x['kpis']['赔付率'], reverse=True)
 
-        result['energy_analysis'][energy_name]['business_problems'] = top3_problems
+                # 路径B：新转续
+                for renewal in RENEWAL_ORDER:
+                    totals = renewal_totals.get(biz_key + (renewal,))
+                    if totals is None:
+                        continue
 
-    return result
+                    kpis_r = kpis_from_totals(totals)
+                    problem['renewal_drilldown'].append({
+                        'renewal': renewal,
+                        'kpis': kpis_r,
+                        'ratio': (kpis_r['满期保费'] / biz_total) * 100
+                    })
 
+                # 按赔付率排序
+                problem['renewal_drilldown'].sort(key=lambda x: x['kpis']['赔付率'], reverse=True)
 
-# ==================== Markdown生成函数 ====================
-def generate_markdown(year, week, global_kpis, org_results):
-    """生成周报Markdown内容"""
-
-    md = []
-
-    # 标题
-    md.append(f"# {year}保单第{week}周车险业务经营周报\n")
-    md.append(f"**生成时间**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-    md.append(f"**数据来源**: {year}保单第{week}周变动成本明细表\n")
-    md.append("---\n")
-
-    # 一、全局核心指标
-    md.append("## 一、全局核心指标驾驶舱\n")
-    md.append("| 指标 | 数值 | 状态 |")
-    md.append("|------|------|------|")
-    md.append(f"| 满期保费 | {global_kpis['满期保费']:,.2f} 万元 | ⚪ 规模 |")
-    md.append(f"| 保单件数 | {global_kpis['保单件数']:,} 件 | ⚪ 规模 |")
-    md.append(f"| 满期赔付率 | {global_kpis['赔付率']:.2f}% | {judge_status('赔付率', global_kpis['赔付率'])} |")
-    md.append(f"| 费用率 | {global_kpis['费用率']:.2f}% | {judge_status('费用率', global_kpis['费用率'])} |")
-    md.append(f"| 满期边际贡献率 | {global_kpis['边贡率']:.2f}% | {judge_status('边贡率', global_kpis['边贡率'])} |")
-    md.append("")
-
-    # 二、三级机构快速索引
-    md.append("## 二、三级机构快速索引\n")
-    md.append("| 机构 | 满期保费(万) | 占比 | 赔付率 | 边贡率 | 状态 |")
-    md.append("|------|-------------|------|--------|--------|------|")
+            result['energy_analysis'][energy_name]['business_problems'] = top3_problems
 
-    total_premium = global_kpis['满期保费']
-    for result in org_results:
-        org_kpis = result['org_kpis']
-        ratio = (org_kpis['满期保费'] / total_premium) * 100
-        status = "🟢 健康" if (org_kpis['赔付率'] < 70 and org_kpis['边贡率'] > 8) else "🔴 关注"
+        org_results.append(result)
+
+    return org_results
 
-        md.append(f"| {result['org_name']} | {org_kpis['满期保费']:,.2f} | {ratio:.1f}% | "
-                  f"{org_kpis['赔付率']:.2f}% | {org_kpis['边贡率']:.2f}% | {status} |")
 
-    md.append("")
+def drilldown_org(df_org, org_name, total_premium):
+    """对单个三级机构执行渐进式下钻分析 (df_org 为该机构的明细或立方体切片)"""
+    results = drilldown_orgs(df_org, [org_name])
+    return results[0] if results else None
 
-    # 三、三级机构深度诊断
-    md.append("## 三、三级机构深度诊断\n")
 
-    for idx, result in enumerate(org_results, 1):
-        org_name = result['org_name']
-        org_kpis = result['org_kpis']
+# ==================== 周报模板 ====================
+WEEKLY_TEMPLATES = {
+    'overview': """# {year}保单第{week}周车险业务经营周报
 
-        md.append(f"### {idx}. {org_name}\n")
+**生成时间**: {generated_at}
 
-        # 机构整体KPI
-        md.append("#### 核心指标\n")
-        md.append("| 指标 | 数值 |")
-        md.append("|------|------|")
-        md.append(f"| 满期保费 | {org_kpis['满期保费']:,.2f} 万元 |")
-        md.append(f"| 保单件数 | {org_kpis['保单件数']:,} 件 |")
-        md.append(f"| 赔案件数 | {org_kpis['赔案件数']:,} 件 |")
-        md.append(f"| 赔付率 | {org_kpis['赔付率']:.2f}% {judge_status('赔付率', org_kpis['赔付率'])} |")
-        md.append(f"| 费用率 | {org_kpis['费用率']:.2f}% {judge_status('费用率', org_kpis['费用率'])} |")
-        md.append(f"| 边贡率 | {org_kpis['边贡率']:.2f}% {judge_status('边贡率', org_kpis['边贡率'])} |")
-        md.append("")
-
-        # 能源类型分析
-        if result['energy_analysis']:
-            md.append("#### 能源类型分析\n")
-
-            for energy_name, energy_info in result['energy_analysis'].items():
-                kpis = energy_info['kpis']
-                ratio = energy_info['ratio']
-                healthy = energy_info['healthy']
-
-                status = "🟢 健康" if healthy else "🔴 有问题"
-                md.append(f"**{energy_name}** ({ratio:.1f}%占比) - {status}\n")
-                md.append(f"- 满期保费: {kpis['满期保费']:,.2f} 万元")
-                md.append(f"- 赔付率: {kpis['赔付率']:.2f}%")
-                md.append(f"- 边贡率: {kpis['边贡率']:.2f}%")
-                md.append("")
-
-                # 业务类型问题
-                if energy_info['business_problems']:
-                    md.append(f"**{energy_name}问题业务类型（TOP3）**:\n")
-
-                    for rank, problem in enumerate(energy_info['business_problems'], 1):
-                        biz_type = problem['business_type']
-                        biz_kpis = problem['kpis']
-
-                        md.append(f"{rank}. **{biz_type}**")
-                        md.append(f"   - 满期保费: {biz_kpis['满期保费']:,.2f} 万 (占{energy_name}{problem['ratio']:.1f}%)")
-                        md.append(f"   - 赔付率: {biz_kpis['赔付率']:.2f}% | 边贡率: {biz_kpis['边贡率']:.2f}%")
-
-                        # 险别下钻
-                        if problem['coverage_drilldown']:
-                            coverage_strs = [f"{c['coverage']}({c['kpis']['赔付率']:.1f}%)"
-                                           for c in problem['coverage_drilldown'][:3]]
-                            md.append(f"   - **按险别**: {' | '.join(coverage_strs)}")
-
-                        # 新转续下钻
-                        if problem['renewal_drilldown']:
-                            renewal_strs = [f"{r['renewal']}({r['kpis']['赔付率']:.1f}%)"
-                                          for r in problem['renewal_drilldown'][:3]]
-                            md.append(f"   - **按新转续**: {' | '.join(renewal_strs)}")
-
-                        md.append("")
-
-        md.append("---\n")
-
-    return "\n".join(md)
+**数据来源**: {year}保单第{week}周变动成本明细表
+
+---
+
+## 一、全局核心指标驾驶舱
+
+| 指标 | 数值 | 状态 |
+|------|------|------|
+| 满期保费 | {kpis[满期保费]:,.2f} 万元 | ⚪ 规模 |
+| 保单件数 | {kpis[保单件数]:,} 件 | ⚪ 规模 |
+| 满期赔付率 | {kpis[赔付率]:.2f}% | {status[赔付率]} |
+| 费用率 | {kpis[费用率]:.2f}% | {status[费用率]} |
+| 满期边际贡献率 | {kpis[边贡率]:.2f}% | {status[边贡率]} |
+
+## 二、三级机构快速索引
+
+| 机构 | 满期保费(万) | 占比 | 赔付率 | 边贡率 | 状态 |
+|------|-------------|------|--------|--------|------|
+{% for org in orgs %}
+| {org[org_name]} | {org[kpis][满期保费]:,.2f} | {org[ratio]:.1f}% | {org[kpis][赔付率]:.2f}% | {org[kpis][边贡率]:.2f}% | {org[status]} |
+{% endfor %}
+""",
+
+    'diagnosis_heading': """## 三、三级机构深度诊断
+""",
+
+    'org_detail': """### {index}. {org_name}
+
+#### 核心指标
+
+| 指标 | 数值 |
+|------|------|
+| 满期保费 | {kpis[满期保费]:,.2f} 万元 |
+| 保单件数 | {kpis[保单件数]:,} 件 |
+| 赔案件数 | {kpis[赔案件数]:,} 件 |
+| 赔付率 | {kpis[赔付率]:.2f}% {status[赔付率]} |
+| 费用率 | {kpis[费用率]:.2f}% {status[费用率]} |
+| 边贡率 | {kpis[边贡率]:.2f}% {status[边贡率]} |
+
+{% if energies %}
+#### 能源类型分析
+
+{% for energy in energies %}
+**{energy[name]}** ({energy[ratio]:.1f}%占比) - {energy[status]}
+
+- 满期保费: {energy[kpis][满期保费]:,.2f} 万元
+- 赔付率: {energy[kpis][赔付率]:.2f}%
+- 边贡率: {energy[kpis][边贡率]:.2f}%
+
+{% if energy[problems] %}
+**{energy[name]}问题业务类型（TOP3）**:
+
+{% for problem in energy[problems] %}
+{loop.index}. **{problem[business_type]}**
+   - 满期保费: {problem[kpis][满期保费]:,.2f} 万 (占{energy[name]}{problem[ratio]:.1f}%)
+   - 赔付率: {problem[kpis][赔付率]:.2f}% | 边贡率: {problem[kpis][边贡率]:.2f}%
+{% if problem[coverage_text] %}
+   - **按险别**: {problem[coverage_text]}
+{% endif %}
+{% if problem[renewal_text] %}
+   - **按新转续**: {problem[renewal_text]}
+{% endif %}
+
+{% endfor %}
+{% endif %}
+{% endfor %}
+{% endif %}
+---
+""",
+}
+
+
+# ==================== Markdown生成函数 ====================
+def kpi_status(kpis):
+    """赔付率/费用率/边贡率的评级标签"""
+    return {name: judge_status(name, kpis[name]) for name in ('赔付率', '费用率', '边贡率')}
+
+
+def org_detail_model(index, result):
+    """单个机构诊断章节的数据模型"""
+    energies = []
+    for energy_name, energy_info in (result['energy_analysis'] or {}).items():
+        problems = []
+        for problem in energy_info['business_problems']:
+            coverage_text = ' | '.join(f"{c['coverage']}({c['kpis']['赔付率']:.1f}%)"
+                                       for c in problem['coverage_drilldown'][:3])
+            renewal_text = ' | '.join(f"{r['renewal']}({r['kpis']['赔付率']:.1f}%)"
+                                      for r in problem['renewal_drilldown'][:3])
+            problems.append(dict(problem, coverage_text=coverage_text, renewal_text=renewal_text))
+
+        energies.append({
+            'name': energy_name,
+            'ratio': energy_info['ratio'],
+            'status': "🟢 健康" if energy_info['healthy'] else "🔴 有问题",
+            'kpis': energy_info['kpis'],
+            'problems': problems
+        })
+
+    return {
+        'index': index,
+        'org_name': result['org_name'],
+        'kpis': result['org_kpis'],
+        'status': kpi_status(result['org_kpis']),
+        'energies': energies
+    }
+
+
+def weekly_sections(year, week, global_kpis, org_results):
+    """周报各章节 [(模板名, 数据模型), ...]; 每个机构诊断为独立章节"""
+    total_premium = global_kpis['满期保费']
+    orgs = [
+        {
+            'org_name': result['org_name'],
+            'kpis': result['org_kpis'],
+            'ratio': (result['org_kpis']['满期保费'] / total_premium) * 100,
+            'status': "🟢 健康" if (result['org_kpis']['赔付率'] < 70 and result['org_kpis']['边贡率'] > 8) else "🔴 关注"
+        }
+        for result in org_results
+    ]
+
+    overview = {
+        'year': year,
+        'week': week,
+        'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'kpis': global_kpis,
+        'status': kpi_status(global_kpis),
+        'orgs': orgs
+    }
+
+    return ([('overview', overview), ('diagnosis_heading', {})]
+            + [('org_detail', org_detail_model(idx, result)) for idx, result in enumerate(org_results, 1)])
 
 
 # ==================== 主程序 ====================
-def main():
+def main(target_week=TARGET_WEEK, data_folder=DATA_FOLDER, output_folder=OUTPUT_FOLDER,
+         metrics_table=ENABLE_METRICS_TABLE, use_report_manifest=ENABLE_REPORT_MANIFEST):
+    """生成指定周次的经营周报 (参数默认取模块配置, 供命令行入口覆盖)"""
+    data_folder = Path(data_folder)
+    output_folder = Path(output_folder)
+    recorder = RunRecorder('weekly', live=metrics_table)
+
+    # 创建输出目录
+    output_folder.mkdir(parents=True, exist_ok=True)
+    manifest = ReportManifest(output_folder, enabled=use_report_manifest)
+
     print("="*60)
-    print(f"📊 开始生成第{TARGET_WEEK}周车险业务经营周报")
+    print(f"📊 开始生成第{target_week}周车险业务经营周报")
     print("="*60)
 
     for year in ['2024', '2025']:
-        file_path = DATA_FOLDER / f"{year}保单第{TARGET_WEEK}周变动成本明细表.csv"
+        file_path = data_folder / f"{year}保单第{target_week}周变动成本明细表.csv"
 
         if not file_path.exists():
             print(f"\n⚠️  {year}保单数据文件不存在: {file_path}")
@@ -309,43 +377,52 @@ def main():
         print(f"{'='*40}")
 
         # 读取数据
-        df = pd.read_csv(file_path, encoding='utf-8-sig')
-        df = df[df['third_level_organization'] != '本部'].copy()
+        # 读取时即剔除本部
+        with recorder.stage(f"{year}_load") as record:
+            df = read_detail_csv(file_path, predicates=(exclude_headquarters,))
+            record['output_rows'] = len(df)
         print(f"✅ 数据加载: {len(df)}行")
 
+        # 预聚合可加指标, 后续下钻均在立方体上汇总
+        with recorder.stage(f"{year}_cube", len(df)) as record:
+            cube = build_cube(df)
+            record['output_rows'] = len(cube)
+        print(f"✅ 指标立方体: {len(cube)}个维度组合")
+
         # 计算全局KPI
-        global_kpis = calculate_kpis(df)
+        global_kpis = calculate_kpis(cube)
         print(f"✅ 全局KPI: 满期保费{global_kpis['满期保费']:,.2f}万, "
               f"赔付率{global_kpis['赔付率']:.2f}%, 边贡率{global_kpis['边贡率']:.2f}%")
 
         # 获取三级机构列表
-        third_orgs = sorted(df['third_level_organization'].unique())
+        third_orgs = sorted(cube['third_level_organization'].dropna().unique())
         print(f"✅ 三级机构: {len(third_orgs)}个")
 
-        # 对每个三级机构执行下钻
+        # 对全部三级机构一次性下钻
         print(f"\n开始下钻分析...")
-        org_results = []
-
-        for org_name in third_orgs:
-            df_org = df[df['third_level_organization'] == org_name]
-            if len(df_org) == 0:
-                continue
-
-            result = drilldown_org(df_org, org_name, global_kpis['满期保费'])
-            org_results.append(result)
-            print(f"  ✓ {org_name}: 满期保费{result['org_kpis']['满期保费']:.2f}万")
+        with recorder.stage(f"{year}_drilldown", len(cube)) as record:
+            org_results = drilldown_orgs(cube, third_orgs)
+            record['output_rows'] = len(org_results)
+        for result in org_results:
+            print(f"  ✓ {result['org_name']}: 满期保费{result['org_kpis']['满期保费']:.2f}万")
 
         # 生成Markdown
         print(f"\n生成Markdown周报...")
-        markdown_content = generate_markdown(year, TARGET_WEEK, global_kpis, org_results)
-
-        # 保存文件
-        output_file = OUTPUT_FOLDER / f"{year}保单第{TARGET_WEEK}周经营周报.md"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(markdown_content)
-
-        print(f"✅ 周报已生成: {output_file}")
-        print(f"   文件大小: {len(markdown_content):,} 字符")
+        # 仅渲染并重写数据变化的章节 (如单个机构的下钻明细)
+        output_name = f"{year}保单第{target_week}周经营周报.md"
+        with recorder.stage(f"{year}_markdown", len(org_results)):
+            sections = weekly_sections(year, target_week, global_kpis, org_results)
+            changed = manifest.write(output_name, WEEKLY_TEMPLATES, sections, joiner="\n")
+
+        if changed:
+            print(f"✅ 周报已生成: {output_folder / output_name}")
+            print(f"   变化章节: {', '.join(changed)}")
+        else:
+            print(f"✓  周报无变化: {output_folder / output_name}")
+
+    manifest.save()
+    record_path = recorder.write(output_folder, f"第{target_week}周")
+    print(f"\n⏱️  运行记录: {record_path.name} (总耗时{recorder.summary()['seconds']:.1f}秒)")
 
     print("\n" + "="*60)
     print("✅ 所有周报生成完成！")
@@ -18,14 +18,30 @@ new-energy-truck → mckinsey-framework → report-assembler
 
 import pandas as pd
 import numpy as np
+import hashlib
 import json
 import pickle
+from functools import partial
 from pathlib import Path
 from datetime import datetime, timedelta
 import re
 import warnings
 warnings.filterwarnings('ignore')
 
+from data_io import ColumnarCache, concat_frames, file_digest, iter_detail_chunks, map_weeks, read_week_file
+from data_schema import exclude_headquarters, new_energy_truck
+from kpi_grading import grade_config_digest, load_grader
+from kpi_cube import build_cube, combine_cubes, diff_cubes, parent_shares, rollup, weekly_kpi_matrix
+from loss_decomposition import FACTOR_LABELS, attribute_window, decompose_loss_ratio, rank_drivers
+from pipeline import Pipeline, source_fingerprint
+from report_fanout import fan_out, slice_label, split_weekly_data
+from problem_slices import DRILL_DIMENSIONS, score_slices, top_k_positions, top_k_within
+from report_manifest import ReportManifest, frames_digest
+from run_metrics import RunRecorder, measure_call
+from yoy_comparison import YOY_TEMPLATES, stack_years, yoy_compare, yoy_sections
+from slice_analytics import ANOMALY_RULES, batch_trend, scan_anomalies
+from weekly_warehouse import WeeklyWarehouse
+
 # =======================================
 # V2.0 配置参数
 # =======================================
@@ -39,15 +55,36 @@ LOOKBACK_WEEKS = 5     # 趋势分析回溯周数
 ENABLE_TREND_TRACKING = True      # 启用趋势追踪
 ENABLE_NEW_ENERGY_TRUCK = True    # 启用新能源货车分析
 ENABLE_MCKINSEY_FRAMEWORK = True  # 启用麦肯锡框架
+ENABLE_YOY_COMPARISON = True      # 启用保单年度同比对比
+ENABLE_ORG_REPORTS = False        # 启用分报告扇出 (每个切片单独一份趋势追踪报告)
 
 # 质量阈值
 TOLERANCE_MISSING = 0.2      # 缺失数据容忍度
 OUTLIER_THRESHOLD = 3.0      # 异常值检测阈值
+ANOMALY_JUMP_RATIO = 1.5     # 单周突增倍数
+ANOMALY_RUN_WEEKS = 3        # 连续恶化周数
+PROBLEM_TOP_ORGS = 3         # 问题机构数
+PROBLEM_TOP_BUSINESSES = 3   # 每个问题机构列示的问题业务数
+PROBLEM_MIN_SHARE = 0.01     # 问题业务最低占机构保费比例
+PROBLEM_TIES = 'first'       # 同分处理: first = 按出现顺序取满K个, all = 第K名同分全部保留
 QUALITY_SCORE_THRESHOLD = 70  # 数据质量评分阈值
 
 # 输出配置
 OUTPUT_FOLDER = "周报"
 CACHE_FOLDER = ".cache"
+ENABLE_DATA_CACHE = True     # 启用明细表列式缓存
+LOAD_WORKERS = 1             # 并行加载进程数 (1 = 串行)
+ENABLE_STREAMING = False     # 流式分块加载: 明细逐块预处理后直接汇入立方体, 内存以块大小为上限 (超大文件)
+STREAM_CHUNK_ROWS = 200_000  # 流式加载每块行数
+ENABLE_WAREHOUSE = True      # 启用周度数据仓库 (新周次仅入库一次, 历史周次读取分区)
+WAREHOUSE_FOLDER = f"{CACHE_FOLDER}/warehouse"  # 多个数据目录共用, 目录项按源文件绝对路径隔离
+ENABLE_PIPELINE_CACHE = True  # 启用阶段结果缓存 (指纹未变的阶段不重算)
+PIPELINE_FOLDER = f"{CACHE_FOLDER}/pipeline"
+ENABLE_REPORT_MANIFEST = True  # 启用章节清单 (只重写输入变化的章节与报告, 见 report_manifest)
+ENABLE_METRICS_TABLE = False  # 控制台实时打印各阶段耗时/内存表 (运行记录JSON始终写出)
+ORG_REPORT_FOLDER = "机构分报告"  # 分报告子目录 (位于输出目录下)
+ORG_REPORT_BY = ('third_level_organization',)  # 分报告切片维度, 如加 'business_type_category' 则按机构×业务类型
+REPORT_WORKERS = 1           # 分报告渲染进程数 (1 = 串行)
 
 # =======================================
 # V2.0 数据加载器 (增强版)
@@ -56,13 +93,31 @@ CACHE_FOLDER = ".cache"
 class InsuranceDataLoaderV2:
     """V2.0数据加载器 - 智能周期管理 + 当周值计算"""
     
-    def __init__(self, data_folder="处理后/"):
-        self.data_folder = Path(".")  # 数据文件在当前目录
+    def __init__(self, data_folder=".", use_cache=ENABLE_DATA_CACHE, use_warehouse=ENABLE_WAREHOUSE, recorder=None):
+        self.data_folder = Path(data_folder)  # 默认数据文件在当前目录
+        self.recorder = recorder  # run_metrics.RunRecorder (可选)
         self.available_weeks = []
         self.analysis_period = {}
+        self.cache = ColumnarCache(CACHE_FOLDER) if use_cache else None
+        self.warehouse = WeeklyWarehouse(WAREHOUSE_FOLDER, self.data_folder) if use_warehouse else None
+    
+    def sync_warehouse(self):
+        """增量入库: 仅解析新增或内容变更的周度文件"""
+        if self.warehouse is None:
+            return []
+        
+        ingested = self.warehouse.sync(transform=self.preprocess_frame)
+        for week, file_name in ingested:
+            print(f"📥 入库第{week}周: {file_name}")
+        
+        return ingested
         
     def detect_available_weeks(self):
-        """检测所有可用周次"""
+        """检测所有可用周次 (启用数据仓库时读取目录)"""
+        if self.warehouse is not None:
+            self.available_weeks = set(self.warehouse.available_weeks())
+            return sorted(self.available_weeks)
+        
         pattern = "*保单第*周变动成本明细表.csv"
         self.available_weeks = set()
         
@@ -115,85 +170,160 @@ class InsuranceDataLoaderV2:
         
         return self.analysis_period
     
-    def load_data_files(self, weeks_to_load):
-        """加载数据文件"""
+    def load_data_files(self, weeks_to_load, workers=1, preprocess=False):
+        """加载数据文件 (workers>1 时多进程并行读取, preprocess=True 时在读取进程内完成预处理)"""
         loaded_data = {}
         load_errors = []
         
+        if self.warehouse is not None:
+            # 数据仓库分区已完成预处理
+            load_week = partial(_load_warehouse_week, warehouse_root=str(self.warehouse.root),
+                                data_folder=str(self.warehouse.data_folder))
+        else:
+            load_week = partial(
+                _load_week_files,
+                data_folder=str(self.data_folder),
+                use_cache=self.cache is not None,
+                preprocess=preprocess
+            )
+        if self.recorder is not None:
+            # 在读取进程内计量, 指标随结果返回
+            load_week = partial(measure_call, load_week)
+        results = map_weeks(load_week, weeks_to_load, workers)
+        
         for week in weeks_to_load:
-            pattern = f"*保单第{week}周变动成本明细表.csv"
-            matching_files = list(self.data_folder.glob(pattern))
-            
-            if not matching_files:
-                load_errors.append(f"第{week}周: 未找到文件")
-                continue
-            
-            week_data = []
-            for file in matching_files:
-                try:
-                    df = pd.read_csv(file, encoding='utf-8-sig')
-                    df['week_number'] = week
-                    df['data_source'] = file.name
-                    week_data.append(df)
-                except Exception as e:
-                    print(f"❌ 加载 {file.name} 失败: {e}")
-                    load_errors.append(f"第{week}周: {str(e)}")
+            if self.recorder is not None:
+                (combined_df, week_errors), metrics = results[week]
+                self.recorder.add(
+                    f"load_week_{week}", metrics,
+                    output_rows=None if combined_df is None else len(combined_df),
+                    status='ok' if combined_df is not None else 'missing'
+                )
+            else:
+                combined_df, week_errors = results[week]
+            load_errors.extend(week_errors)
             
-            if week_data:
-                combined_df = pd.concat(week_data, ignore_index=True)
+            if combined_df is not None:
                 loaded_data[week] = combined_df
                 print(f"✅ 第{week}周: 成功加载 {len(combined_df)} 行数据")
         
         return loaded_data, load_errors
     
+    def stream_data_files(self, weeks_to_load, workers=1, chunksize=STREAM_CHUNK_ROWS):
+        """流式加载: 逐块读取、预处理并汇入立方体, 明细仅保留新能源货车行 (供专项分析)
+
+        返回 (各周新能源货车明细, 各周立方体, 错误列表); 不经列式缓存与数据仓库,
+        立方体与整表加载构建的结果一致。
+        """
+        stream_week = partial(_stream_week_files, data_folder=str(self.data_folder), chunksize=chunksize)
+        if self.recorder is not None:
+            stream_week = partial(measure_call, stream_week)
+        results = map_weeks(stream_week, weeks_to_load, workers)
+        
+        details, cubes, load_errors = {}, {}, []
+        for week in weeks_to_load:
+            if self.recorder is not None:
+                (streamed, week_errors), metrics = results[week]
+                self.recorder.add(
+                    f"stream_week_{week}", metrics,
+                    output_rows=None if streamed is None else streamed[2],
+                    status='ok' if streamed is not None else 'missing'
+                )
+            else:
+                streamed, week_errors = results[week]
+            load_errors.extend(week_errors)
+            
+            if streamed is not None:
+                cubes[week], details[week], row_count = streamed
+                print(f"✅ 第{week}周: 流式汇总 {row_count} 行数据 → {len(cubes[week])}个维度组合")
+        
+        return details, cubes, load_errors
+    
+    def input_digests(self, weeks):
+        """各周源文件内容哈希 (流水线输入指纹)"""
+        digests = {}
+        for week in weeks:
+            if self.warehouse is not None:
+                digests[week] = self.warehouse.week_digests(week)
+                continue
+            
+            pattern = f"*保单第{week}周变动成本明细表.csv"
+            digests[week] = {
+                file.name: self.cache.digest(file) if self.cache is not None else file_digest(file)
+                for file in sorted(self.data_folder.glob(pattern))
+            }
+        
+        return digests
+    
     def preprocess_data(self, loaded_data):
         """数据预处理"""
         for week, df in loaded_data.items():
             print(f"\n🔧 预处理第{week}周数据...")
             
-            # 过滤本部
-            original_count = len(df)
-            df_filtered = df[df['third_level_organization'] != '本部'].copy()
-            
-            # 年度分组
-            df_filtered['policy_year'] = df_filtered['policy_start_year'].astype(str).str.extract(r'(202[45])')[0]
-            
-            # 数据类型标准化
-            numeric_cols = ['signed_premium_yuan', 'matured_premium_yuan', 'reported_claim_payment_yuan', 
-                           'expense_amount_yuan', 'claim_case_count']
-            for col in numeric_cols:
-                df_filtered[col] = pd.to_numeric(df_filtered[col], errors='coerce').fillna(0)
+            if self.recorder is not None:
+                with self.recorder.stage(f"preprocess_week_{week}", len(df)) as record:
+                    df_filtered = self.preprocess_frame(df)
+                    record['output_rows'] = len(df_filtered)
+            else:
+                df_filtered = self.preprocess_frame(df)
             
             loaded_data[week] = df_filtered
             print(f"  - 过滤后: {len(df_filtered)} 行数据")
         
         return loaded_data
     
-    def calculate_weekly_values(self, loaded_data, analysis_weeks):
-        """计算当周发生值"""
+    @staticmethod
+    def preprocess_frame(df):
+        """单周数据预处理: 过滤本部、年度分组、数值标准化"""
+        # 过滤本部 (读取时已下推筛选则无需再复制)
+        keep_mask = exclude_headquarters(df)
+        df_filtered = df if keep_mask.all() else df[keep_mask].copy()
+        
+        # 年度分组
+        df_filtered['policy_year'] = df_filtered['policy_start_year'].astype(str).str.extract(r'(202[45])')[0]
+        
+        # 数据类型标准化
+        numeric_cols = ['signed_premium_yuan', 'matured_premium_yuan', 'reported_claim_payment_yuan', 
+                       'expense_amount_yuan', 'claim_case_count']
+        for col in numeric_cols:
+            df_filtered[col] = pd.to_numeric(df_filtered[col], errors='coerce').fillna(0)
+        
+        return df_filtered
+    
+    def calculate_weekly_values(self, loaded_data, analysis_weeks, prebuilt_cubes=None):
+        """计算当周发生值 (每周构建可加指标立方体, 相邻周按全维度对齐差分)
+
+        prebuilt_cubes 为已构建的各周立方体 (流式加载), 此时 loaded_data 仅含部分明细。
+        返回 {年度: {'cube'/'weekly': {周次: DataFrame}}}, 不含明细 (截面分析见 load_latest_detail)。
+        """
         weekly_data = {}
+        cubes = dict(prebuilt_cubes or {})
+        
+        def week_cube(week):
+            if week not in cubes:
+                cubes[week] = build_cube(loaded_data[week])
+            return cubes[week]
         
         for week in analysis_weeks:
             if week not in loaded_data:
                 continue
                 
-            current_df = loaded_data[week]
+            current_cube = week_cube(week)
             previous_week = week - 1
-            previous_df = loaded_data.get(previous_week)
             
             weekly_values = None
-            if previous_df is not None:
-                weekly_values = self._calculate_weekly_metrics(current_df, previous_df)
+            if previous_week in loaded_data:
+                weekly_values = self._calculate_weekly_metrics(current_cube, week_cube(previous_week))
             
-            # 按年度分组
+            # 按年度分组 (以立方体判断年度是否有数据)
             for year in ['2024', '2025']:
-                year_current = current_df[current_df['policy_year'] == year]
+                year_cube = current_cube[current_cube['policy_year'] == year]
                 
-                if len(year_current) > 0:
+                if len(year_cube) > 0:
                     if year not in weekly_data:
-                        weekly_data[year] = {'cumulative': {}, 'weekly': {}}
+                        weekly_data[year] = {'weekly': {}, 'cube': {}}
                     
-                    weekly_data[year]['cumulative'][week] = year_current
+                    weekly_data[year]['cube'][week] = year_cube
                     
                     if weekly_values is not None:
                         year_weekly = weekly_values[weekly_values['policy_year'] == year]
@@ -202,37 +332,123 @@ class InsuranceDataLoaderV2:
         
         return weekly_data
     
-    def _calculate_weekly_metrics(self, current_df, previous_df):
-        """计算具体当周指标"""
-        # 汇总级别计算
-        current_summary = current_df.groupby('policy_year').agg({
-            'signed_premium_yuan': 'sum',
-            'matured_premium_yuan': 'sum',
-            'reported_claim_payment_yuan': 'sum',
-            'claim_case_count': 'sum',
-            'expense_amount_yuan': 'sum'
-        }).reset_index()
-        
-        previous_summary = previous_df.groupby('policy_year').agg({
-            'signed_premium_yuan': 'sum',
-            'matured_premium_yuan': 'sum',
-            'reported_claim_payment_yuan': 'sum',
-            'claim_case_count': 'sum',
-            'expense_amount_yuan': 'sum'
-        }).reset_index()
-        
-        # 计算当周值
-        weekly_summary = current_summary.copy()
-        for col in ['signed_premium_yuan', 'matured_premium_yuan', 'reported_claim_payment_yuan', 'expense_amount_yuan']:
-            weekly_summary[col] = current_summary[col] - previous_summary[col]
+    @staticmethod
+    def latest_weeks(weekly_data):
+        """各年度最新周次"""
+        return {year: max(year_data['cube']) for year, year_data in weekly_data.items() if year_data.get('cube')}
+    
+    def load_latest_detail(self, weekly_data, workers=1, streaming=False, chunksize=STREAM_CHUNK_ROWS, loaded=None):
+        """各年度最新周明细 {年度: {'cumulative': {周次: 明细}}} (新能源货车等截面分析按需读取, 不随周度数据缓存)
+
+        loaded 为本次运行已加载的 {周次: 明细}, 其中已有的周次不再读取; 流式加载时明细仅含新能源货车行。
+        """
+        latest = self.latest_weeks(weekly_data)
+        loaded = dict(loaded or {})
+        missing = sorted(set(latest.values()) - set(loaded))
+        if missing:
+            if streaming:
+                details, _, _ = self.stream_data_files(missing, workers, chunksize)
+            else:
+                details, _ = self.load_data_files(missing, workers=workers, preprocess=True)
+            loaded.update(details)
+        
+        return {
+            year: {'cumulative': {week: loaded[week][loaded[week]['policy_year'] == year]}}
+            for year, week in latest.items() if week in loaded
+        }
+    
+    def _calculate_weekly_metrics(self, current_cube, previous_cube):
+        """计算具体当周指标 (立方体全维度粒度, 含新增/消失组合)"""
+        weekly_cube = diff_cubes(current_cube, previous_cube)
         
         # 计算案均赔款
-        weekly_summary['avg_claim_amount'] = (
-            weekly_summary['reported_claim_payment_yuan'] / 
-            weekly_summary['claim_case_count'].replace(0, 1)
+        weekly_cube['avg_claim_amount'] = (
+            weekly_cube['reported_claim_payment_yuan'] / 
+            weekly_cube['claim_case_count'].replace(0, 1)
         )
         
-        return weekly_summary
+        return weekly_cube
+
+def _load_week_files(week, data_folder, use_cache, preprocess):
+    """读取单周全部明细文件 (模块级函数, 供进程池调用)"""
+    pattern = f"*保单第{week}周变动成本明细表.csv"
+    matching_files = sorted(Path(data_folder).glob(pattern))
+    
+    if not matching_files:
+        return None, [f"第{week}周: 未找到文件"]
+    
+    cache = ColumnarCache(CACHE_FOLDER) if use_cache else None
+    week_data = []
+    week_errors = []
+    for file in matching_files:
+        try:
+            # 读取时即剔除本部
+            df = read_week_file(file, week, cache, predicates=(exclude_headquarters,))
+            week_data.append(df)
+        except Exception as e:
+            print(f"❌ 加载 {file.name} 失败: {e}")
+            week_errors.append(f"第{week}周: {str(e)}")
+    
+    if not week_data:
+        return None, week_errors
+    
+    combined_df = concat_frames(week_data)
+    if preprocess:
+        combined_df = InsuranceDataLoaderV2.preprocess_frame(combined_df)
+    
+    return combined_df, week_errors
+
+def _stream_week_files(week, data_folder, chunksize=STREAM_CHUNK_ROWS):
+    """流式读取单周全部明细文件 (模块级函数, 供进程池调用)
+
+    逐块: 剔除本部 → 预处理 → 构建块立方体并合并; 明细只保留新能源货车行。
+    返回 ((立方体, 新能源货车明细, 汇总行数), 错误列表); 读取失败的文件整体不计入。
+    """
+    pattern = f"*保单第{week}周变动成本明细表.csv"
+    matching_files = sorted(Path(data_folder).glob(pattern))
+    
+    if not matching_files:
+        return None, [f"第{week}周: 未找到文件"]
+    
+    file_cubes = []
+    trucks = []
+    row_count = 0
+    week_errors = []
+    for file in matching_files:
+        try:
+            cube = None
+            file_trucks = []
+            file_rows = 0
+            for chunk in iter_detail_chunks(file, predicates=(exclude_headquarters,), chunksize=chunksize):
+                chunk['week_number'] = np.int16(week)
+                chunk['data_source'] = pd.Series(file.name, index=chunk.index, dtype='category')
+                chunk = InsuranceDataLoaderV2.preprocess_frame(chunk)
+                cube = combine_cubes([cube, build_cube(chunk)])
+                file_trucks.append(chunk[new_energy_truck(chunk)])
+                file_rows += len(chunk)
+        except Exception as e:
+            print(f"❌ 流式加载 {file.name} 失败: {e}")
+            week_errors.append(f"第{week}周: {str(e)}")
+            continue
+        
+        if cube is not None:
+            file_cubes.append(cube)
+            trucks.extend(file_trucks)
+            row_count += file_rows
+    
+    if not file_cubes:
+        return None, week_errors
+    
+    kept = [df for df in trucks if len(df) > 0] or trucks[:1]
+    detail = concat_frames(kept) if len(kept) > 1 else kept[0].reset_index(drop=True)
+    return (combine_cubes(file_cubes), detail, row_count), week_errors
+
+def _load_warehouse_week(week, warehouse_root, data_folder):
+    """从数据仓库读取数据目录的单周分区 (模块级函数, 供进程池调用)"""
+    df = WeeklyWarehouse(warehouse_root, data_folder).load_week(week)
+    if df is None:
+        return None, [f"第{week}周: 数据仓库无分区"]
+    return df, []
 
 # =======================================
 # V2.0 KPI计算器 (趋势增强版)
@@ -243,6 +459,7 @@ class InsuranceKpiCalculatorV2:
     
     def __init__(self):
         self.kpi_definitions = self._load_kpi_definitions()
+        self.grader = load_grader()  # 五级评级 (率值指标区间状态值配置)
     
     def _load_kpi_definitions(self):
         """加载KPI定义和阈值"""
@@ -256,7 +473,7 @@ class InsuranceKpiCalculatorV2:
         }
     
     def calculate_kpis(self, df, period_type='cumulative'):
-        """计算KPI指标"""
+        """计算KPI指标 (df 可为明细或立方体, 均为可加指标求和)"""
         if len(df) == 0:
             return {}
         
@@ -296,12 +513,12 @@ class InsuranceKpiCalculatorV2:
         }
         
         # 状态判断
-        kpis['赔付率状态'] = self._judge_loss_ratio_status(loss_ratio)
-        kpis['边贡率状态'] = self._judge_contribution_status(contribution_margin)
+        kpis['赔付率状态'] = self.grader.status('loss_ratio', loss_ratio)
+        kpis['边贡率状态'] = self.grader.status('contribution_margin_ratio', contribution_margin)
         
         return kpis
     
-    def calculate_trend_kpis(self, weekly_data):
+    def calculate_trend_kpis(self, weekly_data, missing_weeks=()):
         """计算趋势KPI"""
         trend_analysis = {}
         
@@ -326,35 +543,26 @@ class InsuranceKpiCalculatorV2:
             
             # 趋势洞察
             trend_analysis[year]['trend_insights'] = self._analyze_trends(trend_analysis[year]['weekly_kpis'])
+            
+            # 机构×业务类型切片的赔付率趋势 (累计口径)
+            trend_analysis[year]['slice_trends'] = self.rank_slice_trends(
+                weekly_data[year].get('cube', {}),
+                ['third_level_organization', 'business_type_category'],
+                missing_weeks
+            )
+            
+            # 赔付率变动因素分解 (机构 / 机构×业务类型)
+            trend_analysis[year]['loss_decomposition'] = {
+                'organization': self.decompose_slice_loss_ratios(
+                    weekly_data[year].get('cube', {}), ['third_level_organization']
+                ),
+                'slices': self.decompose_slice_loss_ratios(
+                    weekly_data[year].get('cube', {}), ['third_level_organization', 'business_type_category']
+                )
+            }
         
         return trend_analysis
     
-    def _judge_loss_ratio_status(self, loss_ratio):
-        """判断赔付率状态"""
-        if loss_ratio < 50:
-            return "优秀"
-        elif loss_ratio < 60:
-            return "良好"
-        elif loss_ratio < 70:
-            return "中等"
-        elif loss_ratio < 80:
-            return "预警"
-        else:
-            return "危险"
-    
-    def _judge_contribution_status(self, contribution_margin):
-        """判断边际贡献率状态"""
-        if contribution_margin > 12:
-            return "优秀"
-        elif contribution_margin > 8:
-            return "良好"
-        elif contribution_margin > 6:
-            return "中等"
-        elif contribution_margin > 4:
-            return "预警"
-        else:
-            return "危险"
-    
     def _analyze_trends(self, weekly_kpis):
         """分析趋势特征"""
         if len(weekly_kpis) < 3:
@@ -382,25 +590,54 @@ class InsuranceKpiCalculatorV2:
         if len(values) < 2:
             return {"direction": "stable", "change": 0}
         
-        # 简单线性趋势
-        x = list(range(len(values)))
-        slope = np.polyfit(x, values, 1)[0]
-        
-        avg_change = (values[-1] - values[0]) / len(values)
-        
-        if slope > 0.5:
-            direction = "上升"
-        elif slope < -0.5:
-            direction = "下降"
-        else:
-            direction = "稳定"
+        # 简单线性趋势 (单切片批量计算)
+        trend = self.calculate_batch_trends([values]).iloc[0]
         
         return {
-            "direction": direction,
-            "slope": round(slope, 3),
-            "avg_weekly_change": round(avg_change, 2)
+            "direction": trend['direction'],
+            "slope": round(trend['slope'], 3),
+            "avg_weekly_change": round(trend['avg_weekly_change'], 2)
         }
     
+    def calculate_batch_trends(self, matrix, missing_weeks=()):
+        """批量计算 (切片 × 周次) 矩阵的线性趋势, 返回斜率/截距/R²/周均变化/方向"""
+        trends = batch_trend(matrix, missing_weeks=missing_weeks)
+        trends['direction'] = np.select(
+            [trends['slope'] > 0.5, trends['slope'] < -0.5],
+            ['上升', '下降'],
+            default='稳定'
+        )
+        return trends
+    
+    def rank_slice_trends(self, cubes, by, missing_weeks=(), min_share=0.01):
+        """按赔付率恶化速度对切片排序 (剔除最新周占上级保费不足 min_share 的切片)"""
+        if len(cubes) < 2:
+            return pd.DataFrame()
+        
+        matrix = weekly_kpi_matrix(
+            cubes, by, 'reported_claim_payment_yuan', 'matured_premium_yuan', smoothing=1
+        )
+        trends = self.calculate_batch_trends(matrix, missing_weeks)
+        
+        # 占比按上一层级(首个维度)计算, 与下钻的1%规则一致
+        share = parent_shares(cubes[max(cubes)], by)
+        trends['premium_share'] = share.reindex(trends.index).to_numpy()
+        trends['latest_loss_ratio'] = matrix.iloc[:, -1].to_numpy()
+        trends['latest_grade'] = self.grader.labels('loss_ratio', trends['latest_loss_ratio'])
+        
+        trends = trends[(trends['n_weeks'] >= 2) & (trends['premium_share'] >= min_share)]
+        return trends.sort_values('slope', ascending=False, kind='stable')
+    
+    def decompose_slice_loss_ratios(self, cubes, by, min_share=0.01):
+        """切片赔付率变动分解为 频度×案均×单均 三项效应 (逐周对分解后累加为窗口, 剔除占上级保费不足 min_share 的切片)"""
+        if len(cubes) < 2:
+            return pd.DataFrame()
+        
+        window = attribute_window(decompose_loss_ratio(cubes, by), by)
+        share = parent_shares(cubes[max(cubes)], by)
+        window = window.join(share.rename('premium_share'), on=by)
+        return window[window['premium_share'] >= min_share].reset_index(drop=True)
+    
     def _analyze_volatility(self, values):
         """分析波动性"""
         if len(values) < 3:
@@ -417,28 +654,33 @@ class InsuranceKpiCalculatorV2:
         }
     
     def _detect_anomalies(self, weekly_kpis):
-        """检测异常"""
+        """检测异常 (案均赔款单周突增)"""
         anomalies = []
         weeks = sorted(weekly_kpis.keys())
-        
-        for i, week in enumerate(weeks):
-            current = weekly_kpis[week]
-            
-            # 检测案均赔款异常
-            if i > 0:
-                prev_avg = weekly_kpis[weeks[i-1]]['案均赔款']
-                curr_avg = current['案均赔款']
-                
-                if prev_avg > 0 and curr_avg > prev_avg * 1.5:
-                    anomalies.append({
-                        "week": week,
-                        "type": "案均赔款突增",
-                        "value": curr_avg,
-                        "previous": prev_avg,
-                        "change_ratio": round((curr_avg - prev_avg) / prev_avg, 2)
-                    })
+        matrix = pd.DataFrame([[weekly_kpis[w]['案均赔款'] for w in weeks]], columns=weeks)
+        
+        # 仅取单周突增 (下游按"案均赔款突增"消费; 离群/连续恶化/反转见趋势追踪的深度异常分析)
+        hits = self.scan_kpi_anomalies(matrix)
+        for _, hit in hits[hits['rule'] == 'jump'].iterrows():
+            anomalies.append({
+                "week": hit['week'],
+                "type": "案均赔款突增",
+                "value": hit['value'],
+                "previous": hit['reference'],
+                "change_ratio": round((hit['value'] - hit['reference']) / hit['reference'], 2)
+            })
         
         return anomalies
+    
+    def scan_kpi_anomalies(self, matrix, higher_is_worse=True):
+        """对 (切片 × 周次) KPI矩阵执行多规则异常扫描 (突增/离群/连续恶化/反转)"""
+        return scan_anomalies(
+            matrix,
+            jump_ratio=ANOMALY_JUMP_RATIO,
+            z_threshold=OUTLIER_THRESHOLD,
+            run_weeks=ANOMALY_RUN_WEEKS,
+            higher_is_worse=higher_is_worse
+        )
 
 # =======================================
 # V2.0 趋势追踪器 (麦肯锡级)
@@ -448,10 +690,8 @@ class InsuranceLossTrendTrackerV2:
     """V2.0趋势追踪器 - 麦肯锡级专业分析"""
     
     def __init__(self):
-        self.risk_thresholds = {
-            'loss_ratio': {'excellent': 60, 'good': 70, 'warning': 80},
-            'trend_slope': {'improving': -1, 'stable': 1, 'deteriorating': 1}
-        }
+        self.calculator = InsuranceKpiCalculatorV2()
+        self.grader = self.calculator.grader
     
     def analyze_trends(self, data_by_year, trend_kpis):
         """主分析函数"""
@@ -463,16 +703,81 @@ class InsuranceLossTrendTrackerV2:
             
             weekly_kpis = trend_kpis[year]['weekly_kpis']
             trend_insights = trend_kpis[year]['trend_insights']
+            decomposition = trend_kpis[year].get('loss_decomposition', {})
+            
+            problem_orgs = self._identify_problem_orgs(data_by_year[year], weekly_kpis)
+            self._attach_loss_attribution(problem_orgs, decomposition.get('organization'))
             
             trend_report[year] = {
                 'executive_summary': self._generate_executive_summary(weekly_kpis, trend_insights),
-                'problem_organizations': self._identify_problem_orgs(data_by_year[year], weekly_kpis),
+                'problem_organizations': problem_orgs,
+                'deteriorating_slices': self._summarize_slice_trends(trend_kpis[year].get('slice_trends')),
+                'loss_drivers': self._summarize_loss_drivers(decomposition.get('slices')),
                 'anomaly_analysis': self._deep_anomaly_analysis(weekly_kpis),
+                'slice_anomalies': self._scan_slice_anomalies(data_by_year[year]),
                 'strategic_recommendations': self._generate_mckinsey_recommendations(trend_insights)
             }
         
         return trend_report
     
+    def _summarize_slice_trends(self, slice_trends, top_n=5):
+        """提取赔付率持续上升的切片 (按斜率降序)"""
+        if slice_trends is None or len(slice_trends) == 0:
+            return []
+        
+        rising = slice_trends[slice_trends['direction'] == '上升'].head(top_n)
+        return [
+            {
+                'organization': org,
+                'business_type': business_type,
+                'slope': row['slope'],
+                'r_squared': row['r_squared'],
+                'latest_loss_ratio': row['latest_loss_ratio'],
+                'latest_grade': row['latest_grade'],
+                'premium_share': row['premium_share'] * 100
+            }
+            for (org, business_type), row in rising.iterrows()
+        ]
+    
+    def _attach_loss_attribution(self, problem_orgs, org_window):
+        """为问题机构附上窗口期赔付率变动分解 (直接取分解表, 不再扫描数据)"""
+        if org_window is None or len(org_window) == 0:
+            return
+        
+        by_org = org_window.set_index('third_level_organization')
+        for org_info in problem_orgs:
+            if org_info['organization'] not in by_org.index:
+                continue
+            row = by_org.loc[org_info['organization']]
+            org_info['loss_attribution'] = {
+                'start_week': int(row['start_week']),
+                'end_week': int(row['end_week']),
+                'delta': row['delta'],
+                'effects': {FACTOR_LABELS[factor]: row[f'{factor}_effect'] for factor in FACTOR_LABELS},
+                'residual': row['residual'],
+                'main_driver': row['main_driver']
+            }
+    
+    def _summarize_loss_drivers(self, slice_window, top_n=8):
+        """机构×业务类型赔付率变动的主要驱动因素 (按效应绝对值降序)"""
+        if slice_window is None or len(slice_window) == 0:
+            return []
+        
+        by = ['third_level_organization', 'business_type_category']
+        ranked = rank_drivers(slice_window, by, top_n)
+        return [
+            {
+                'organization': row['third_level_organization'],
+                'business_type': row['business_type_category'],
+                'factor': row['factor'],
+                'effect': row['effect'],
+                'delta': row['delta'],
+                'loss_ratio_start': row['loss_ratio_start'],
+                'loss_ratio_end': row['loss_ratio_end']
+            }
+            for _, row in ranked.iterrows()
+        ]
+    
     def _generate_executive_summary(self, weekly_kpis, trend_insights):
         """生成执行摘要 (麦肯锡金字塔)"""
         if not weekly_kpis:
@@ -504,193 +809,139 @@ class InsuranceLossTrendTrackerV2:
         }
     
     def _identify_problem_orgs(self, year_data, weekly_kpis):
-        """识别问题机构 (三层下钻)"""
+        """识别问题机构 (三层下钻: 最新周立方体一次打分, 各层从同一打分表选取TopK)"""
         problem_orgs = []
         
-        # 获取最新周的数据
-        if 'cumulative' not in year_data or not year_data['cumulative']:
+        # 获取最新周的立方体
+        if 'cube' not in year_data or not year_data['cube']:
             return problem_orgs
             
-        latest_week = max(year_data['cumulative'].keys())
-        latest_data = year_data['cumulative'][latest_week]
-        
-        # Layer 1: 找出TOP3问题机构
-        org_analysis = self._analyze_by_organization(latest_data)
-        top3_problem_orgs = sorted(org_analysis, key=lambda x: x['risk_score'])[:3]
-        
-        for org_info in top3_problem_orgs:
-            org_name = org_info['organization']
-            org_df = latest_data[latest_data['third_level_organization'] == org_name]
-            
-            # Layer 2: 找出TOP3问题业务
-            business_analysis = self._analyze_by_business_type(org_df)
-            top3_business = sorted(business_analysis, key=lambda x: x['impact_score'], reverse=True)[:3]
-            
-            # Layer 3: 找出最差险别组合
-            for business_info in top3_business:
-                business_type = business_info['business_type']
-                business_df = org_df[org_df['business_type_category'] == business_type]
-                
-                coverage_analysis = self._analyze_by_coverage(business_df)
-                worst_coverage = max(coverage_analysis, key=lambda x: x['loss_ratio']) if coverage_analysis else None
-                
-                business_info['worst_coverage'] = worst_coverage
-            
-            org_info['problem_businesses'] = top3_business
-            problem_orgs.append(org_info)
-        
-        return problem_orgs
-    
-    def _analyze_by_organization(self, df):
-        """按机构分析"""
-        org_analysis = []
-        
-        for org in df['third_level_organization'].unique():
-            if pd.isna(org):
-                continue
-                
-            org_df = df[df['third_level_organization'] == org]
-            
-            if len(org_df) == 0:
-                continue
-            
-            kpis = self._calculate_org_kpis(org_df)
-            risk_score = self._calculate_risk_score(kpis)
-            
-            org_analysis.append({
-                'organization': org,
-                'risk_score': risk_score,
-                'kpis': kpis,
-                'premium_scale': org_df['matured_premium_yuan'].sum() / 10000
-            })
-        
-        return org_analysis
-    
-    def _calculate_org_kpis(self, org_df):
-        """计算机构KPI"""
-        total_premium = org_df['matured_premium_yuan'].sum()
-        total_claims = org_df['reported_claim_payment_yuan'].sum()
-        loss_ratio = (total_claims / (total_premium + 1)) * 100
-        
-        return {
-            'loss_ratio': loss_ratio,
-            'premium_scale': total_premium / 10000,
-            'claim_cases': org_df['claim_case_count'].sum(),
-            'policies': org_df['policy_count'].sum()
+        latest_week = max(year_data['cube'].keys())
+        table = score_slices(year_data['cube'][latest_week])
+        org_col, business_col, coverage_col = DRILL_DIMENSIONS
+        
+        # Layer 1: 风险评分最低的TopK机构
+        orgs = table[table['depth'] == 1].reset_index(drop=True)
+        orgs['risk_score'] = self.grader.scores('loss_ratio', orgs['loss_ratio']).round(1)
+        orgs['risk_level'] = self.grader.badges('loss_ratio', orgs['loss_ratio'])
+        orgs = orgs.iloc[top_k_positions(orgs['risk_score'], PROBLEM_TOP_ORGS, largest=False, ties=PROBLEM_TIES)]
+        
+        # Layer 2: 各问题机构内影响度最高的TopK业务 (剔除占机构保费不足 PROBLEM_MIN_SHARE 的业务)
+        businesses = table[(table['depth'] == 2) & (table['parent_share'] >= PROBLEM_MIN_SHARE)
+                           & table[org_col].isin(orgs[org_col])]
+        businesses = businesses[top_k_within(businesses, [org_col], 'impact_score', PROBLEM_TOP_BUSINESSES,
+                                             ties=PROBLEM_TIES)]
+        businesses = businesses.sort_values('impact_score', ascending=False, kind='stable')
+        
+        # Layer 3: 各问题业务内赔付率最高的险别
+        coverages = table[table['depth'] == 3]
+        coverages = coverages[top_k_within(coverages, [org_col, business_col], 'loss_ratio', 1)]
+        worst_coverages = {
+            (row[org_col], row[business_col]): {
+                'coverage_type': row[coverage_col],
+                'loss_ratio': row['loss_ratio'],
+                'premium_ratio': row['parent_share'] * 100
+            }
+            for row in coverages.to_dict('records')
         }
-    
-    def _calculate_risk_score(self, kpis):
-        """计算风险评分 (0-100, 越低越差)"""
-        loss_ratio = kpis['loss_ratio']
-        
-        # 基础状态分
-        if loss_ratio < 60:
-            status_score = 97.5
-        elif loss_ratio < 70:
-            status_score = 90
-        elif loss_ratio < 75:
-            status_score = 77.5
-        elif loss_ratio < 80:
-            status_score = 54.5
-        else:
-            status_score = 19.5
-        
-        return status_score
-    
-    def _analyze_by_business_type(self, org_df):
-        """按业务类型分析"""
-        business_analysis = []
-        
-        for business_type in org_df['business_type_category'].unique():
-            if pd.isna(business_type):
-                continue
-                
-            business_df = org_df[org_df['business_type_category'] == business_type]
-            
-            if business_df['matured_premium_yuan'].sum() < org_df['matured_premium_yuan'].sum() * 0.01:
-                continue  # 跳过占比小于1%的业务
-            
-            total_premium = business_df['matured_premium_yuan'].sum()
-            total_claims = business_df['reported_claim_payment_yuan'].sum()
-            loss_ratio = (total_claims / (total_premium + 1)) * 100
-            
-            # 计算影响度
-            org_premium = org_df['matured_premium_yuan'].sum()
-            impact_score = loss_ratio * (total_premium / org_premium)
-            
-            business_analysis.append({
-                'business_type': business_type,
-                'loss_ratio': loss_ratio,
-                'premium_ratio': (total_premium / org_premium) * 100,
-                'impact_score': impact_score,
-                'premium_amount': total_premium / 10000
-            })
-        
-        return business_analysis
-    
-    def _analyze_by_coverage(self, business_df):
-        """按险别分析"""
-        coverage_analysis = []
         
-        for coverage in business_df['coverage_type'].unique():
-            if pd.isna(coverage):
-                continue
-                
-            coverage_df = business_df[business_df['coverage_type'] == coverage]
-            
-            total_premium = coverage_df['matured_premium_yuan'].sum()
-            total_claims = coverage_df['reported_claim_payment_yuan'].sum()
-            loss_ratio = (total_claims / (total_premium + 1)) * 100
-            
-            coverage_analysis.append({
-                'coverage_type': coverage,
-                'loss_ratio': loss_ratio,
-                'premium_ratio': (total_premium / business_df['matured_premium_yuan'].sum()) * 100
+        for org in orgs.to_dict('records'):
+            org_businesses = businesses[businesses[org_col] == org[org_col]]
+            problem_orgs.append({
+                'organization': org[org_col],
+                'risk_score': org['risk_score'],
+                'risk_level': org['risk_level'],
+                'kpis': {
+                    'loss_ratio': org['loss_ratio'],
+                    'premium_scale': org['matured_premium_yuan'] / 10000,
+                    'claim_cases': org['claim_case_count'],
+                    'policies': org['policy_count']
+                },
+                'premium_scale': org['matured_premium_yuan'] / 10000,
+                'problem_businesses': [
+                    {
+                        'business_type': business[business_col],
+                        'loss_ratio': business['loss_ratio'],
+                        'premium_ratio': business['parent_share'] * 100,
+                        'impact_score': business['impact_score'],
+                        'premium_amount': business['matured_premium_yuan'] / 10000,
+                        'worst_coverage': worst_coverages.get((org[org_col], business[business_col]))
+                    }
+                    for business in org_businesses.to_dict('records')
+                ]
             })
         
-        return coverage_analysis
+        return problem_orgs
     
     def _deep_anomaly_analysis(self, weekly_kpis):
-        """深度异常分析"""
+        """深度异常分析 (年度合计的案均赔款与赔付率)"""
         anomalies = []
         weeks = sorted(weekly_kpis.keys())
+        if len(weeks) < 2:
+            return anomalies
+        
+        matrix = pd.DataFrame(
+            [[weekly_kpis[w]['案均赔款'] for w in weeks],
+             [weekly_kpis[w]['满期赔付率'] for w in weeks]],
+            index=pd.Index(['案均赔款', '满期赔付率'], name='kpi'),
+            columns=weeks
+        )
+        hits = self.calculator.scan_kpi_anomalies(matrix)
+        
+        # 案均赔款单周暴涨
+        for _, hit in hits[(hits['kpi'] == '案均赔款') & (hits['rule'] == 'jump')].iterrows():
+            curr_avg, prev_avg = hit['value'], hit['reference']
+            anomalies.append({
+                'type': '案均赔款单周暴涨',
+                'week': hit['week'],
+                'severity': 'high' if curr_avg > prev_avg * 2 else 'medium',
+                'current_value': curr_avg,
+                'previous_value': prev_avg,
+                'change_ratio': round((curr_avg - prev_avg) / prev_avg, 2),
+                'possible_causes': ['大额案件集中', '定损标准放松', '欺诈案件']
+            })
         
-        # 检查单周暴涨
-        for i in range(1, len(weeks)):
-            current_week = weeks[i]
-            current = weekly_kpis[current_week]
-            
-            # 案均赔款暴涨检测
-            prev_avg = weekly_kpis[weeks[i-1]]['案均赔款']
-            curr_avg = current['案均赔款']
-            
-            if prev_avg > 0 and curr_avg > prev_avg * 1.5:
-                anomalies.append({
-                    'type': '案均赔款单周暴涨',
-                    'week': current_week,
-                    'severity': 'high' if curr_avg > prev_avg * 2 else 'medium',
-                    'current_value': curr_avg,
-                    'previous_value': prev_avg,
-                    'change_ratio': round((curr_avg - prev_avg) / prev_avg, 2),
-                    'possible_causes': ['大额案件集中', '定损标准放松', '欺诈案件']
-                })
-        
-        # 检查连续恶化
+        # 赔付率连续恶化 (持续至最新周, 至少4周数据)
+        loss_hits = hits[hits['kpi'] == '满期赔付率']
         if len(weeks) >= 4:
-            loss_ratios = [weekly_kpis[w]['满期赔付率'] for w in weeks]
-            
-            # 检查最后3周是否连续上升
-            if all(loss_ratios[i] < loss_ratios[i+1] for i in range(-3, -1)):
+            for _, hit in loss_hits[(loss_hits['rule'] == 'run') & (loss_hits['week'] == weeks[-1])].iterrows():
+                run_weeks = int(round(hit['severity'] * ANOMALY_RUN_WEEKS))
                 anomalies.append({
                     'type': '赔付率连续恶化',
-                    'weeks_affected': weeks[-3:],
+                    'weeks_affected': weeks[-run_weeks:],
                     'severity': 'high',
-                    'trend': '连续3周上升',
-                    'change_magnitude': round(loss_ratios[-1] - loss_ratios[-3], 2)
+                    'trend': f'连续{run_weeks}周上升',
+                    'change_magnitude': round(hit['value'] - hit['reference'], 2)
                 })
         
+        # 赔付率离群与趋势反转
+        for _, hit in loss_hits[loss_hits['rule'].isin(['zscore', 'reversal'])].iterrows():
+            anomalies.append({
+                'type': f"赔付率{ANOMALY_RULES[hit['rule']]}",
+                'week': hit['week'],
+                'severity': 'high' if hit['severity'] >= 2 else 'medium',
+                'current_value': hit['value'],
+                'previous_value': round(hit['reference'], 2)
+            })
+        
         return anomalies
     
+    def _scan_slice_anomalies(self, year_data, by=('third_level_organization', 'business_type_category', 'coverage_type'),
+                              min_share=0.01):
+        """机构×业务类型×险别切片的累计赔付率异常扫描 (剔除占上级保费不足 min_share 的切片)"""
+        cubes = year_data.get('cube', {})
+        if len(cubes) < 2:
+            return pd.DataFrame()
+        
+        matrix = weekly_kpi_matrix(
+            cubes, by, 'reported_claim_payment_yuan', 'matured_premium_yuan', smoothing=1
+        )
+        share = parent_shares(cubes[max(cubes)], by).reindex(matrix.index)
+        matrix = matrix[(share >= min_share).to_numpy()]
+        
+        hits = self.calculator.scan_kpi_anomalies(matrix)
+        return hits.sort_values(['week', 'severity'], ascending=[False, False], kind='stable')
+    
     def _generate_mckinsey_recommendations(self, trend_insights):
         """生成麦肯锡级建议"""
         recommendations = {
@@ -731,7 +982,7 @@ class InsuranceLossTrendTrackerV2:
         loss_ratio = latest_kpi['满期赔付率']
         status = latest_kpi['赔付率状态']
         
-        if status in ['危险', '预警']:
+        if status in ['高危', '危险']:
             trend_direction = trend_insights.get('loss_ratio_trend', {}).get('direction', '未知')
             
             if trend_direction == '上升':
@@ -745,9 +996,9 @@ class InsuranceLossTrendTrackerV2:
         """确定立即行动"""
         status = latest_kpi['赔付率状态']
         
-        if status == '危险':
+        if status == '高危':
             return "立即暂停高风险新单承保，启动紧急风控措施"
-        elif status == '预警':
+        elif status == '危险':
             return "加强高风险业务审核，密切监控趋势变化"
         else:
             return "维持现有策略，持续监控关键指标"
@@ -772,10 +1023,7 @@ class NewEnergyTruckAnalyzer:
             latest_data = data_by_year[year]['cumulative'][latest_week]
             
             # 筛选新能源货车
-            truck_df = latest_data[
-                (latest_data['is_new_energy_vehicle'] == True) & 
-                (latest_data['business_type_category'].str.contains('货车', na=False))
-            ].copy()
+            truck_df = latest_data[new_energy_truck(latest_data)].reset_index(drop=True)
             
             if len(truck_df) == 0:
                 truck_analysis[year] = {"no_data": True}
@@ -916,58 +1164,17 @@ class NewEnergyTruckAnalyzer:
         }
 
 # =======================================
-# V2.0 报告生成器 (麦肯锡级)
+# 麦肯锡报告模板
 # =======================================
 
-class McKinseyReportGenerator:
-    """麦肯锡级报告生成器"""
-    
-    def generate_comprehensive_report(self, trend_report, new_energy_analysis, global_kpis):
-        """生成综合报告"""
-        
-        reports = {}
-        
-        for year in trend_report.keys():
-            if 'executive_summary' not in trend_report[year]:
-                continue
-                
-            # 生成年度综合报告
-            yearly_report = self._generate_yearly_report(
-                year, trend_report[year], new_energy_analysis.get(year), global_kpis
-            )
-            
-            reports[f"{year}年度"] = yearly_report
-        
-        return reports
-    
-    def _generate_yearly_report(self, year, trend_data, new_energy_data, global_kpis):
-        """生成年度报告"""
-        
-        # 报告结构
-        report_sections = [
-            self._generate_executive_summary(year, trend_data, new_energy_data),
-            self._generate_problem_analysis(year, trend_data),
-            self._generate_new_energy_section(year, new_energy_data),
-            self._generate_strategic_recommendations(year, trend_data),
-            self._generate_implementation_roadmap(year, trend_data)
-        ]
-        
-        return "\n\n".join(report_sections)
-    
-    def _generate_executive_summary(self, year, trend_data, new_energy_data):
-        """执行摘要 (金字塔原理)"""
-        
-        summary_data = trend_data['executive_summary']
-        
-        if summary_data.get('insufficient_data'):
-            return f"# {year}年度车险业务趋势追踪报告\n\n## 执行摘要\n\n数据不足，无法进行趋势分析。"
-        
-        core_conclusion = summary_data['core_conclusion']
-        key_supports = summary_data['key_supports']
-        immediate_action = summary_data['immediate_action']
-        
-        # 构建金字塔结构
-        summary = f"""# {year}年度车险业务趋势追踪报告
+MCKINSEY_TEMPLATES = {
+    'executive_summary_insufficient': """# {year}年度{scope}车险业务趋势追踪报告
+
+## 执行摘要
+
+数据不足，无法进行趋势分析。""",
+
+    'executive_summary': """# {year}年度{scope}车险业务趋势追踪报告
 
 ## 执行摘要
 
@@ -975,150 +1182,139 @@ class McKinseyReportGenerator:
 {core_conclusion}
 
 ### 关键支撑
-"""
-        
-        for i, support in enumerate(key_supports, 1):
-            summary += f"{i}. {support}\n"
-        
-        summary += f"""
+{% for support in key_supports %}
+{loop.index}. {support}
+{% endfor %}
+
 ### 立即行动建议
 {immediate_action}
 
 ---
-"""
-        
-        return summary
-    
-    def _generate_problem_analysis(self, year, trend_data):
-        """问题分析部分"""
-        
-        problem_orgs = trend_data.get('problem_organizations', [])
-        
-        analysis = f"""## 第一部分：问题机构深度诊断
+""",
 
-### 风险机构排名 (TOP3)
-"""
-        
-        for i, org_info in enumerate(problem_orgs[:3], 1):
-            org_name = org_info['organization']
-            risk_score = org_info['risk_score']
-            kpis = org_info['kpis']
-            
-            analysis += f"""
-#### {i}. {org_name} (风险评分: {risk_score}/100)
+    'problem_analysis': """## 第一部分：问题机构深度诊断
+
+### 风险机构排名 (TOP{org_count})
+{% for org in orgs %}
+
+#### {loop.index}. {org[organization]} (风险评分: {org[risk_score]}/100)
 
-**风险性质**: 🔴 严重失控 - 赔付率{kpis['loss_ratio']:.1f}%，超警戒线{kpis['loss_ratio']-80:.1f}个百分点
+**风险性质**: {org[risk_level]} - 赔付率{org[loss_ratio]:.1f}%，较高危线({high_risk_line:g}%){org[high_risk_gap]:+.1f}个百分点
 
 **核心指标**:
-- 满期保费: {kpis['premium_scale']:.2f}万元
-- 赔付率: {kpis['loss_ratio']:.1f}%
-- 赔案件数: {kpis['claim_cases']}件
-- 保单件数: {kpis['policies']}件
+- 满期保费: {org[premium_scale]:.2f}万元
+- 赔付率: {org[loss_ratio]:.1f}%
+- 赔案件数: {org[claim_cases]}件
+- 保单件数: {org[policies]}件
+{% if org[attribution] %}
+
+**赔付率变动归因** (第{org[attribution][start_week]}→{org[attribution][end_week]}周累计, {org[attribution][delta]:+.1f}pp): {org[attribution][effects_text]}；主导因素: {org[attribution][main_driver]}
+{% endif %}
 
 **问题业务类型**:
-"""
-            
-            for j, business_info in enumerate(org_info.get('problem_businesses', [])[:3], 1):
-                analysis += f"""
-{j}. **{business_info['business_type']}**
-   - 赔付率: {business_info['loss_ratio']:.1f}%
-   - 占机构保费: {business_info['premium_ratio']:.1f}%
-   - 影响度评分: {business_info['impact_score']:.1f}
-"""
-                
-                worst_coverage = business_info.get('worst_coverage')
-                if worst_coverage:
-                    analysis += f"   - 最差险别: {worst_coverage['coverage_type']} ({worst_coverage['loss_ratio']:.1f}%赔付率)\n"
-        
-        return analysis
-    
-    def _generate_new_energy_section(self, year, new_energy_data):
-        """新能源货车专项分析"""
-        
-        if not new_energy_data or new_energy_data.get('no_data'):
-            return f"""
+{% for business in org[businesses] %}
+
+{loop.index}. **{business[business_type]}**
+   - 赔付率: {business[loss_ratio]:.1f}%
+   - 占机构保费: {business[premium_ratio]:.1f}%
+   - 影响度评分: {business[impact_score]:.1f}
+{% if business[worst_coverage] %}
+   - 最差险别: {business[worst_coverage][coverage_type]} ({business[worst_coverage][loss_ratio]:.1f}%赔付率)
+{% endif %}
+{% endfor %}
+{% endfor %}
+{% if deteriorating %}
+
+### 赔付率恶化最快的机构×业务类型
+
+| 机构 | 业务类型 | 周均斜率(pp) | R² | 最新累计赔付率 | 等级 | 占机构保费 |
+|------|----------|-------------|----|---------------|------|----------|
+{% for item in deteriorating %}
+| {item[organization]} | {item[business_type]} | +{item[slope]:.2f} | {item[r_squared]:.2f} | {item[latest_loss_ratio]:.1f}% | {item[latest_grade]} | {item[premium_share]:.1f}% |
+{% endfor %}
+{% endif %}
+{% if loss_drivers %}
+
+### 赔付率变动归因 (机构×业务类型, 频度×案均×单均 LMDI分解)
+
+| 机构 | 业务类型 | 期初赔付率 | 期末赔付率 | 变动(pp) | 驱动因素 | 效应(pp) |
+|------|----------|-----------|-----------|---------|----------|---------|
+{% for item in loss_drivers %}
+| {item[organization]} | {item[business_type]} | {item[loss_ratio_start]:.1f}% | {item[loss_ratio_end]:.1f}% | {item[delta]:+.1f} | {item[factor]} | {item[effect]:+.1f} |
+{% endfor %}
+{% endif %}
+{% if anomaly_hits %}
+
+### 切片异常扫描 (第{anomaly_week}周, 机构×业务类型×险别)
+
+共{anomaly_count}项命中，按严重度列示前8项：
+
+| 机构 | 业务类型 | 险别 | 规则 | 累计赔付率 | 参照值 | 严重度 |
+|------|----------|------|------|-----------|--------|--------|
+{% for hit in anomaly_hits %}
+| {hit[third_level_organization]} | {hit[business_type_category]} | {hit[coverage_type]} | {hit[rule_label]} | {hit[value]:.1f}% | {hit[reference]:.1f}% | {hit[severity]:.2f} |
+{% endfor %}
+{% endif %}
+""",
+
+    'new_energy_insufficient': """
 ## 第二部分：新能源货车专项分析
 
 {year}年度新能源货车业务数据不足，无法进行专项分析。
-"""
-        
-        market_overview = new_energy_data.get('market_overview', {})
-        battery_risk = new_energy_data.get('battery_risk_analysis', {})
-        regional_analysis = new_energy_data.get('regional_risk_analysis', [])
-        insights = new_energy_data.get('strategic_insights', {})
-        
-        section = f"""
+""",
+
+    'new_energy': """
 ## 第二部分：新能源货车专项分析
 
 ### 市场概览
 新能源货车业务呈现"三高"特征：
-- 业务规模: {market_overview.get('premium_scale', 0):.2f}万元
-- 赔付率: {market_overview.get('loss_ratio', 0):.1f}% (vs 传统货车{market_overview.get('comparison', {}).get('traditional_truck_loss_ratio', 0):.1f}%)
-- 保单件数: {market_overview.get('policy_count', 0)}件
+- 业务规模: {premium_scale:.2f}万元
+- 赔付率: {loss_ratio:.1f}% (vs 传统货车{traditional_loss_ratio:.1f}%)
+- 保单件数: {policy_count}件
 
 ### 电池风险分析
-- 电池相关理赔占比: {battery_risk.get('battery_claim_ratio', 0):.1f}%
-- 电池案均赔款: {battery_risk.get('avg_battery_claim', 0):,.0f}元
-- 风险等级: {battery_risk.get('risk_level', '未知')}
+- 电池相关理赔占比: {battery_claim_ratio:.1f}%
+- 电池案均赔款: {avg_battery_claim:,.0f}元
+- 风险等级: {battery_risk_level}
 
 ### 区域风险分布
-"""
-        
-        for region_info in regional_analysis[:3]:
-            section += f"- {region_info['organization']}: {region_info['city_tier']} ({region_info['risk_level']}风险)\n"
-        
-        section += f"""
+{% for region in regions %}
+- {region[organization]}: {region[city_tier]} ({region[risk_level]}风险)
+{% endfor %}
+
 ### 核心洞察
-"""
-        
-        for finding in insights.get('key_findings', []):
-            section += f"- {finding}\n"
-        
-        return section
-    
-    def _generate_strategic_recommendations(self, year, trend_data):
-        """战略建议 (So What思维)"""
-        
-        recommendations = trend_data.get('strategic_recommendations', {})
-        anomalies = trend_data.get('anomaly_analysis', [])
-        
-        section = f"""
+{% for finding in key_findings %}
+- {finding}
+{% endfor %}
+""",
+
+    'strategic_recommendations': """
 ## 第三部分：战略建议与行动计划
 
 ### 🚨 立即行动 (24小时内)
-"""
-        
-        for action in recommendations.get('immediate_actions', []):
-            section += f"- {action}\n"
-        
-        section += f"""
+{% for action in immediate_actions %}
+- {action}
+{% endfor %}
+
 ### ⏰ 本周内完成 (7天)
-"""
-        
-        for action in recommendations.get('short_term', []):
-            section += f"- {action}\n"
-        
-        section += f"""
+{% for action in short_term %}
+- {action}
+{% endfor %}
+
 ### 📊 中期优化 (1个月内)
-"""
-        
-        for action in recommendations.get('medium_term', []):
-            section += f"- {action}\n"
-        
-        # 异常处理建议
-        if anomalies:
-            section += f"""
+{% for action in medium_term %}
+- {action}
+{% endfor %}
+{% if anomalies %}
+
 ### ⚠️ 异常事件处理
-"""
-            for anomaly in anomalies[:3]:
-                section += f"- {anomaly['type']}: {anomaly.get('recommended_action', '需专项调查')}\n"
-        
-        return section
-    
-    def _generate_implementation_roadmap(self, year, trend_data):
-        """实施路线图"""
-        
-        return f"""
+{% for anomaly in anomalies %}
+- {anomaly[type]}: {anomaly[action]}
+{% endfor %}
+{% endif %}
+""",
+
+    'implementation_roadmap': """
 ---
 
 ## 实施保障机制
@@ -1141,17 +1337,240 @@ class McKinseyReportGenerator:
 
 ---
 
-*报告生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*
+*报告生成时间: {generated_at}*
 *数据来源: {year}年度保单累计数据*
-*分析周期: 最近{LOOKBACK_WEEKS}周趋势*
-"""
+*分析周期: 最近{lookback_weeks}周趋势*
+""",
+}
+
+# =======================================
+# V2.0 报告生成器 (麦肯锡级)
+# =======================================
+
+class McKinseyReportGenerator:
+    """麦肯锡级报告生成器 (各章节先整理为数据模型, 再由预编译模板渲染)"""
+    
+    def __init__(self, lookback_weeks=LOOKBACK_WEEKS, scope=''):
+        self.lookback_weeks = lookback_weeks
+        self.scope = scope  # 报告范围 (分报告为切片标签, 全公司报告为空)
+    
+    def comprehensive_sections(self, trend_report, new_energy_analysis):
+        """各年度报告的章节 {年度标签: [(模板名, 数据模型), ...]}, 供章节清单增量渲染"""
+        reports = {}
+        
+        for year in trend_report.keys():
+            if 'executive_summary' not in trend_report[year]:
+                continue
+            
+            reports[f"{year}年度"] = self.yearly_sections(year, trend_report[year], new_energy_analysis.get(year))
+        
+        return reports
+    
+    def yearly_sections(self, year, trend_data, new_energy_data):
+        """年度报告各章节 [(模板名, 数据模型), ...], 章节之间相互独立"""
+        return [
+            self._executive_summary_section(year, trend_data),
+            self._problem_analysis_section(trend_data),
+            self._new_energy_section(year, new_energy_data),
+            self._strategic_recommendations_section(trend_data),
+            self._implementation_roadmap_section(year)
+        ]
+    
+    def _executive_summary_section(self, year, trend_data):
+        """执行摘要 (金字塔原理)"""
+        summary_data = trend_data['executive_summary']
+        
+        if summary_data.get('insufficient_data'):
+            return 'executive_summary_insufficient', {'year': year, 'scope': self.scope}
+        
+        return 'executive_summary', {
+            'year': year,
+            'scope': self.scope,
+            'core_conclusion': summary_data['core_conclusion'],
+            'key_supports': summary_data['key_supports'],
+            'immediate_action': summary_data['immediate_action']
+        }
+    
+    def _problem_analysis_section(self, trend_data):
+        """问题分析部分"""
+        problem_orgs = trend_data.get('problem_organizations', [])
+        high_risk_line = load_grader().scale('loss_ratio').bounds[-1]
+        
+        orgs = []
+        for org_info in problem_orgs:
+            kpis = org_info['kpis']
+            attribution = org_info.get('loss_attribution')
+            if attribution and pd.isna(attribution['main_driver']):
+                # 窗口内不可分解 (如出现零赔案周), 变动全部在残差中, 不列示归因
+                attribution = None
+            if attribution:
+                attribution = dict(attribution, effects_text="，".join(
+                    f"{name} {effect:+.1f}pp" for name, effect in attribution['effects'].items()
+                ))
+            
+            orgs.append({
+                'organization': org_info['organization'],
+                'risk_score': org_info['risk_score'],
+                'risk_level': org_info['risk_level'],
+                'loss_ratio': kpis['loss_ratio'],
+                'high_risk_gap': kpis['loss_ratio'] - high_risk_line,
+                'premium_scale': kpis['premium_scale'],
+                'claim_cases': kpis['claim_cases'],
+                'policies': kpis['policies'],
+                'attribution': attribution,
+                'businesses': org_info.get('problem_businesses', [])
+            })
+        
+        model = {
+            'org_count': len(problem_orgs),
+            'orgs': orgs,
+            'high_risk_line': high_risk_line,
+            'deteriorating': trend_data.get('deteriorating_slices', []),
+            'loss_drivers': trend_data.get('loss_drivers', []),
+            'anomaly_hits': []
+        }
+        
+        slice_anomalies = trend_data.get('slice_anomalies')
+        if slice_anomalies is not None and len(slice_anomalies) > 0:
+            latest_week = slice_anomalies['week'].max()
+            latest_hits = slice_anomalies[slice_anomalies['week'] == latest_week]
+            hits = latest_hits.head(8).to_dict('records')
+            for hit in hits:
+                hit['rule_label'] = ANOMALY_RULES[hit['rule']]
+            model.update({'anomaly_week': latest_week, 'anomaly_count': len(latest_hits), 'anomaly_hits': hits})
+        
+        return 'problem_analysis', model
+    
+    def _new_energy_section(self, year, new_energy_data):
+        """新能源货车专项分析"""
+        if not new_energy_data or new_energy_data.get('no_data'):
+            return 'new_energy_insufficient', {'year': year}
+        
+        market_overview = new_energy_data.get('market_overview', {})
+        battery_risk = new_energy_data.get('battery_risk_analysis', {})
+        
+        return 'new_energy', {
+            'premium_scale': market_overview.get('premium_scale', 0),
+            'loss_ratio': market_overview.get('loss_ratio', 0),
+            'traditional_loss_ratio': market_overview.get('comparison', {}).get('traditional_truck_loss_ratio', 0),
+            'policy_count': market_overview.get('policy_count', 0),
+            'battery_claim_ratio': battery_risk.get('battery_claim_ratio', 0),
+            'avg_battery_claim': battery_risk.get('avg_battery_claim', 0),
+            'battery_risk_level': battery_risk.get('risk_level', '未知'),
+            'regions': new_energy_data.get('regional_risk_analysis', [])[:3],
+            'key_findings': new_energy_data.get('strategic_insights', {}).get('key_findings', [])
+        }
+    
+    def _strategic_recommendations_section(self, trend_data):
+        """战略建议 (So What思维)"""
+        recommendations = trend_data.get('strategic_recommendations', {})
+        anomalies = trend_data.get('anomaly_analysis', [])
+        
+        return 'strategic_recommendations', {
+            'immediate_actions': recommendations.get('immediate_actions', []),
+            'short_term': recommendations.get('short_term', []),
+            'medium_term': recommendations.get('medium_term', []),
+            # 异常处理建议
+            'anomalies': [
+                {'type': anomaly['type'], 'action': anomaly.get('recommended_action', '需专项调查')}
+                for anomaly in anomalies[:3]
+            ]
+        }
+    
+    def _implementation_roadmap_section(self, year):
+        """实施路线图"""
+        return 'implementation_roadmap', {
+            'year': year,
+            'lookback_weeks': self.lookback_weeks,
+            'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+# =======================================
+# 分报告扇出
+# =======================================
+
+# 分报告涉及的代码 (参与切片输入摘要)
+SLICE_REPORT_CODE = (InsuranceKpiCalculatorV2, InsuranceLossTrendTrackerV2, NewEnergyTruckAnalyzer,
+                     McKinseyReportGenerator, 'kpi_cube', 'slice_analytics', 'loss_decomposition',
+                     'problem_slices', 'kpi_grading')
+
+
+def _render_slice_report(key, slice_data, missing_weeks=(), lookback_weeks=LOOKBACK_WEEKS):
+    """单个切片的完整趋势分析 (模块级函数, 供进程池调用) → {年度标签: 章节}"""
+    trend_kpis = InsuranceKpiCalculatorV2().calculate_trend_kpis(slice_data, missing_weeks)
+    trend_report = InsuranceLossTrendTrackerV2().analyze_trends(slice_data, trend_kpis)
+    new_energy_analysis = NewEnergyTruckAnalyzer().analyze_new_energy_trucks(slice_data)
+    
+    report_generator = McKinseyReportGenerator(lookback_weeks, scope=slice_label(key))
+    return report_generator.comprehensive_sections(trend_report, new_energy_analysis)
+
+
+def slice_inputs_digest(slice_data, code_digest, **params):
+    """切片输入摘要: 切片全部周度表内容 + 参数 + 代码指纹"""
+    frames = [
+        frame
+        for year in sorted(slice_data)
+        for table in sorted(slice_data[year])
+        for _, frame in sorted(slice_data[year][table].items())
+    ]
+    encoded = json.dumps(params, sort_keys=True, ensure_ascii=False, default=repr)
+    return f"{frames_digest(frames)}-{code_digest[:12]}-{hashlib.sha1(encoded.encode('utf-8')).hexdigest()[:12]}"
+
+
+def generate_slice_reports(weekly_data, by=ORG_REPORT_BY, missing_weeks=(), lookback_weeks=LOOKBACK_WEEKS,
+                           workers=REPORT_WORKERS, manifest=None):
+    """按切片维度扇出分报告: 年度数据只拆分一次, 各切片在进程池中独立分析
+
+    传入章节清单时, 输入摘要未变且报告完好的切片不再分析。
+    返回 {切片取值元组: {'inputs': 输入摘要, 'reports': {年度标签: 章节} 或 None(已是最新)}}
+    """
+    slices = split_weekly_data(weekly_data, by)
+    code_digest = source_fingerprint(SLICE_REPORT_CODE)
+    grade_config = grade_config_digest()
+    inputs = {
+        key: slice_inputs_digest(slice_data, code_digest, by=list(by), missing_weeks=list(missing_weeks),
+                                 lookback_weeks=lookback_weeks, grade_config=grade_config)
+        for key, slice_data in slices.items()
+    }
+    
+    stale = {
+        key: slice_data for key, slice_data in slices.items()
+        if manifest is None or not manifest.is_current(slice_label(key), inputs[key])
+    }
+    render = partial(_render_slice_report, missing_weeks=tuple(missing_weeks), lookback_weeks=lookback_weeks)
+    reports = fan_out(render, stale, workers)
+    return {key: {'inputs': inputs[key], 'reports': reports.get(key)} for key in slices}
+
+
+def report_filename(year_label, end_week, scope=None):
+    """趋势追踪报告文件名 (分报告带切片标签)"""
+    year_match = re.search(r'(2024|2025)', year_label)
+    year_num = year_match.group(1) if year_match else "unknown"
+    scope = f"_{scope}" if scope else ""
+    return f"{year_num}保单趋势追踪报告{scope}_第{end_week}周.md"
+
+
+def print_changes(filename, changed):
+    """增量写出结果"""
+    if changed:
+        print(f"✏️  已更新: {filename} (变化章节: {', '.join(changed)})")
+    else:
+        print(f"✓  未变化: {filename}")
 
 # =======================================
 # 主函数
 # =======================================
 
-def main():
-    """主函数 - V2.0完整流程"""
+def main(start_week=START_WEEK, end_week=END_WEEK, lookback_weeks=LOOKBACK_WEEKS,
+         data_folder=".", output_folder=OUTPUT_FOLDER, workers=None,
+         enable_trend=ENABLE_TREND_TRACKING, enable_truck=ENABLE_NEW_ENERGY_TRUCK,
+         use_cache=ENABLE_DATA_CACHE, use_warehouse=ENABLE_WAREHOUSE,
+         use_pipeline_cache=ENABLE_PIPELINE_CACHE, metrics_table=ENABLE_METRICS_TABLE,
+         enable_yoy=ENABLE_YOY_COMPARISON, enable_org_reports=ENABLE_ORG_REPORTS,
+         org_report_by=ORG_REPORT_BY, report_workers=REPORT_WORKERS,
+         use_report_manifest=ENABLE_REPORT_MANIFEST, streaming=ENABLE_STREAMING):
+    """主函数 - V2.0完整流程 (参数默认取模块配置, 供命令行入口覆盖)"""
+    workers = LOAD_WORKERS if workers is None else workers
     
     print("🚀 启动车险周报生成器 V2.0 - 麦肯锡级趋势追踪")
     print("=" * 60)
@@ -1159,81 +1578,228 @@ def main():
     try:
         # Step 1: V2.0数据加载
         print("\n📊 Step 1: V2.0数据加载...")
-        loader = InsuranceDataLoaderV2()
+        recorder = RunRecorder('trend', live=metrics_table)
+        # 流式加载直接读取CSV, 不经整表物化的列式缓存与数据仓库
+        if streaming:
+            use_cache = use_warehouse = False
+        loader = InsuranceDataLoaderV2(data_folder, use_cache=use_cache, use_warehouse=use_warehouse,
+                                       recorder=recorder)
+        
+        # 增量入库 (启用数据仓库时)
+        with recorder.stage('sync_warehouse'):
+            loader.sync_warehouse()
         
         # 确定分析周期
-        period_info = loader.determine_analysis_period(START_WEEK, END_WEEK, LOOKBACK_WEEKS)
+        period_info = loader.determine_analysis_period(start_week, end_week, lookback_weeks)
         print(f"分析周期: 第{period_info['start_week']}-{period_info['end_week']}周")
         print(f"回溯周数: {period_info['lookback_weeks']}周")
         print(f"缺失周次: {period_info['missing_weeks']}")
         
-        # 加载数据
-        loaded_data, load_errors = loader.load_data_files(period_info['weeks_to_load'])
-        if not loaded_data:
-            raise RuntimeError("未成功加载任何数据文件")
-        
-        # 预处理
-        loaded_data = loader.preprocess_data(loaded_data)
-        
-        # 计算当周值
-        weekly_data = loader.calculate_weekly_values(loaded_data, period_info['analysis_weeks'])
-        print(f"✅ 数据加载完成，涉及{len(weekly_data)}个保单年度")
+        # 阶段图: 指纹未变的阶段直接复用结果, 下游命中时上游不计算也不读取
+        pipeline = Pipeline(PIPELINE_FOLDER, enabled=use_pipeline_cache, recorder=recorder)
+        anomaly_params = {
+            'outlier_threshold': OUTLIER_THRESHOLD,
+            'jump_ratio': ANOMALY_JUMP_RATIO,
+            'run_weeks': ANOMALY_RUN_WEEKS
+        }
+        # 评级配置 (率值指标区间状态值配置) 内容参与调用评级器的阶段指纹
+        grade_inputs = {'grade_config': grade_config_digest()}
+        problem_params = {
+            'top_orgs': PROBLEM_TOP_ORGS,
+            'top_businesses': PROBLEM_TOP_BUSINESSES,
+            'min_share': PROBLEM_MIN_SHARE,
+            'ties': PROBLEM_TIES
+        }
         
-        # Step 2: V2.0 KPI计算
-        print("\n📈 Step 2: V2.0 KPI计算...")
-        calculator = InsuranceKpiCalculatorV2()
+        # 本次运行已加载的最新周明细 (周度数据阶段执行时留存, 截面分析不再重复读取)
+        loaded_detail = {}
         
-        # 计算全局KPI
-        global_kpis = {}
-        for year in weekly_data.keys():
-            if 'cumulative' in weekly_data[year] and weekly_data[year]['cumulative']:
-                latest_week = max(weekly_data[year]['cumulative'].keys())
-                latest_data = weekly_data[year]['cumulative'][latest_week]
-                global_kpis[year] = calculator.calculate_kpis(latest_data, 'cumulative')
+        def load_weekly_data(weeks_to_load, analysis_weeks, streaming=False, chunksize=None):
+            if streaming:
+                # 流式分块汇总 (内存以块大小为上限)
+                loaded_data, cubes, load_errors = loader.stream_data_files(weeks_to_load, workers, chunksize)
+            else:
+                # 加载数据 (读取进程内同步完成预处理)
+                loaded_data, load_errors = loader.load_data_files(weeks_to_load, workers=workers, preprocess=True)
+                cubes = None
+            if not loaded_data:
+                raise RuntimeError("未成功加载任何数据文件")
+            
+            # 计算当周值
+            weekly_data = loader.calculate_weekly_values(loaded_data, analysis_weeks, cubes)
+            for week in set(loader.latest_weeks(weekly_data).values()):
+                loaded_detail[week] = loaded_data[week]
+            print(f"✅ 数据加载完成，涉及{len(weekly_data)}个保单年度")
+            return weekly_data
+        
+        def load_latest_detail(weekly_data, streaming=False, chunksize=None):
+            return loader.load_latest_detail(weekly_data, workers, streaming, chunksize, loaded=loaded_detail)
+        
+        def compute_global_kpis(weekly_data):
+            # 计算全局KPI (最新周立方体)
+            calculator = InsuranceKpiCalculatorV2()
+            global_kpis = {}
+            for year in weekly_data.keys():
+                if 'cube' in weekly_data[year] and weekly_data[year]['cube']:
+                    latest_week = max(weekly_data[year]['cube'].keys())
+                    latest_cube = weekly_data[year]['cube'][latest_week]
+                    global_kpis[year] = calculator.calculate_kpis(latest_cube, 'cumulative')
+            return global_kpis
+        
+        # 阈值参数仅参与指纹 (计算时读取模块配置)
+        def compute_trend_kpis(weekly_data, missing_weeks, **thresholds):
+            return InsuranceKpiCalculatorV2().calculate_trend_kpis(weekly_data, missing_weeks)
+        
+        def compute_trend_report(weekly_data, trend_kpis, **thresholds):
+            return InsuranceLossTrendTrackerV2().analyze_trends(weekly_data, trend_kpis)
+        
+        def compute_truck_analysis(latest_detail):
+            return NewEnergyTruckAnalyzer().analyze_new_energy_trucks(latest_detail)
+        
+        def compute_yoy_comparison(weekly_data):
+            # 复用各年度已构建的周立方体, 一次对齐全部粒度
+            return yoy_compare(stack_years(weekly_data))
+        
+        def generate_reports(trend_report, new_energy_analysis, global_kpis, lookback_weeks):
+            report_generator = McKinseyReportGenerator(lookback_weeks)
+            return report_generator.comprehensive_sections(trend_report, new_energy_analysis)
+        
+        # 章节清单: 只重写输入变化的章节与报告
+        output_path = Path(output_folder)
+        manifest = ReportManifest(output_path, enabled=use_report_manifest)
+        
+        def compute_org_reports(weekly_data, latest_detail, **params):
+            # 分报告的截面分析同样只需最新周明细
+            slice_input = {year: {**year_data, **latest_detail.get(year, {})} for year, year_data in weekly_data.items()}
+            return generate_slice_reports(slice_input, **params, manifest=manifest)
+        
+        def disabled():
+            return {}
         
-        # 计算趋势KPI
-        trend_kpis = calculator.calculate_trend_kpis(weekly_data)
-        print("✅ KPI计算完成")
+        pipeline.stage(
+            'weekly_data', load_weekly_data,
+            params={'weeks_to_load': period_info['weeks_to_load'], 'analysis_weeks': period_info['analysis_weeks'],
+                    'streaming': streaming, 'chunksize': STREAM_CHUNK_ROWS if streaming else None},
+            inputs=loader.input_digests(period_info['weeks_to_load']),
+            code=(InsuranceDataLoaderV2, _load_week_files, _stream_week_files, _load_warehouse_week,
+                  'data_io', 'data_schema', 'kpi_cube', 'weekly_warehouse')
+        )
+        # 最新周明细不缓存: 仅在下游阶段未命中时读取
+        pipeline.stage(
+            'latest_detail', load_latest_detail, deps=['weekly_data'],
+            params={'streaming': streaming, 'chunksize': STREAM_CHUNK_ROWS if streaming else None},
+            persist=False
+        )
+        pipeline.stage(
+            'global_kpis', compute_global_kpis, deps=['weekly_data'],
+            inputs=grade_inputs,
+            code=(InsuranceKpiCalculatorV2, 'kpi_cube', 'kpi_grading')
+        )
+        pipeline.stage(
+            'trend_kpis', compute_trend_kpis, deps=['weekly_data'],
+            params={'missing_weeks': period_info['missing_weeks'], **anomaly_params},
+            inputs=grade_inputs,
+            code=(InsuranceKpiCalculatorV2, 'kpi_cube', 'slice_analytics', 'loss_decomposition', 'kpi_grading')
+        )
+        if enable_trend:
+            pipeline.stage(
+                'trend_report', compute_trend_report, deps=['weekly_data', 'trend_kpis'],
+                params={**anomaly_params, **problem_params},
+                inputs=grade_inputs,
+                code=(InsuranceLossTrendTrackerV2, InsuranceKpiCalculatorV2, 'kpi_cube', 'slice_analytics',
+                      'loss_decomposition', 'problem_slices', 'kpi_grading')
+            )
+        else:
+            pipeline.stage('trend_report', disabled, persist=False)
+        if enable_truck:
+            pipeline.stage(
+                'truck_analysis', compute_truck_analysis, deps=['latest_detail'],
+                code=(NewEnergyTruckAnalyzer, 'data_schema')
+            )
+        else:
+            pipeline.stage('truck_analysis', disabled, persist=False)
+        if enable_yoy:
+            pipeline.stage(
+                'yoy_comparison', compute_yoy_comparison, deps=['weekly_data'],
+                code=('yoy_comparison', 'kpi_cube')
+            )
+        if enable_org_reports:
+            # 分报告按章节清单增量生成, 不缓存
+            pipeline.stage(
+                'org_reports', compute_org_reports, deps=['weekly_data', 'latest_detail'],
+                params={'by': tuple(org_report_by), 'missing_weeks': period_info['missing_weeks'],
+                        'lookback_weeks': lookback_weeks, 'workers': report_workers},
+                persist=False
+            )
+        # 报告章节每次重新整理, 由章节清单决定重写哪些 (上游阶段均可复用)
+        pipeline.stage(
+            'reports', generate_reports, deps=['trend_report', 'truck_analysis', 'global_kpis'],
+            params={'lookback_weeks': lookback_weeks}, persist=False
+        )
         
-        # Step 3: V2.0趋势追踪 (如启用)
-        trend_report = {}
-        if ENABLE_TREND_TRACKING:
-            print("\n📈 Step 3: V2.0趋势追踪分析...")
-            trend_tracker = InsuranceLossTrendTrackerV2()
-            trend_report = trend_tracker.analyze_trends(weekly_data, trend_kpis)
+        # Step 2-4: KPI计算、趋势追踪与新能源货车分析 (按需解析)
+        print("\n📈 Step 2: V2.0 KPI计算与趋势追踪...")
+        if enable_trend:
+            pipeline.get('trend_report')
             print("✅ 趋势分析完成")
-        
-        # Step 4: 新能源货车分析 (如启用)
-        new_energy_analysis = {}
-        if ENABLE_NEW_ENERGY_TRUCK:
-            print("\n🚛 Step 4: 新能源货车专项分析...")
-            truck_analyzer = NewEnergyTruckAnalyzer()
-            new_energy_analysis = truck_analyzer.analyze_new_energy_trucks(weekly_data)
+        if enable_truck:
+            print("\n🚛 新能源货车专项分析...")
+            pipeline.get('truck_analysis')
             print("✅ 新能源货车分析完成")
+        global_kpis = pipeline.get('global_kpis')
         
         # Step 5: 麦肯锡级报告生成
         print("\n📋 Step 5: 生成麦肯锡级报告...")
-        report_generator = McKinseyReportGenerator()
-        final_reports = report_generator.generate_comprehensive_report(
-            trend_report, new_energy_analysis, global_kpis
-        )
+        final_reports = pipeline.get('reports')
         
-        # 保存报告
-        output_path = Path(OUTPUT_FOLDER)
-        output_path.mkdir(exist_ok=True)
+        # 保存报告 (仅重写有章节变化的报告)
+        output_path.mkdir(parents=True, exist_ok=True)
         
-        for year_label, report_content in final_reports.items():
-            # 提取年份数字
-            year_match = re.search(r'(2024|2025)', year_label)
-            year_num = year_match.group(1) if year_match else "unknown"
-            
-            filename = f"{year_num}保单趋势追踪报告_第{period_info['end_week']}周.md"
-            filepath = output_path / filename
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(report_content)
+        for year_label, sections in final_reports.items():
+            filename = report_filename(year_label, period_info['end_week'])
+            changed = manifest.write(filename, MCKINSEY_TEMPLATES, sections, joiner="\n\n")
+            print_changes(filename, changed)
+        
+        # 分报告 (每个切片一份, 进程池并行渲染)
+        if enable_org_reports:
+            print(f"\n🏢 分报告扇出 (切片: {' × '.join(org_report_by)}, {report_workers}进程)...")
+            slice_reports = pipeline.get('org_reports')
             
-            print(f"✅ 报告已生成: {filename} ({len(report_content):,}字符)")
+            updated = []
+            for key, result in slice_reports.items():
+                if result['reports'] is None:
+                    continue
+                label = slice_label(key)
+                for year_label, sections in result['reports'].items():
+                    filename = f"{ORG_REPORT_FOLDER}/{report_filename(year_label, period_info['end_week'], label)}"
+                    changed = manifest.write(filename, MCKINSEY_TEMPLATES, sections, joiner="\n\n",
+                                             group=label, inputs=result['inputs'])
+                    if changed:
+                        updated.append(filename)
+                        print_changes(filename, changed)
+            skipped = sum(result['reports'] is None for result in slice_reports.values())
+            print(f"✅ 分报告: {len(slice_reports)}个切片 (输入未变跳过{skipped}个), "
+                  f"更新{len(updated)}份报告 → {ORG_REPORT_FOLDER}/")
+        
+        # 同比对比 (完整明细CSV + 最新周摘要)
+        if enable_yoy:
+            print("\n📅 保单年度同比对比...")
+            comparison = pipeline.get('yoy_comparison')
+            if len(comparison) > 0:
+                stem = (f"{comparison.attrs['current_year']}vs{comparison.attrs['previous_year']}"
+                        f"保单同比对比_第{period_info['end_week']}周")
+                comparison.to_csv(output_path / f"{stem}.csv", index=False, encoding='utf-8-sig')
+                changed = manifest.write(f"{stem}.md", YOY_TEMPLATES, yoy_sections(comparison, period_info['end_week']))
+                print_changes(f"{stem}.md", changed)
+                print(f"✅ 同比对比: {stem}.md / .csv ({len(comparison):,}行)")
+            else:
+                print("⚠️ 不足两个保单年度, 跳过同比对比")
+        
+        manifest.save()
+        
+        # 运行记录 (各阶段耗时、内存与行数)
+        record_path = recorder.write(output_path, f"第{period_info['end_week']}周")
+        print(f"⏱️  运行记录: {record_path.name} (总耗时{recorder.summary()['seconds']:.1f}秒)")
         
         # 输出总结
         print("\n" + "=" * 60)
@@ -1250,8 +1816,10 @@ def main():
         
         print(f"\n📁 报告位置: {output_path.absolute()}")
         print(f"📊 分析周期: 第{period_info['start_week']}-{period_info['end_week']}周")
-        print(f"🔍 功能启用: 趋势追踪{'✅' if ENABLE_TREND_TRACKING else '❌'}, "
-              f"新能源分析{'✅' if ENABLE_NEW_ENERGY_TRUCK else '❌'}, "
+        print(f"🔍 功能启用: 趋势追踪{'✅' if enable_trend else '❌'}, "
+              f"新能源分析{'✅' if enable_truck else '❌'}, "
+              f"同比对比{'✅' if enable_yoy else '❌'}, "
+              f"分报告{'✅' if enable_org_reports else '❌'}, "
               f"麦肯锡框架{'✅' if ENABLE_MCKINSEY_FRAMEWORK else '❌'}")
         
     except Exception as e:
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+可加指标立方体 (KPI Cube)
+
+core_calculations.md 中的全部KPI均为"和之比", 因此只需按下钻维度预聚合
+可加指标(保费/赔款/费用/件数), 之后任意层级的KPI都可由立方体汇总得到,
+不必再对明细行做布尔筛选和重复求和。
+"""
+
+import numpy as np
+import pandas as pd
+
+from data_io import concat_frames
+
+# 可加指标
+MEASURE_COLUMNS = [
+    'signed_premium_yuan',
+    'matured_premium_yuan',
+    'reported_claim_payment_yuan',
+    'expense_amount_yuan',
+    'claim_case_count',
+    'policy_count',
+]
+
+# 明细行数 (部分分析以记录数作为车辆数)
+ROW_COUNT = 'row_count'
+
+# 下钻维度 (机构 → 能源类型 → 业务类型 → 险别/新转续)
+CUBE_DIMENSIONS = [
+    'policy_year',
+    'third_level_organization',
+    'is_new_energy_vehicle',
+    'business_type_category',
+    'coverage_type',
+    'renewal_status',
+]
+
+
+# 金额指标 (元, 精确到分)
+AMOUNT_MEASURES = MEASURE_COLUMNS[:4]
+
+
+def _exact_cents(values):
+    """金额列恰为整分时返回int64分值, 否则返回None"""
+    values = np.asarray(values)
+    if values.dtype.kind != 'f':
+        return None
+    cents = np.round(values * 100)
+    if not np.array_equal(cents / 100, values):
+        return None
+    return cents.astype(np.int64)
+
+
+def _group_sums(frame, dims, measures):
+    """按维度汇总指标 (首次出现顺序); 整分金额按分做整数累加再换算回元
+
+    整数求和与行序、分块方式无关, 因此分块汇总后再合并与整表一次汇总逐位一致。
+    """
+    frame = frame[dims + measures] if dims else frame[measures]
+    in_cents = []
+    for col in measures:
+        if col in AMOUNT_MEASURES:
+            cents = _exact_cents(frame[col])
+            if cents is not None:
+                frame = frame.assign(**{col: cents})
+                in_cents.append(col)
+
+    if dims:
+        sums = frame.groupby(dims, observed=True, dropna=False, sort=False)[measures].sum()
+    else:
+        sums = frame[measures].sum().to_frame().T
+    for col in in_cents:
+        sums[col] = sums[col] / 100
+    return sums
+
+
+def build_cube(df, dimensions=CUBE_DIMENSIONS):
+    """按维度预聚合可加指标, 返回扁平DataFrame(维度列 + 指标列 + row_count)
+
+    分组保留缺失维度值, 且按组合首次出现的顺序排列, 与逐值遍历明细的顺序一致。
+    """
+    dims = [dim for dim in dimensions if dim in df.columns]
+    measures = [col for col in MEASURE_COLUMNS if col in df.columns]
+
+    cube = _group_sums(df, dims, measures)
+    if not dims:
+        cube[ROW_COUNT] = len(df)
+        return cube
+
+    cube[ROW_COUNT] = df.groupby(dims, observed=True, dropna=False, sort=False).size()
+    return cube.reset_index()
+
+
+def combine_cubes(cubes, dimensions=CUBE_DIMENSIONS):
+    """合并同维度的部分立方体 (如分块读取的各块立方体), 与对合并后的明细构建立方体结果一致
+
+    组合顺序仍按首次出现排列, 指标与行数逐组合相加。
+    """
+    cubes = [cube for cube in cubes if cube is not None]
+    if len(cubes) == 1:
+        return cubes[0]
+
+    combined = concat_frames(cubes)
+    dims = [dim for dim in dimensions if dim in combined.columns]
+    sums = _group_sums(combined, dims, measure_columns(combined))
+    return sums.reset_index() if dims else sums
+
+
+def measure_columns(cube):
+    """立方体中存在的指标列"""
+    return [col for col in MEASURE_COLUMNS + [ROW_COUNT] if col in cube.columns]
+
+
+def rollup(cube, by=(), sort=False):
+    """按维度汇总立方体; by为空时返回合计Series"""
+    measures = measure_columns(cube)
+    by = list(by)
+
+    if not by:
+        return cube[measures].sum()
+
+    return (
+        cube.groupby(by, observed=True, dropna=False, sort=sort)[measures]
+        .sum()
+        .reset_index()
+    )
+
+
+# 相邻周对齐差分后的行状态列
+PRESENCE = 'presence'
+
+
+def diff_cubes(current, previous, dimensions=None):
+    """相邻两周立方体按维度对齐相减, 得到任意粒度的当周发生值
+
+    两周均存在的组合记为 both; 仅本周出现记为 new (上周按0计);
+    仅上周存在记为 dropped (本周按0计, 当周值即为冲回)。
+    """
+    if dimensions is None:
+        dimensions = [dim for dim in CUBE_DIMENSIONS if dim in current.columns and dim in previous.columns]
+    dimensions = list(dimensions)
+    measures = [col for col in measure_columns(current) if col in previous.columns]
+
+    if not dimensions:
+        delta = (rollup(current)[measures] - rollup(previous)[measures]).to_frame().T
+        delta[PRESENCE] = 'both'
+        return delta
+
+    current_sums = rollup(current, dimensions).set_index(dimensions)[measures]
+    previous_sums = rollup(previous, dimensions).set_index(dimensions)[measures]
+
+    aligned_index = current_sums.index.union(previous_sums.index, sort=False)
+    delta = (
+        current_sums.reindex(aligned_index, fill_value=0)
+        - previous_sums.reindex(aligned_index, fill_value=0)
+    )
+
+    in_current = aligned_index.isin(current_sums.index)
+    in_previous = aligned_index.isin(previous_sums.index)
+    delta[PRESENCE] = np.select(
+        [in_current & in_previous, in_current],
+        ['both', 'new'],
+        default='dropped'
+    )
+
+    return delta.reset_index()
+
+
+def weekly_kpi_matrix(cubes, by, numerator, denominator, scale=100.0, smoothing=0.0):
+    """多周立方体 → (切片 × 周次) KPI矩阵
+
+    cubes 为 {周次: 立方体}; KPI = numerator / (denominator + smoothing) * scale,
+    切片在某周不存在或分母不为正时记为NaN。
+    """
+    by = list(by)
+    frames = []
+    for week, cube in sorted(cubes.items()):
+        sums = rollup(cube, by)
+        sums['week'] = week
+        frames.append(sums)
+
+    stacked = pd.concat(frames, ignore_index=True)
+    base = stacked[denominator] + smoothing
+    stacked['value'] = (stacked[numerator] / base.where(base > 0)) * scale
+
+    matrix = stacked.set_index(by + ['week'])['value'].unstack('week')
+    return matrix.reindex(columns=sorted(cubes))
+
+
+def parent_shares(cube, by, measure='matured_premium_yuan'):
+    """各切片指标占上一层级(首个维度)合计的比例, 索引为切片维度"""
+    by = list(by)
+    sums = rollup(cube, by).set_index(by)[measure]
+    parent = sums.groupby(level=0, observed=True).transform('sum')
+    return sums / parent.where(parent > 0)
+
+
+def stack_cubes(cubes, week_column='week'):
+    """{周次: 立方体} → 带周次列的长表立方体"""
+    frames = []
+    for week, cube in sorted(cubes.items()):
+        frame = cube.copy()
+        frame[week_column] = week
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def weekly_series(stacked, week_column='week'):
+    """长表立方体 → (累计值序列, 当周发生值序列), 均以周次为索引
+
+    一次按周分组汇总得到累计值; 当周值 = 本周累计 - 上周累计,
+    上一周缺失时无法差分, 该周当周值为NaN。
+    """
+    measures = measure_columns(stacked)
+    cumulative = stacked.groupby(week_column, sort=True)[measures].sum()
+
+    weeks = cumulative.index.to_numpy()
+    consecutive = np.diff(weeks, prepend=weeks[0] - 2 if len(weeks) else 0) == 1
+    weekly = cumulative.diff().where(pd.Series(consecutive, index=cumulative.index), axis=0)
+    return cumulative, weekly
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+率值指标五级评级引擎
+
+从《率值指标区间状态值配置.md》读取各指标的区间、方向与颜色, 统一评级:
+- 等级: 卓越 / 健康 / 预警 / 危险 / 高危 (区间分界值归入较差等级)
+- 评分: 0-100 分段线性插值 (分界点对应 95/86/70/40 分)
+- 整列/整矩阵一次评级: 等级用 searchsorted 分箱, 评分用 np.interp, 不逐值判断
+"""
+
+import hashlib
+import re
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+GRADE_CONFIG_PATH = Path(__file__).resolve().parent / "率值指标区间状态值配置.md"
+
+# 五级体系 (由好到差)
+LEVELS = ['卓越', '健康', '预警', '危险', '高危']
+LEVEL_EMOJI = {'卓越': '🟢', '健康': '🟢', '预警': '🔵', '危险': '🟡', '高危': '🔴'}
+NEUTRAL_BADGE = '⚪ 中性'
+
+# 分界点评分 (卓越/健康, 健康/预警, 预警/危险, 危险/高危) 与两端满分/零分
+BOUNDARY_SCORES = [95, 86, 70, 40]
+BEST_SCORE = 100
+WORST_SCORE = 0
+
+# 两端插值跨度 (原始值单位): 取配置文档评分转换示例; 未列出的指标取相邻区间宽度
+EXTREME_SPANS = {
+    'contribution_margin_ratio': (8, 8),
+    'loss_ratio': (10, 20),
+}
+
+# 本仓库报告中的指标名 → 配置键
+ALIASES = {
+    '赔付率': 'loss_ratio',
+    '边贡率': 'contribution_margin_ratio',
+    '边际贡献率': 'contribution_margin_ratio',
+    '出险率': 'matured_claim_ratio',
+}
+
+_SECTION_PATTERN = re.compile(r'^###\s*\d+\.\s*(?P<name>[^(（]+?)\s*[(（](?P<key>\w+)[)）]')
+_NUMBER_PATTERN = re.compile(r'\d+(?:\.\d+)?')   # 区间写法如 8-12%, 连字符为区间符
+_COLOR_PATTERN = re.compile(r'#[0-9A-Fa-f]{6}')
+
+
+class MetricScale:
+    """单个指标的五级标尺"""
+
+    def __init__(self, key, name, higher_is_better, bounds, colors):
+        self.key = key
+        self.name = name
+        self.higher_is_better = higher_is_better
+        self.bounds = np.asarray(bounds, dtype=float)   # 由好到差的4个分界值
+        self.colors = colors                            # 等级 → 颜色代码
+
+        best_span, worst_span = EXTREME_SPANS.get(key, (
+            abs(self.bounds[1] - self.bounds[0]), abs(self.bounds[3] - self.bounds[2])
+        ))
+        direction = 1 if higher_is_better else -1
+        knots = np.concatenate([
+            [self.bounds[0] + direction * best_span], self.bounds, [self.bounds[3] - direction * worst_span]
+        ])
+        scores = np.array([BEST_SCORE] + BOUNDARY_SCORES + [WORST_SCORE], dtype=float)
+
+        # np.interp 要求横轴递增
+        order = np.argsort(knots)
+        self._knots = knots[order]
+        self._knot_scores = scores[order]
+        self._ascending_bounds = np.sort(self.bounds)
+
+    def levels(self, values):
+        """等级序号 (0=卓越 … 4=高危, 缺失值为-1)"""
+        values = np.asarray(values, dtype=float)
+        if self.higher_is_better:
+            # 不高于分界值的个数 (分界值归入较差等级)
+            levels = len(self.bounds) - np.searchsorted(self._ascending_bounds, values, side='left')
+        else:
+            # 不低于分界值的个数
+            levels = np.searchsorted(self._ascending_bounds, values, side='right')
+        return np.where(np.isnan(values), -1, levels)
+
+    def scores(self, values):
+        """0-100 评分 (缺失值为NaN)"""
+        values = np.asarray(values, dtype=float)
+        return np.interp(values, self._knots, self._knot_scores)
+
+    def describe(self):
+        """各等级区间说明, 如 ['< 50', '50-60', ...]"""
+        bounds = [f"{b:g}" for b in self.bounds]
+        if self.higher_is_better:
+            return [f"> {bounds[0]}"] + [f"{bounds[i + 1]}-{bounds[i]}" for i in range(3)] + [f"≤ {bounds[3]}"]
+        return [f"< {bounds[0]}"] + [f"{bounds[i]}-{bounds[i + 1]}" for i in range(3)] + [f"≥ {bounds[3]}"]
+
+
+def parse_grade_config(path=GRADE_CONFIG_PATH):
+    """解析配置文档中的各指标区间表, 返回 {配置键: MetricScale}"""
+    text = Path(path).read_text(encoding='utf-8')
+    scales = {}
+    current = None
+
+    for line in text.splitlines():
+        section = _SECTION_PATTERN.match(line.strip())
+        if section:
+            current = {'key': section['key'], 'name': section['name'].strip(), 'rows': {}, 'higher': None}
+            scales[current['key']] = current
+            continue
+        if current is None:
+            continue
+
+        if line.startswith('**指标性质**'):
+            current['higher'] = '正向' in line
+        elif line.startswith('|'):
+            cells = [cell.strip() for cell in line.strip().strip('|').split('|')]
+            if len(cells) >= 4 and cells[2] in LEVELS:
+                numbers = [float(n) for n in _NUMBER_PATTERN.findall(cells[0])]
+                color = _COLOR_PATTERN.search(cells[3])
+                current['rows'][cells[2]] = (numbers, color.group(0) if color else None)
+        elif line.startswith('## '):
+            current = None
+
+    metrics = {}
+    for key, spec in scales.items():
+        rows = spec['rows']
+        if spec['higher'] is None or any(level not in rows for level in LEVELS):
+            raise ValueError(f"评级配置不完整: {key}")
+
+        # 分界值: 正向指标取较优区间下限, 逆向指标取较优区间上限
+        pick = min if spec['higher'] else max
+        bounds = [pick(rows[level][0]) for level in LEVELS[:-1]]
+        colors = {level: rows[level][1] for level in LEVELS}
+        metrics[key] = MetricScale(key, spec['name'], spec['higher'], bounds, colors)
+
+    return metrics
+
+
+class KpiGrader:
+    """五级评级器: 输入可为标量、Series、DataFrame或数组, 输出保持形状与索引"""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self._names = {scale.name: key for key, scale in metrics.items()}
+
+    def scale(self, metric):
+        """按配置键、文档中文名或仓库别名取标尺"""
+        key = ALIASES.get(metric, self._names.get(metric, metric))
+        if key not in self.metrics:
+            raise KeyError(f"未配置的率值指标: {metric}")
+        return self.metrics[key]
+
+    def has_metric(self, metric):
+        """是否为已配置的率值指标"""
+        return ALIASES.get(metric, self._names.get(metric, metric)) in self.metrics
+
+    @staticmethod
+    def _like(values, result):
+        """按输入类型包装结果"""
+        if isinstance(values, pd.DataFrame):
+            return pd.DataFrame(result, index=values.index, columns=values.columns)
+        if isinstance(values, pd.Series):
+            return pd.Series(result, index=values.index, name=values.name)
+        if np.ndim(values) == 0:
+            return result.item() if hasattr(result, 'item') else result
+        return result
+
+    def levels(self, metric, values):
+        """等级序号 (0=卓越 … 4=高危, 缺失为-1)"""
+        return self._like(values, self.scale(metric).levels(values))
+
+    def scores(self, metric, values):
+        """0-100 评分"""
+        return self._like(values, self.scale(metric).scores(values))
+
+    def labels(self, metric, values):
+        """等级名称 (缺失为None)"""
+        lookup = np.array(LEVELS + [None], dtype=object)
+        return self._like(values, lookup[self.scale(metric).levels(values)])
+
+    def colors(self, metric, values):
+        """等级颜色代码 (缺失为None)"""
+        scale = self.scale(metric)
+        lookup = np.array([scale.colors[level] for level in LEVELS] + [None], dtype=object)
+        return self._like(values, lookup[scale.levels(values)])
+
+    def badges(self, metric, values):
+        """带色标的等级, 如 '🟢 健康'"""
+        lookup = np.array([f"{LEVEL_EMOJI[level]} {level}" for level in LEVELS] + [NEUTRAL_BADGE], dtype=object)
+        return self._like(values, lookup[self.scale(metric).levels(values)])
+
+    def status(self, metric, value):
+        """单值等级名称"""
+        return self.labels(metric, value)
+
+    def badge(self, metric, value):
+        """单值带色标等级 (未配置的指标返回中性)"""
+        if not self.has_metric(metric):
+            return NEUTRAL_BADGE
+        return self.badges(metric, value)
+
+    def legend(self, metric, unit='%'):
+        """等级区间说明行, 如 ['🟢 卓越：赔付率 < 50%', ...]"""
+        scale = self.scale(metric)
+        return [f"{LEVEL_EMOJI[level]} {level}：{scale.name} {interval}{unit}"
+                for level, interval in zip(LEVELS, scale.describe())]
+
+
+def grade_config_digest(path=None):
+    """配置文档内容摘要 (评级结果的输入指纹)"""
+    return hashlib.sha1(Path(path or GRADE_CONFIG_PATH).read_bytes()).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _cached_grader(path, digest):
+    return KpiGrader(parse_grade_config(path))
+
+
+def load_grader(path=None):
+    """读取配置并缓存评级器 (按内容摘要缓存, 配置改动后重新解析)"""
+    path = Path(path or GRADE_CONFIG_PATH)
+    return _cached_grader(path, grade_config_digest(path))
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+赔付率变动因素分解 (LMDI)
+
+满期赔付率 = 出险率 × 案均赔款 × 单均满期保费的倒数
+           = (赔案件数/保单件数) × (已报告赔款/赔案件数) × (保单件数/满期保费)
+
+对每个切片的相邻两周, 用对数平均迪氏指数法(LMDI-I)把赔付率变动拆成三项:
+    效应_k = L(LR₁, LR₀) × ln(x_k₁ / x_k₀),  L(a, b) = (a - b) / (ln a - ln b)
+三项之和严格等于赔付率变动 (无交叉残差); 相邻周效应逐段累加即为整个窗口的分解。
+任一因素为0 (如当周无赔案) 时对数无定义, 该周对记为不可分解, 变动全部计入残差;
+窗口内全部周对均不可分解的切片效应与主导因素均为NaN。
+全部切片 × 周对在一张长表上整列计算。
+"""
+
+import numpy as np
+import pandas as pd
+
+from kpi_cube import rollup, stack_cubes
+
+WEEK = 'week'
+PREVIOUS_WEEK = 'previous_week'
+
+# 因素: 名称 → (分子, 分母)
+FACTORS = {
+    'frequency': ('claim_case_count', 'policy_count'),
+    'severity': ('reported_claim_payment_yuan', 'claim_case_count'),
+    'exposure': ('policy_count', 'matured_premium_yuan'),
+}
+
+FACTOR_LABELS = {
+    'frequency': '出险频度',
+    'severity': '案均赔款',
+    'exposure': '单均满期保费',
+}
+
+EFFECT_COLUMNS = [f'{factor}_effect' for factor in FACTORS]
+
+DECOMPOSITION_COLUMNS = ['loss_ratio_previous', 'loss_ratio', 'delta'] + EFFECT_COLUMNS + ['residual', 'decomposable']
+
+
+def log_mean(a, b):
+    """对数平均 L(a, b); a == b 时取 a"""
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = (a - b) / (np.log(a) - np.log(b))
+    return np.where(np.isclose(a, b), a, mean)
+
+
+def _factor_values(sums):
+    """各因素取值矩阵 (分母不为正时为NaN)"""
+    values = {}
+    for factor, (numerator, denominator) in FACTORS.items():
+        base = sums[denominator].to_numpy(dtype=float)
+        values[factor] = sums[numerator].to_numpy(dtype=float) / np.where(base > 0, base, np.nan)
+    return values
+
+
+def decompose_loss_ratio(cubes, by, scale=100.0):
+    """{周次: 立方体} → 每个 (切片, 周次) 相对该切片上一可用周的赔付率变动分解
+
+    返回列: 切片维度 + week + previous_week + 上周/本周赔付率 + 变动 + 三项效应 + 残差 + 是否可分解
+    (赔付率与效应单位均为百分点)。
+    """
+    by = list(by)
+    if len(cubes) < 2:
+        return pd.DataFrame(columns=by + [WEEK, PREVIOUS_WEEK] + DECOMPOSITION_COLUMNS)
+
+    stacked = stack_cubes(cubes, WEEK)
+    sums = rollup(stacked, by + [WEEK]).sort_values(by + [WEEK], kind='stable').reset_index(drop=True)
+    measures = sorted({column for pair in FACTORS.values() for column in pair}) + [WEEK]
+
+    # 各切片上一可用周 (组内整体移位, 不逐切片循环)
+    if by:
+        previous = sums.groupby(by, observed=True, dropna=False, sort=False)[measures].shift(1)
+    else:
+        previous = sums[measures].shift(1)
+    paired = previous[WEEK].notna().to_numpy()
+    sums = sums[paired].reset_index(drop=True)
+    previous = previous[paired].reset_index(drop=True)
+
+    current_factors = _factor_values(sums)
+    previous_factors = _factor_values(previous)
+
+    def loss_ratio(frame):
+        base = frame['matured_premium_yuan'].to_numpy(dtype=float)
+        return frame['reported_claim_payment_yuan'].to_numpy(dtype=float) / np.where(base > 0, base, np.nan) * scale
+
+    result = sums[by + [WEEK]].copy()
+    result[PREVIOUS_WEEK] = previous[WEEK].astype(int).to_numpy()
+    result['loss_ratio_previous'] = loss_ratio(previous)
+    result['loss_ratio'] = loss_ratio(sums)
+    result['delta'] = result['loss_ratio'] - result['loss_ratio_previous']
+
+    decomposable = np.ones(len(result), dtype=bool)
+    for factor in FACTORS:
+        decomposable &= (current_factors[factor] > 0) & (previous_factors[factor] > 0)
+
+    weight = log_mean(result['loss_ratio'].to_numpy(), result['loss_ratio_previous'].to_numpy())
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for factor in FACTORS:
+            effect = weight * np.log(current_factors[factor] / previous_factors[factor])
+            result[f'{factor}_effect'] = np.where(decomposable, effect, np.nan)
+
+    explained = result[EFFECT_COLUMNS].sum(axis=1, min_count=1).fillna(0.0)
+    result['residual'] = result['delta'] - explained
+    result['decomposable'] = decomposable
+    return result
+
+
+def attribute_window(decomposition, by):
+    """逐周对分解累加为整个窗口的分解 (效应可加), 每个切片一行"""
+    by = list(by)
+    if len(decomposition) == 0:
+        return pd.DataFrame(columns=by + ['start_week', 'end_week', 'loss_ratio_start', 'loss_ratio_end',
+                                          'delta'] + EFFECT_COLUMNS + ['residual', 'main_driver'])
+
+    if by:
+        grouped = decomposition.groupby(by, observed=True, dropna=False, sort=False)
+    else:
+        grouped = decomposition.groupby(np.zeros(len(decomposition), dtype=int), sort=False)
+    window = grouped.agg(
+        start_week=(PREVIOUS_WEEK, 'min'),
+        end_week=(WEEK, 'max'),
+        loss_ratio_start=('loss_ratio_previous', 'first'),
+        loss_ratio_end=('loss_ratio', 'last'),
+        delta=('delta', 'sum'),
+        # 全部周对均不可分解的切片效应保持NaN (而非0), 变动全部在残差中
+        **{column: (column, lambda s: s.sum(min_count=1)) for column in EFFECT_COLUMNS},
+        residual=('residual', 'sum'),
+    )
+    window = window.reset_index(drop=not by)
+
+    # 主导因素: 绝对效应最大者; 不可分解的切片记为NaN
+    effects = window[EFFECT_COLUMNS].to_numpy(dtype=float)
+    labels = np.array([FACTOR_LABELS[factor] for factor in FACTORS], dtype=object)
+    strongest = labels[np.argmax(np.where(np.isnan(effects), -np.inf, np.abs(effects)), axis=1)]
+    window['main_driver'] = np.where(np.isnan(effects).all(axis=1), np.nan, strongest)
+    return window
+
+
+def rank_drivers(window, by, top_n=None):
+    """窗口分解 → (切片, 因素) 归因长表, 按效应绝对值降序"""
+    by = list(by)
+    long = window.melt(id_vars=by + ['loss_ratio_start', 'loss_ratio_end', 'delta'],
+                       value_vars=EFFECT_COLUMNS, var_name='factor', value_name='effect')
+    long['factor'] = long['factor'].str.removesuffix('_effect').map(FACTOR_LABELS)
+    long = long[long['effect'].notna()]
+
+    order = np.argsort(-long['effect'].abs().to_numpy(), kind='stable')
+    ranked = long.iloc[order].reset_index(drop=True)
+    return ranked.head(top_n) if top_n else ranked
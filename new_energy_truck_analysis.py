@@ -8,31 +8,188 @@
 import pandas as pd
 import numpy as np
 from pathlib import Path
-import matplotlib.pyplot as plt
-import seaborn as sns
 from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
 
-# 设置中文字体
-plt.rcParams['font.sans-serif'] = ['SimHei', 'Arial Unicode MS']
-plt.rcParams['axes.unicode_minus'] = False
+from data_io import read_detail_csv
+from data_schema import new_energy_operating_truck
+from kpi_cube import ROW_COUNT, build_cube, stack_cubes, weekly_series
+from chart_render import ChartBatch
+from report_templates import render_sections
+from run_metrics import RunRecorder
+from segment_index import read_segment
+
+# 分析配置
+START_WEEK = 28
+END_WEEK = 43
+DATA_FOLDER = "2025年保单"
+OUTPUT_FOLDER = "新能源货车分析报告"
+CACHE_FOLDER = ".cache"
+TRUCK_CUBE_DIMENSIONS = ['third_level_organization', 'business_type_category', 'coverage_type']
+ENABLE_DATA_CACHE = True    # 启用列式缓存与分段索引 (关闭时分块筛选读取)
+ENABLE_METRICS_TABLE = False    # 控制台实时打印各阶段耗时/内存表
+CHART_FORMATS = ('png',)        # 图表格式: png / svg (矢量, 体积小, 报告中嵌入)
+CHART_DPI = 300                 # png分辨率
+CHART_WORKERS = 2               # 图表绘制进程数 (>1 时后台并行绘制, 文字报告无需等待)
+ENABLE_CHART_CACHE = True       # 启用图表缓存 (绘图数据未变时直接复用)
+
+# 报告模板 (各章节独立渲染后顺序拼接)
+REPORT_TEMPLATES = {
+    'summary': """# 新能源货车专项分析报告
+
+## 执行摘要
+
+{summary[core_conclusion]}
+
+### 关键指标
+- **累计承保车辆**: {metrics[total_vehicles]}辆
+- **累计签单保费**: {metrics[total_premium]:.1f}万元  
+- **平均赔付率**: {metrics[avg_loss_ratio]:.1f}%
+- **最新周次**: 第{metrics[latest_week]}周
+- **最新赔付率**: {metrics[latest_loss_ratio]:.1f}%
+
+### 风险关注点
+{% for risk in summary[risk_points] %}
+- {risk}
+{% endfor %}
+
+### 管理建议
+{% for rec in summary[recommendations] %}
+- {rec}
+{% endfor %}
+""",
+
+    'weekly_trend': """{% if weekly %}
+
+
+## 周度趋势分析
+
+| 周次 | 签单保费(万元) | 赔付率(%) | 出险率(%) | 案均赔款(元) | 承保车辆数 |
+|------|---------------|-----------|-----------|-------------|------------|
+{% for row in weekly %}
+| {row[week]} | {row[signed_premium]:.1f} | {row[loss_ratio]:.1f} | {row[claim_rate]:.1f} | {row[avg_claim]:.0f} | {row[vehicle_count]} |
+{% endfor %}
+{% endif %}
+""",
+
+    'organizations': """{% if organizations %}
+
+
+## 机构分析
+
+### 高风险机构（赔付率>80%）
+{% if high_risk %}
+
+| 机构 | 赔付率(%) | 保费规模(万元) | 车辆数 | 周均车辆数 |
+|------|-----------|---------------|--------|------------|
+{% for row in high_risk %}
+| {row[organization]} | {row[loss_ratio]:.1f} | {row[premium_amount]:.1f} | {row[vehicle_count]} | {row[avg_weekly_vehicles]:.1f} |
+{% endfor %}
+{% else %}
+
+暂无高风险机构
+{% endif %}
+
+### 所有机构明细
+
+| 机构 | 赔付率(%) | 保费规模(万元) | 车辆数 |
+|------|-----------|---------------|--------|
+{% for row in organizations %}
+| {row[organization]} | {row[loss_ratio]:.1f} | {row[premium_amount]:.1f} | {row[vehicle_count]} |
+{% endfor %}
+{% endif %}
+""",
+
+    'business_types': """{% if business_types %}
+
+
+## 业务类型分析
+
+| 业务类型 | 赔付率(%) | 保费规模(万元) | 车辆数 |
+|----------|-----------|---------------|--------|
+{% for row in business_types %}
+| {row[business_type]} | {row[loss_ratio]:.1f} | {row[premium_amount]:.1f} | {row[vehicle_count]} |
+{% endfor %}
+{% endif %}
+""",
+
+    'coverages': """{% if coverages %}
+
+
+## 险别分析
+
+| 险别 | 赔付率(%) | 保费规模(万元) | 车辆数 |
+|------|-----------|---------------|--------|
+{% for row in coverages %}
+| {row[coverage_type]} | {row[loss_ratio]:.1f} | {row[premium_amount]:.1f} | {row[vehicle_count]} |
+{% endfor %}
+{% endif %}
+""",
+
+    'problems': """{% if problems %}
+
+
+## 趋势与问题分析
+{% if overall_trends %}
+
+### 整体趋势
+- **赔付率趋势**: {overall_trends[loss_ratio_trend]}
+- **保费趋势**: {overall_trends[premium_trend]}
+{% endif %}
+{% if abnormal %}
+
+### 异常波动
+- **类型**: {abnormal[type]}
+- **最新值**: {abnormal[latest_value]:.1f}
+- **近期均值**: {abnormal[recent_average]:.1f}  
+- **偏离度**: {abnormal[deviation]:.1%}
+{% endif %}
+{% endif %}
+""",
+
+    'charts': """{% if charts %}
+
+
+## 图表
+{% for chart in charts %}
+
+![{chart[title]}]({chart[file]})
+{% endfor %}
+{% endif %}""",
+
+    'footer': """
+
+---
+
+**报告生成时间**: {generated_at}
+**分析周期**: 2025年保单第{start_week}-{end_week}周
+**数据范围**: 新能源货车（营业货车）
+""",
+}
+
 
 class NewEnergyTruckAnalyzer:
     """新能源货车专项分析器"""
     
-    def __init__(self):
-        self.start_week = 28
-        self.end_week = 43
-        self.data_folder = Path("/Users/xuechenglong/Desktop/weekly_report/2025年保单")
-        self.output_folder = Path("新能源货车分析报告")
-        self.output_folder.mkdir(exist_ok=True)
+    def __init__(self, data_folder=DATA_FOLDER, start_week=START_WEEK, end_week=END_WEEK,
+                 output_folder=OUTPUT_FOLDER, metrics_table=ENABLE_METRICS_TABLE, chart_formats=CHART_FORMATS,
+                 chart_workers=CHART_WORKERS, use_chart_cache=ENABLE_CHART_CACHE):
+        self.start_week = start_week
+        self.end_week = end_week
+        self.data_folder = Path(data_folder)
+        self.output_folder = Path(output_folder)
+        self.output_folder.mkdir(parents=True, exist_ok=True)
+        self.recorder = RunRecorder('truck_operating', live=metrics_table)
+        self.chart_formats = tuple(chart_formats)
+        self.chart_workers = chart_workers
+        self.use_chart_cache = use_chart_cache
         
     def load_weekly_data(self):
-        """加载第28周至43周数据"""
+        """加载第28周至43周数据 (逐周预聚合为立方体, 明细不跨周驻留内存)"""
         print("📊 加载2025年保单第28-43周数据...")
         
-        all_data = []
+        weekly_cubes = {}
         for week in range(self.start_week, self.end_week + 1):
             # 跳过缺失的周次
             if week in [32, 38]:  # 假设这些周次缺失
@@ -42,139 +199,135 @@ class NewEnergyTruckAnalyzer:
             
             if file_path.exists():
                 try:
-                    df = pd.read_csv(file_path)
-                    # 筛选新能源货车数据
-                    new_energy_trucks = df[
-                        (df['is_new_energy_vehicle'] == True) & 
-                        (df['customer_category_3'] == '营业货车')
-                    ].copy()
-                    new_energy_trucks['week'] = week
-                    all_data.append(new_energy_trucks)
+                    with self.recorder.stage(f"load_week_{week}") as record:
+                        # 筛选新能源营业货车数据
+                        if ENABLE_DATA_CACHE:
+                            new_energy_trucks = read_segment(
+                                file_path, CACHE_FOLDER,
+                                is_new_energy_vehicle=True, customer_category_3='营业货车'
+                            )
+                        else:
+                            new_energy_trucks = read_detail_csv(file_path, predicates=(new_energy_operating_truck,))
+                        if len(new_energy_trucks) > 0:
+                            weekly_cubes[week] = build_cube(new_energy_trucks, TRUCK_CUBE_DIMENSIONS)
+                        record['output_rows'] = len(new_energy_trucks)
                     print(f"  第{week}周: {len(new_energy_trucks)}条新能源货车记录")
                 except Exception as e:
                     print(f"  第{week}周数据加载失败: {e}")
             else:
                 print(f"  第{week}周文件不存在")
         
-        if all_data:
-            combined_data = pd.concat(all_data, ignore_index=True)
-            print(f"✅ 成功加载 {len(combined_data)} 条新能源货车记录")
-            return combined_data
+        if weekly_cubes:
+            combined_cube = stack_cubes(weekly_cubes)
+            print(f"✅ 成功加载 {combined_cube[ROW_COUNT].sum()} 条新能源货车记录")
+            return combined_cube
         else:
             print("❌ 没有找到新能源货车数据")
             return pd.DataFrame()
     
     def calculate_weekly_kpis(self, df):
-        """计算周度KPI指标"""
+        """计算周度KPI指标 (df 为带week列的多周立方体; 附当周发生值列)"""
         print("📈 计算周度KPI指标...")
         
-        weekly_kpis = []
+        # 一次分组得到累计序列与当周发生序列
+        cumulative, weekly = weekly_series(df)
+        weekly_kpis = self._kpi_frame(cumulative)
+        weekly_kpis['vehicle_count'] = cumulative[ROW_COUNT]
         
-        for week in sorted(df['week'].unique()):
-            week_df = df[df['week'] == week]
-            
-            if len(week_df) == 0:
-                continue
-            
-            # 核心指标计算
-            signed_premium = week_df['signed_premium_yuan'].sum()
-            matured_premium = week_df['matured_premium_yuan'].sum()
-            reported_claims = week_df['reported_claim_payment_yuan'].sum()
-            expense_amount = week_df['expense_amount_yuan'].sum()
-            policy_count = week_df['policy_count'].sum()
-            claim_count = week_df['claim_case_count'].sum()
-            
-            # 率值指标
-            loss_ratio = (reported_claims / matured_premium * 100) if matured_premium > 0 else 0
-            expense_ratio = (expense_amount / signed_premium * 100) if signed_premium > 0 else 0
-            contribution_margin = 100 - loss_ratio - expense_ratio
-            
-            # 单均指标
-            avg_premium = signed_premium / policy_count if policy_count > 0 else 0
-            avg_claim = reported_claims / claim_count if claim_count > 0 else 0
-            claim_rate = (claim_count / policy_count * 100) if policy_count > 0 else 0
-            
-            weekly_kpis.append({
-                'week': week,
-                'signed_premium': signed_premium / 10000,  # 万元
-                'matured_premium': matured_premium / 10000,  # 万元
-                'reported_claims': reported_claims / 10000,  # 万元
-                'expense_amount': expense_amount / 10000,  # 万元
-                'policy_count': policy_count,
-                'claim_count': claim_count,
-                'loss_ratio': loss_ratio,
-                'expense_ratio': expense_ratio,
-                'contribution_margin': contribution_margin,
-                'avg_premium': avg_premium,
-                'avg_claim': avg_claim,
-                'claim_rate': claim_rate,
-                'vehicle_count': len(week_df)
-            })
+        occurred = self._kpi_frame(weekly).add_prefix('weekly_')
+        weekly_kpis = weekly_kpis.join(occurred)
         
-        return pd.DataFrame(weekly_kpis)
+        return weekly_kpis.reset_index()
+    
+    @staticmethod
+    def _kpi_frame(totals):
+        """由各周指标合计向量化计算KPI (金额单位: 万元)"""
+        signed_premium = totals['signed_premium_yuan']
+        matured_premium = totals['matured_premium_yuan']
+        reported_claims = totals['reported_claim_payment_yuan']
+        expense_amount = totals['expense_amount_yuan']
+        policy_count = totals['policy_count']
+        claim_count = totals['claim_case_count']
+        
+        def safe_ratio(numerator, denominator, scale=1):
+            return (numerator / denominator.where(denominator > 0) * scale).fillna(0).where(denominator.notna())
+        
+        # 率值指标
+        loss_ratio = safe_ratio(reported_claims, matured_premium, 100)
+        expense_ratio = safe_ratio(expense_amount, signed_premium, 100)
+        
+        return pd.DataFrame({
+            'signed_premium': signed_premium / 10000,  # 万元
+            'matured_premium': matured_premium / 10000,  # 万元
+            'reported_claims': reported_claims / 10000,  # 万元
+            'expense_amount': expense_amount / 10000,  # 万元
+            'policy_count': policy_count,
+            'claim_count': claim_count,
+            'loss_ratio': loss_ratio,
+            'expense_ratio': expense_ratio,
+            'contribution_margin': 100 - loss_ratio - expense_ratio,
+            # 单均指标
+            'avg_premium': safe_ratio(signed_premium, policy_count),
+            'avg_claim': safe_ratio(reported_claims, claim_count),
+            'claim_rate': safe_ratio(claim_count, policy_count, 100)
+        }, index=totals.index)
     
     def analyze_by_dimensions(self, df):
-        """多维度分析"""
+        """多维度分析 (df 为带week列的多周立方体)"""
         print("🔍 多维度分析...")
         
         analyses = {}
         
         # 1. 分机构分析
+        org_groups = df.groupby('third_level_organization', observed=True, dropna=False, sort=False)
+        org_sums = org_groups[['matured_premium_yuan', 'reported_claim_payment_yuan', ROW_COUNT]].sum()
+        org_weeks = org_groups['week'].nunique()
+        
         org_analysis = []
-        for org in df['third_level_organization'].unique():
-            org_df = df[df['third_level_organization'] == org]
-            
-            total_premium = org_df['matured_premium_yuan'].sum()
-            total_claims = org_df['reported_claim_payment_yuan'].sum()
+        for org, sums in org_sums.iterrows():
+            total_premium = sums['matured_premium_yuan']
+            total_claims = sums['reported_claim_payment_yuan']
             loss_ratio = (total_claims / total_premium * 100) if total_premium > 0 else 0
             
             org_analysis.append({
                 'organization': org,
-                'vehicle_count': len(org_df),
+                'vehicle_count': int(sums[ROW_COUNT]),
                 'premium_amount': total_premium / 10000,
                 'loss_ratio': loss_ratio,
-                'avg_weekly_vehicles': len(org_df) / len(org_df['week'].unique()) if len(org_df) > 0 else 0
+                'avg_weekly_vehicles': sums[ROW_COUNT] / org_weeks[org] if sums[ROW_COUNT] > 0 else 0
             })
         
         analyses['by_organization'] = pd.DataFrame(org_analysis)
         
         # 2. 分业务类型分析
-        biz_analysis = []
-        for biz_type in df['business_type_category'].unique():
-            biz_df = df[df['business_type_category'] == biz_type]
-            
-            total_premium = biz_df['matured_premium_yuan'].sum()
-            total_claims = biz_df['reported_claim_payment_yuan'].sum()
-            loss_ratio = (total_claims / total_premium * 100) if total_premium > 0 else 0
-            
-            biz_analysis.append({
-                'business_type': biz_type,
-                'vehicle_count': len(biz_df),
-                'premium_amount': total_premium / 10000,
-                'loss_ratio': loss_ratio
-            })
-        
-        analyses['by_business_type'] = pd.DataFrame(biz_analysis)
+        analyses['by_business_type'] = self._dimension_summary(df, 'business_type_category', 'business_type')
         
         # 3. 分险别分析
-        coverage_analysis = []
-        for coverage in df['coverage_type'].unique():
-            coverage_df = df[df['coverage_type'] == coverage]
-            
-            total_premium = coverage_df['matured_premium_yuan'].sum()
-            total_claims = coverage_df['reported_claim_payment_yuan'].sum()
+        analyses['by_coverage'] = self._dimension_summary(df, 'coverage_type', 'coverage_type')
+        
+        return analyses
+    
+    @staticmethod
+    def _dimension_summary(df, column, label):
+        """单维度汇总 (按首次出现顺序)"""
+        sums = df.groupby(column, observed=True, dropna=False, sort=False)[
+            ['matured_premium_yuan', 'reported_claim_payment_yuan', ROW_COUNT]
+        ].sum()
+        
+        summary = []
+        for value, row in sums.iterrows():
+            total_premium = row['matured_premium_yuan']
+            total_claims = row['reported_claim_payment_yuan']
             loss_ratio = (total_claims / total_premium * 100) if total_premium > 0 else 0
             
-            coverage_analysis.append({
-                'coverage_type': coverage,
-                'vehicle_count': len(coverage_df),
+            summary.append({
+                label: value,
+                'vehicle_count': int(row[ROW_COUNT]),
                 'premium_amount': total_premium / 10000,
                 'loss_ratio': loss_ratio
             })
         
-        analyses['by_coverage'] = pd.DataFrame(coverage_analysis)
-        
-        return analyses
+        return pd.DataFrame(summary)
     
     def identify_problems_and_trends(self, weekly_kpis, dimensional_analyses):
         """识别问题和趋势"""
@@ -276,214 +429,104 @@ class NewEnergyTruckAnalyzer:
             ]
         }
     
-    def create_visualizations(self, weekly_kpis, dimensional_analyses):
-        """创建可视化图表"""
-        print("📊 创建可视化图表...")
+    def chart_specs(self, weekly_kpis, dimensional_analyses):
+        """图表描述 (纯数据, 供 chart_render 绘制与计算缓存指纹)"""
+        weeks = weekly_kpis['week'].astype(int).tolist()
+        alert_line = {'y': 70, 'color': 'orange', 'label': '警戒线70%'}
+        specs = [{
+            'name': '新能源货车周度趋势分析',
+            'figsize': (16, 12),
+            'grid': (2, 2),
+            'panels': [
+                {'kind': 'line', 'x': weeks, 'y': weekly_kpis['loss_ratio'].tolist(), 'fmt': 'ro-',
+                 'title': '新能源货车周度赔付率趋势', 'xlabel': '周次', 'ylabel': '赔付率(%)', 'hlines': [alert_line]},
+                {'kind': 'bar', 'x': weeks, 'y': weekly_kpis['signed_premium'].tolist(), 'color': 'steelblue',
+                 'title': '新能源货车周度签单保费', 'xlabel': '周次', 'ylabel': '签单保费(万元)'},
+                {'kind': 'line', 'x': weeks, 'y': weekly_kpis['avg_claim'].tolist(), 'fmt': 'go-',
+                 'title': '新能源货车案均赔款趋势', 'xlabel': '周次', 'ylabel': '案均赔款(元)'},
+                {'kind': 'line', 'x': weeks, 'y': weekly_kpis['claim_rate'].tolist(), 'fmt': 'bo-',
+                 'title': '新能源货车出险率趋势', 'xlabel': '周次', 'ylabel': '出险率(%)'},
+            ]
+        }]
         
-        if len(weekly_kpis) == 0:
-            print("  无数据，跳过图表生成")
-            return
-        
-        plt.style.use('seaborn-v0_8')
-        fig_size = (12, 8)
-        
-        # 1. 周度趋势图
-        fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(16, 12))
-        
-        # 赔付率趋势
-        ax1.plot(weekly_kpis['week'], weekly_kpis['loss_ratio'], 'ro-', linewidth=2, markersize=6)
-        ax1.axhline(y=70, color='orange', linestyle='--', alpha=0.7, label='警戒线70%')
-        ax1.set_title('新能源货车周度赔付率趋势', fontsize=14, fontweight='bold')
-        ax1.set_xlabel('周次')
-        ax1.set_ylabel('赔付率(%)')
-        ax1.grid(True, alpha=0.3)
-        ax1.legend()
-        
-        # 保费规模趋势
-        ax2.bar(weekly_kpis['week'], weekly_kpis['signed_premium'], color='steelblue', alpha=0.7)
-        ax2.set_title('新能源货车周度签单保费', fontsize=14, fontweight='bold')
-        ax2.set_xlabel('周次')
-        ax2.set_ylabel('签单保费(万元)')
-        ax2.grid(True, alpha=0.3)
-        
-        # 案均赔款趋势
-        ax3.plot(weekly_kpis['week'], weekly_kpis['avg_claim'], 'go-', linewidth=2, markersize=6)
-        ax3.set_title('新能源货车案均赔款趋势', fontsize=14, fontweight='bold')
-        ax3.set_xlabel('周次')
-        ax3.set_ylabel('案均赔款(元)')
-        ax3.grid(True, alpha=0.3)
-        
-        # 出险率趋势
-        ax4.plot(weekly_kpis['week'], weekly_kpis['claim_rate'], 'bo-', linewidth=2, markersize=6)
-        ax4.set_title('新能源货车出险率趋势', fontsize=14, fontweight='bold')
-        ax4.set_xlabel('周次')
-        ax4.set_ylabel('出险率(%)')
-        ax4.grid(True, alpha=0.3)
-        
-        plt.tight_layout()
-        plt.savefig(self.output_folder / '新能源货车周度趋势分析.png', dpi=300, bbox_inches='tight')
-        plt.close()
-        
-        # 2. 机构分析图
         org_df = dimensional_analyses['by_organization']
         if len(org_df) > 0:
-            fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 6))
-            
-            # 机构赔付率对比
+            organizations = org_df['organization'].astype(str).tolist()
+            positions = list(range(len(org_df)))
             colors = ['red' if x > 80 else 'orange' if x > 70 else 'green' for x in org_df['loss_ratio']]
-            ax1.bar(range(len(org_df)), org_df['loss_ratio'], color=colors, alpha=0.7)
-            ax1.set_xticks(range(len(org_df)))
-            ax1.set_xticklabels(org_df['organization'], rotation=45)
-            ax1.axhline(y=70, color='orange', linestyle='--', alpha=0.7, label='警戒线70%')
-            ax1.axhline(y=80, color='red', linestyle='--', alpha=0.7, label='高危线80%')
-            ax1.set_title('各机构新能源货车赔付率对比', fontsize=14, fontweight='bold')
-            ax1.set_ylabel('赔付率(%)')
-            ax1.legend()
-            ax1.grid(True, alpha=0.3)
-            
-            # 机构业务规模对比
-            ax2.bar(range(len(org_df)), org_df['premium_amount'], color='steelblue', alpha=0.7)
-            ax2.set_xticks(range(len(org_df)))
-            ax2.set_xticklabels(org_df['organization'], rotation=45)
-            ax2.set_title('各机构新能源货车保费规模', fontsize=14, fontweight='bold')
-            ax2.set_ylabel('保费规模(万元)')
-            ax2.grid(True, alpha=0.3)
-            
-            plt.tight_layout()
-            plt.savefig(self.output_folder / '新能源货车机构分析.png', dpi=300, bbox_inches='tight')
-            plt.close()
-        
-        print("  ✅ 图表生成完成")
+            specs.append({
+                'name': '新能源货车机构分析',
+                'figsize': (16, 6),
+                'grid': (1, 2),
+                'panels': [
+                    {'kind': 'bar', 'x': positions, 'y': org_df['loss_ratio'].tolist(), 'color': colors,
+                     'xticklabels': organizations, 'rotation': 45, 'title': '各机构新能源货车赔付率对比',
+                     'ylabel': '赔付率(%)',
+                     'hlines': [alert_line, {'y': 80, 'color': 'red', 'label': '高危线80%'}]},
+                    {'kind': 'bar', 'x': positions, 'y': org_df['premium_amount'].tolist(), 'color': 'steelblue',
+                     'xticklabels': organizations, 'rotation': 45, 'title': '各机构新能源货车保费规模',
+                     'ylabel': '保费规模(万元)'},
+                ]
+            })
+        return specs
     
-    def generate_markdown_report(self, weekly_kpis, dimensional_analyses, problems, summary):
-        """生成Markdown格式报告"""
-        print("📝 生成Markdown报告...")
-        
-        report = f"""# 新能源货车专项分析报告
-
-## 执行摘要
-
-{summary['core_conclusion']}
-
-### 关键指标
-- **累计承保车辆**: {summary['key_metrics']['total_vehicles']}辆
-- **累计签单保费**: {summary['key_metrics']['total_premium']:.1f}万元  
-- **平均赔付率**: {summary['key_metrics']['avg_loss_ratio']:.1f}%
-- **最新周次**: 第{summary['key_metrics']['latest_week']}周
-- **最新赔付率**: {summary['key_metrics']['latest_loss_ratio']:.1f}%
-
-### 风险关注点
-"""
-        
-        for risk in summary['risk_points']:
-            report += f"- {risk}\n"
-        
-        report += "\n### 管理建议\n"
-        for rec in summary['recommendations']:
-            report += f"- {rec}\n"
-        
-        # 周度趋势分析
-        if len(weekly_kpis) > 0:
-            report += f"""
-
-## 周度趋势分析
-
-| 周次 | 签单保费(万元) | 赔付率(%) | 出险率(%) | 案均赔款(元) | 承保车辆数 |
-|------|---------------|-----------|-----------|-------------|------------|\n"""
-            
-            for _, row in weekly_kpis.iterrows():
-                report += f"| {row['week']} | {row['signed_premium']:.1f} | {row['loss_ratio']:.1f} | {row['claim_rate']:.1f} | {row['avg_claim']:.0f} | {row['vehicle_count']} |\n"
+    def create_visualizations(self, weekly_kpis, dimensional_analyses):
+        """创建可视化图表: 命中缓存的图表直接复制, 其余提交绘制 (返回 ChartBatch, 调用 wait() 等待完成)"""
+        print("📊 创建可视化图表...")
         
-        # 机构分析
+        if len(weekly_kpis) == 0:
+            print("  无数据，跳过图表生成")
+            return None
+        
+        cache_folder = Path(CACHE_FOLDER) / 'charts' if self.use_chart_cache else None
+        batch = ChartBatch(self.chart_specs(weekly_kpis, dimensional_analyses), self.output_folder,
+                           formats=self.chart_formats, dpi=CHART_DPI, cache_folder=cache_folder,
+                           workers=self.chart_workers).start()
+        print(f"  复用缓存{batch.cached}张, 待绘制{batch.rendered}张")
+        return batch
+    
+    def report_sections(self, weekly_kpis, dimensional_analyses, problems, summary, charts=None):
+        """报告各章节 [(模板名, 数据模型), ...]; 输出svg图表时在报告末尾嵌入"""
         org_df = dimensional_analyses['by_organization']
-        if len(org_df) > 0:
-            report += """
 
-## 机构分析
+        def records(df):
+            # 按赔付率降序的行记录
+            return df.sort_values('loss_ratio', ascending=False).to_dict('records') if len(df) > 0 else []
 
-### 高风险机构（赔付率>80%）
-"""
-            
-            high_risk = org_df[org_df['loss_ratio'] > 80].sort_values('loss_ratio', ascending=False)
-            if len(high_risk) > 0:
-                report += """
-| 机构 | 赔付率(%) | 保费规模(万元) | 车辆数 | 周均车辆数 |
-|------|-----------|---------------|--------|------------|\n"""
-                for _, row in high_risk.iterrows():
-                    report += f"| {row['organization']} | {row['loss_ratio']:.1f} | {row['premium_amount']:.1f} | {row['vehicle_count']} | {row['avg_weekly_vehicles']:.1f} |\n"
-            else:
-                report += "\n暂无高风险机构\n"
-            
-            report += """
-### 所有机构明细
-
-| 机构 | 赔付率(%) | 保费规模(万元) | 车辆数 |
-|------|-----------|---------------|--------|\n"""
-            
-            for _, row in org_df.sort_values('loss_ratio', ascending=False).iterrows():
-                report += f"| {row['organization']} | {row['loss_ratio']:.1f} | {row['premium_amount']:.1f} | {row['vehicle_count']} |\n"
-        
-        # 业务类型分析
-        biz_df = dimensional_analyses['by_business_type']
-        if len(biz_df) > 0:
-            report += """
-
-## 业务类型分析
-
-| 业务类型 | 赔付率(%) | 保费规模(万元) | 车辆数 |
-|----------|-----------|---------------|--------|\n"""
-            
-            for _, row in biz_df.sort_values('loss_ratio', ascending=False).iterrows():
-                report += f"| {row['business_type']} | {row['loss_ratio']:.1f} | {row['premium_amount']:.1f} | {row['vehicle_count']} |\n"
-        
-        # 险别分析
-        coverage_df = dimensional_analyses['by_coverage']
-        if len(coverage_df) > 0:
-            report += """
-
-## 险别分析
-
-| 险别 | 赔付率(%) | 保费规模(万元) | 车辆数 |
-|------|-----------|---------------|--------|\n"""
-            
-            for _, row in coverage_df.sort_values('loss_ratio', ascending=False).iterrows():
-                report += f"| {row['coverage_type']} | {row['loss_ratio']:.1f} | {row['premium_amount']:.1f} | {row['vehicle_count']} |\n"
-        
-        # 趋势和问题分析
-        if problems:
-            report += """
+        return [
+            ('summary', {'summary': summary, 'metrics': summary['key_metrics']}),
+            ('weekly_trend', {'weekly': weekly_kpis.to_dict('records')}),
+            ('organizations', {
+                'organizations': records(org_df),
+                'high_risk': records(org_df[org_df['loss_ratio'] > 80]) if len(org_df) > 0 else []
+            }),
+            ('business_types', {'business_types': records(dimensional_analyses['by_business_type'])}),
+            ('coverages', {'coverages': records(dimensional_analyses['by_coverage'])}),
+            ('problems', {
+                'problems': problems,
+                'overall_trends': problems.get('overall_trends'),
+                'abnormal': problems.get('abnormal_fluctuation')
+            }),
+            ('charts', {
+                'charts': [
+                    {'title': spec['name'], 'file': f"{spec['name']}.svg"}
+                    for spec in (charts.specs if charts is not None and 'svg' in charts.formats else [])
+                ]
+            }),
+            ('footer', {
+                'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'start_week': self.start_week,
+                'end_week': self.end_week
+            })
+        ]
 
-## 趋势与问题分析
-"""
-            
-            if 'overall_trends' in problems:
-                trends = problems['overall_trends']
-                report += f"""
-### 整体趋势
-- **赔付率趋势**: {trends['loss_ratio_trend']}
-- **保费趋势**: {trends['premium_trend']}
-"""
-            
-            if 'abnormal_fluctuation' in problems:
-                abnormal = problems['abnormal_fluctuation']
-                report += f"""
-### 异常波动
-- **类型**: {abnormal['type']}
-- **最新值**: {abnormal['latest_value']:.1f}
-- **近期均值**: {abnormal['recent_average']:.1f}  
-- **偏离度**: {abnormal['deviation']:.1%}
-"""
-        
-        report += f"""
+    def generate_markdown_report(self, weekly_kpis, dimensional_analyses, problems, summary, charts=None):
+        """生成Markdown格式报告"""
+        print("📝 生成Markdown报告...")
 
----
+        sections = self.report_sections(weekly_kpis, dimensional_analyses, problems, summary, charts)
+        return "".join(render_sections(REPORT_TEMPLATES, sections))
 
-**报告生成时间**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-**分析周期**: 2025年保单第{self.start_week}-{self.end_week}周
-**数据范围**: 新能源货车（营业货车）
-"""
-        
-        return report
     
     def run_analysis(self):
         """运行完整分析流程"""
@@ -497,27 +540,35 @@ class NewEnergyTruckAnalyzer:
             return False
         
         # 2. 计算周度KPI
-        weekly_kpis = self.calculate_weekly_kpis(df)
+        with self.recorder.stage('weekly_kpis', len(df)) as record:
+            weekly_kpis = self.calculate_weekly_kpis(df)
+            record['output_rows'] = len(weekly_kpis)
         print(f"✅ 计算了 {len(weekly_kpis)} 周的KPI数据")
         
         # 3. 多维度分析
-        dimensional_analyses = self.analyze_by_dimensions(df)
+        with self.recorder.stage('dimension_analysis', len(df)) as record:
+            dimensional_analyses = self.analyze_by_dimensions(df)
+            record['output_rows'] = sum(len(analysis) for analysis in dimensional_analyses.values())
         print("✅ 完成多维度分析")
         
         # 4. 识别问题和趋势
-        problems = self.identify_problems_and_trends(weekly_kpis, dimensional_analyses)
+        with self.recorder.stage('problems', len(weekly_kpis)):
+            problems = self.identify_problems_and_trends(weekly_kpis, dimensional_analyses)
         print("✅ 完成问题识别")
         
         # 5. 生成执行摘要
-        summary = self.generate_executive_summary(weekly_kpis, dimensional_analyses, problems)
+        with self.recorder.stage('executive_summary'):
+            summary = self.generate_executive_summary(weekly_kpis, dimensional_analyses, problems)
         print("✅ 生成执行摘要")
         
-        # 6. 创建可视化
-        self.create_visualizations(weekly_kpis, dimensional_analyses)
-        print("✅ 创建可视化图表")
+        # 6. 提交图表绘制 (后台进行, 不阻塞文字报告)
+        with self.recorder.stage('visualizations'):
+            charts = self.create_visualizations(weekly_kpis, dimensional_analyses)
         
         # 7. 生成Markdown报告
-        markdown_report = self.generate_markdown_report(weekly_kpis, dimensional_analyses, problems, summary)
+        with self.recorder.stage('markdown_report'):
+            markdown_report = self.generate_markdown_report(weekly_kpis, dimensional_analyses, problems, summary,
+                                                            charts)
         
         # 保存报告
         report_path = self.output_folder / "新能源货车专项分析报告.md"
@@ -526,6 +577,13 @@ class NewEnergyTruckAnalyzer:
         
         print("✅ 完成Markdown报告生成")
         
+        # 等待图表完成
+        if charts is not None:
+            with self.recorder.stage('chart_render') as record:
+                files = charts.wait()
+                record['output_rows'] = len(files)
+            print(f"✅ 创建可视化图表 ({len(files)}个文件, 复用缓存{charts.cached}个)")
+        
         # 保存数据文件
         weekly_kpis.to_csv(self.output_folder / "周度KPI数据.csv", index=False, encoding='utf-8')
         
@@ -534,13 +592,16 @@ class NewEnergyTruckAnalyzer:
         
         print("✅ 数据文件保存完成")
         
+        record_path = self.recorder.write(self.output_folder, f"第{self.start_week}-{self.end_week}周")
+        print(f"⏱️  运行记录: {record_path.name} (总耗时{self.recorder.summary()['seconds']:.1f}秒)")
+        
         # 最终总结
         print("\n" + "=" * 60)
         print("🎉 新能源货车专项分析完成！")
         print("=" * 60)
         print(f"📊 分析周期: 第{self.start_week}-{self.end_week}周")
-        print(f"📈 数据记录: {len(df)}条")
-        print(f"🚛 新能源货车: {len(df)}辆")
+        print(f"📈 数据记录: {df[ROW_COUNT].sum()}条")
+        print(f"🚛 新能源货车: {df[ROW_COUNT].sum()}辆")
         print(f"💰 累计保费: {weekly_kpis['signed_premium'].sum():.1f}万元")
         print(f"📋 平均赔付率: {weekly_kpis['loss_ratio'].mean():.1f}%")
         print(f"📁 报告位置: {self.output_folder}")
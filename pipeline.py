@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+阶段级缓存流水线
+
+将调用链表达为有向无环图: 每个阶段的指纹 = 阶段名 + 参数 + 外部输入摘要
++ 相关代码源码 + 上游阶段指纹。指纹未变的阶段直接读取持久化结果,
+且按需(惰性)解析 —— 下游命中缓存时, 上游阶段既不计算也不读取。
+"""
+
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import pickle
+from contextlib import contextmanager
+from pathlib import Path
+
+from run_metrics import count_rows
+
+# 缓存格式版本 (调整指纹算法时递增)
+PIPELINE_VERSION = 1
+
+
+def source_fingerprint(objects):
+    """代码指纹: 类/函数/模块的源码摘要 (字符串视为模块名)"""
+    sha1 = hashlib.sha1()
+    for obj in objects:
+        if isinstance(obj, str):
+            obj = importlib.import_module(obj)
+        try:
+            source = inspect.getsource(obj)
+        except (OSError, TypeError):
+            source = getattr(obj, '__qualname__', repr(obj))
+        sha1.update(source.encode('utf-8'))
+    return sha1.hexdigest()
+
+
+class Stage:
+    """流水线阶段"""
+
+    def __init__(self, name, func, deps=(), params=None, inputs=None, code=(), persist=True):
+        self.name = name
+        self.func = func            # func(*上游结果, **params)
+        self.deps = list(deps)
+        self.params = params or {}
+        self.inputs = inputs        # 外部输入摘要 (如源文件内容哈希), 需可JSON序列化
+        self.code = list(code)
+        self.persist = persist      # False: 每次执行且不落盘 (如含生成时间的报告)
+
+
+class Pipeline:
+    """按依赖惰性执行的阶段图, 阶段结果以指纹为键持久化"""
+
+    def __init__(self, cache_folder, enabled=True, recorder=None):
+        self.cache_folder = Path(cache_folder)
+        self.enabled = enabled
+        self.recorder = recorder    # run_metrics.RunRecorder, 记录各阶段耗时与行数
+        self.stages = {}
+        self._fingerprints = {}
+        self._results = {}
+
+    def stage(self, name, func, deps=(), params=None, inputs=None, code=(), persist=True):
+        """注册阶段 (上游阶段须先注册)"""
+        for dep in deps:
+            if dep not in self.stages:
+                raise KeyError(f"阶段 {name} 的上游阶段未注册: {dep}")
+
+        self.stages[name] = Stage(name, func, deps, params, inputs, code, persist)
+        return self
+
+    def fingerprint(self, name):
+        """阶段指纹 (不执行阶段)"""
+        if name not in self._fingerprints:
+            stage = self.stages[name]
+            payload = {
+                'version': PIPELINE_VERSION,
+                'name': name,
+                'params': stage.params,
+                'inputs': stage.inputs,
+                'code': source_fingerprint(stage.code),
+                'deps': [self.fingerprint(dep) for dep in stage.deps]
+            }
+            encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=repr)
+            self._fingerprints[name] = hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+        return self._fingerprints[name]
+
+    def _path(self, name):
+        """阶段结果文件"""
+        return self.cache_folder / f"{name}-{self.fingerprint(name)[:16]}.pkl"
+
+    def _load(self, name):
+        """读取持久化结果, 文件损坏时返回 (False, None)"""
+        path = self._path(name)
+        try:
+            with open(path, 'rb') as f:
+                return True, pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return False, None
+
+    def _store(self, name, result):
+        """写入结果并清理同名阶段的旧指纹文件"""
+        path = self._path(name)
+        self.cache_folder.mkdir(parents=True, exist_ok=True)
+
+        tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except (OSError, pickle.PicklingError) as e:
+            tmp_path.unlink(missing_ok=True)
+            print(f"⚠️  阶段缓存写入失败 {name}: {e}")
+            return
+
+        for stale in self.cache_folder.glob(f"{name}-*.pkl"):
+            if stale != path:
+                stale.unlink(missing_ok=True)
+
+    def get(self, name):
+        """解析阶段结果: 内存 → 磁盘缓存 → 执行 (执行时才解析上游)"""
+        if name in self._results:
+            return self._results[name]
+
+        stage = self.stages[name]
+        if self.enabled and stage.persist and self._path(name).exists():
+            with self._measure(name) as record:
+                hit, result = self._load(name)
+                record['status'] = 'cached' if hit else 'invalid'
+                record['output_rows'] = count_rows(result)
+            if hit:
+                print(f"♻️  复用阶段结果: {name}")
+                self._results[name] = result
+                return result
+
+        upstream = [self.get(dep) for dep in stage.deps]
+        print(f"⚙️  执行阶段: {name}")
+        with self._measure(name, count_rows(upstream)) as record:
+            result = stage.func(*upstream, **stage.params)
+            record['output_rows'] = count_rows(result)
+
+        if self.enabled and stage.persist:
+            self._store(name, result)
+
+        self._results[name] = result
+        return result
+
+    @contextmanager
+    def _measure(self, name, input_rows=None):
+        """有记录器时计量阶段"""
+        if self.recorder is None:
+            yield {}
+        else:
+            with self.recorder.stage(name, input_rows) as record:
+                yield record
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+问题切片TopK选取
+
+最新周立方体一次汇总出 机构 / 机构×业务类型 / 机构×业务类型×险别 三层组合,
+全部组合在一张打分表上整列计算赔付率、占上级保费比例与影响度;
+全局TopK用 argpartition 部分选择 (O(n)), 组内TopK用分组排名, 不再逐层筛选明细。
+"""
+
+import numpy as np
+import pandas as pd
+
+from kpi_cube import rollup
+
+# 下钻路径
+DRILL_DIMENSIONS = ['third_level_organization', 'business_type_category', 'coverage_type']
+
+DEPTH = 'depth'
+
+# 同分处理: first = 按组合首次出现顺序取满K个; all = 第K名的同分组合全部保留
+TIE_MODES = ('first', 'all')
+
+
+def score_slices(cube, dimensions=DRILL_DIMENSIONS, measure='matured_premium_yuan', smoothing=1.0):
+    """三层组合打分表: depth(1..n) + 维度 + 可加指标 + loss_ratio / parent_share / impact_score
+
+    parent_share 为占上一层级合计的比例 (第1层为占全部合计), 上级合计含维度缺失的下级;
+    维度值缺失的组合不参与打分。
+    """
+    dimensions = list(dimensions)
+    finest = rollup(cube, dimensions)
+    total = finest[measure].sum()
+
+    frames = []
+    for depth in range(1, len(dimensions) + 1):
+        level_dims = dimensions[:depth]
+        sums = finest if depth == len(dimensions) else rollup(finest, level_dims)
+        sums = sums.copy()
+
+        if depth == 1:
+            parent = pd.Series(total, index=sums.index)
+        else:
+            parent = sums.groupby(level_dims[:-1], observed=True, dropna=False, sort=False)[measure].transform('sum')
+        sums['parent_share'] = sums[measure] / parent.where(parent > 0)
+
+        sums = sums[sums[level_dims].notna().all(axis=1)]
+        sums.insert(0, DEPTH, depth)
+        frames.append(sums)
+
+    table = pd.concat(frames, ignore_index=True)
+    table['loss_ratio'] = table['reported_claim_payment_yuan'] / (table[measure] + smoothing) * 100
+    table['impact_score'] = table['loss_ratio'] * table['parent_share']
+    return table
+
+
+def top_k_positions(scores, k, largest=True, ties='first'):
+    """全局TopK的位置 (按分数排序, 同分按原顺序); NaN不参与
+
+    argpartition 定位第K名分数后只对入选者排序。
+    ties='all' 时第K名的同分者全部入选, 结果可能多于K个。
+    """
+    if ties not in TIE_MODES:
+        raise ValueError(f"未知同分处理方式: {ties}")
+
+    values = np.asarray(scores, dtype=float)
+    if not largest:
+        values = -values
+    valid = np.flatnonzero(~np.isnan(values))
+    if k <= 0 or len(valid) == 0:
+        return np.array([], dtype=int)
+
+    if k < len(valid):
+        candidates = values[valid]
+        kth = candidates[np.argpartition(candidates, len(candidates) - k)[len(candidates) - k]]
+        better = valid[candidates > kth]
+        tied = valid[candidates == kth]
+        if ties == 'first':
+            tied = tied[:k - len(better)]
+        chosen = np.concatenate([better, tied])
+    else:
+        chosen = valid
+
+    return chosen[np.lexsort((chosen, -values[chosen]))]
+
+
+def top_k_within(frame, group_by, score, k, largest=True, ties='first'):
+    """组内TopK布尔掩码 (分组排名一次完成, 同分按原顺序或全部保留)"""
+    if ties not in TIE_MODES:
+        raise ValueError(f"未知同分处理方式: {ties}")
+
+    ranks = frame.groupby(list(group_by), observed=True, dropna=False, sort=False)[score].rank(
+        method='first' if ties == 'first' else 'min', ascending=not largest
+    )
+    return (ranks <= k).to_numpy()
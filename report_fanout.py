@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分报告扇出
+
+年度数据 ({年度: {'cumulative'/'weekly'/'cube': {周次: DataFrame}}}, 明细仅含最新周)
+按切片维度 (三级机构, 或机构×业务类型) 每张表只分组一次, 拆成各切片各自的年度数据;
+各切片只携带本切片的行分发到进程池, 每个进程独立完成分析与渲染。
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+# 参与拆分的周度表
+SPLIT_TABLES = ('cumulative', 'weekly', 'cube')
+
+# 切片标签中维度取值的连接符 (用于文件名)
+LABEL_SEPARATOR = '_'
+
+
+def split_weekly_data(weekly_data, by):
+    """年度数据 → {切片取值元组: 同结构的年度数据}; 切片维度缺失的行不归入任何切片
+
+    切片按首次出现顺序排列; 某切片在某周无数据时该周不出现在其年度数据中。
+    """
+    by = list(by)
+    slices = {}
+
+    for year, year_data in weekly_data.items():
+        for table in SPLIT_TABLES:
+            for week, frame in year_data.get(table, {}).items():
+                if any(dim not in frame.columns for dim in by):
+                    continue
+                for key, part in frame.groupby(by, observed=True, sort=False):
+                    key = key if isinstance(key, tuple) else (key,)
+                    slice_years = slices.setdefault(key, {})
+                    slice_tables = slice_years.setdefault(year, {name: {} for name in SPLIT_TABLES})
+                    slice_tables[table][week] = part
+
+    return slices
+
+
+def slice_label(key):
+    """切片取值元组 → 标签 (如 '达州' 或 '达州_非营业客车')"""
+    return LABEL_SEPARATOR.join(str(value) for value in key)
+
+
+def fan_out(func, slices, workers=1):
+    """对每个切片执行 func(切片取值, 切片数据) 并返回 {切片取值: 结果}; workers>1 时使用进程池
+
+    func 需为模块级函数(或其functools.partial); 每个任务只序列化本切片的数据。
+    """
+    keys = list(slices)
+    if workers is None or workers <= 1 or len(keys) <= 1:
+        return {key: func(key, slices[key]) for key in keys}
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(keys))) as executor:
+        results = list(executor.map(func, keys, [slices[key] for key in keys]))
+
+    return dict(zip(keys, results))
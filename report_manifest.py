@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+报告章节清单 (内容寻址的增量重写)
+
+每份报告由若干独立章节 (模板名, 数据模型) 组成; 章节指纹 = 模板原文 + 数据模型
+(剔除生成时间等易变字段)。渲染结果按指纹存入章节库, 清单记录每份报告的章节指纹序列:
+重跑时只渲染指纹变化的章节, 只重写含变化章节的报告文件, 并列出变化的章节。
+
+分报告等整份报告还可登记输入摘要 (如机构切片数据的哈希): 输入摘要与清单一致且
+文件完好时, 整个切片的分析与渲染都可跳过。
+
+清单与章节库位于输出目录下的 .sections/ 中, 按报告文件名索引。
+"""
+
+import hashlib
+import json
+import os
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from report_templates import TemplateSet
+
+# 清单格式版本 (调整指纹算法时递增)
+MANIFEST_VERSION = 1
+
+MANIFEST_FOLDER = '.sections'
+MANIFEST_FILE = 'manifest.json'
+
+# 不参与指纹的易变字段: 其余章节未变时沿用上次渲染结果
+VOLATILE_FIELDS = ('generated_at',)
+
+
+def _encode(value):
+    """JSON不支持的值 (numpy标量、时间戳、DataFrame等) 的稳定文本形式"""
+    if isinstance(value, pd.DataFrame):
+        return value.to_dict('split')
+    if isinstance(value, np.generic):
+        return value.item()
+    return repr(value)
+
+
+def section_fingerprint(source, model, volatile=VOLATILE_FIELDS):
+    """章节指纹: 模板原文 + 数据模型 (剔除易变字段)"""
+    payload = {
+        'version': MANIFEST_VERSION,
+        'template': source,
+        'model': {key: value for key, value in model.items() if key not in volatile}
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=_encode)
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+
+def frames_digest(frames):
+    """一组DataFrame的内容摘要 (行哈希, 与内存布局无关)"""
+    sha1 = hashlib.sha1()
+    for frame in frames:
+        sha1.update(repr(list(frame.columns)).encode('utf-8'))
+        sha1.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return sha1.hexdigest()
+
+
+def text_digest(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _section_keys(sections):
+    """章节在报告内的标识: 模板名, 同名章节依次编号 (如 org_detail[2])"""
+    seen = Counter(name for name, _ in sections)
+    occurrence = Counter()
+    keys = []
+    for name, _ in sections:
+        occurrence[name] += 1
+        keys.append(name if seen[name] == 1 else f"{name}[{occurrence[name]}]")
+    return keys
+
+
+class ReportManifest:
+    """输出目录的章节清单: 增量渲染并写出报告"""
+
+    def __init__(self, output_folder, enabled=True):
+        self.output_folder = Path(output_folder)
+        self.enabled = enabled
+        self.folder = self.output_folder / MANIFEST_FOLDER
+        self.store = self.folder / 'store'
+        self.documents = self._read() if enabled else {}
+
+    def _read(self):
+        try:
+            with open(self.folder / MANIFEST_FILE, encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if manifest.get('version') != MANIFEST_VERSION:
+            return {}
+        return manifest.get('documents', {})
+
+    def _load_section(self, fingerprint):
+        try:
+            return (self.store / f"{fingerprint}.md").read_text(encoding='utf-8')
+        except OSError:
+            return None
+
+    def _store_section(self, fingerprint, text):
+        # 含易变字段的章节同一指纹可能重新渲染, 始终以最新结果覆盖
+        self.store.mkdir(parents=True, exist_ok=True)
+        (self.store / f"{fingerprint}.md").write_text(text, encoding='utf-8')
+
+    def _intact(self, filename):
+        """报告文件存在且内容与清单一致 (未被手工改动)"""
+        entry = self.documents.get(filename)
+        path = self.output_folder / filename
+        if entry is None or not path.exists():
+            return False
+        return text_digest(path.read_text(encoding='utf-8')) == entry['digest']
+
+    def is_current(self, group, inputs):
+        """某组报告 (如一个机构切片的各年度报告) 的输入摘要未变且文件完好"""
+        filenames = [name for name, entry in self.documents.items() if entry.get('group') == group]
+        return (self.enabled and bool(filenames)
+                and all(self.documents[name].get('inputs') == inputs and self._intact(name) for name in filenames))
+
+    def write(self, filename, templates, sections, joiner='', group=None, inputs=None):
+        """增量渲染并写出报告 → 变化的章节标识列表 (报告未变时为空列表)
+
+        指纹未变且章节库中有渲染结果的章节直接沿用; 报告有任何章节变化时,
+        含易变字段的章节 (如生成时间) 一并重新渲染。
+        """
+        template_set = TemplateSet(templates)
+        keys = _section_keys(sections)
+        fingerprints = [section_fingerprint(templates[name], model) for name, model in sections]
+
+        previous = dict(self.documents.get(filename, {}).get('sections', [])) if self.enabled else {}
+        texts = [self._load_section(fp) if previous.get(key) == fp else None
+                 for key, fp in zip(keys, fingerprints)]
+        changed = [key for key, text in zip(keys, texts) if text is None]
+        if previous.keys() - set(keys):
+            changed.extend(sorted(previous.keys() - set(keys)))
+
+        if not changed and self._intact(filename):
+            self.documents[filename].update(group=group, inputs=inputs)
+            return []
+
+        for index, (name, model) in enumerate(sections):
+            if texts[index] is None or (changed and any(field in model for field in VOLATILE_FIELDS)):
+                texts[index] = template_set.render(name, model)
+                self._store_section(fingerprints[index], texts[index])
+
+        content = joiner.join(texts)
+        path = self.output_folder / filename
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+        self.documents[filename] = {
+            'sections': [[key, fp] for key, fp in zip(keys, fingerprints)],
+            'digest': text_digest(content),
+            'group': group,
+            'inputs': inputs
+        }
+        if not previous:
+            return ['(新报告)'] if self.enabled else ['(全部重写)']
+        # 仅文件缺失或被改动时重写, 章节本身未变
+        return changed or ['(文件重写)']
+
+    def save(self):
+        """写出清单并清理不再被引用的章节"""
+        if not self.enabled:
+            return
+
+        self.folder.mkdir(parents=True, exist_ok=True)
+        path = self.folder / MANIFEST_FILE
+        tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'documents': self.documents}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, path)
+
+        referenced = {fp for entry in self.documents.values() for _, fp in entry['sections']}
+        if self.store.exists():
+            for stale in self.store.glob('*.md'):
+                if stale.stem not in referenced:
+                    stale.unlink(missing_ok=True)
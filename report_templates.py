@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+报告模板
+
+各报告生成器的Markdown统一由模板渲染: 模板文本首次使用时编译一次并缓存,
+之后每次渲染只做字段取值与格式化, 不再逐行拼接f-string。
+
+模板语法 (仅标准库):
+- 字段: 与 str.format 相同, 如 {org}、{kpis[loss_ratio]:.1f}、{item.name}
+- 循环: {% for item in items %} … {% endfor %}, 块内可用 {loop.index} (从1开始)
+- 条件: {% if name %} … {% else %} … {% endif %}, 支持 {% if not name %}
+- 独占一行的块标签连同换行一起去除, 不产生空行
+
+模板只负责排版, 数值计算与文案判断在各生成器的数据模型(普通dict)中完成;
+各章节相互独立, 可单独渲染、缓存或分发到进程池。
+"""
+
+import re
+import string
+from collections import ChainMap
+from functools import lru_cache
+from types import SimpleNamespace
+
+# 块标签: 独占一行时吞掉该行 (含行首缩进与换行)
+_TAG_PATTERN = re.compile(
+    r'^[ \t]*\{%\s*(?P<line>.+?)\s*%\}[ \t]*(?:\n|\Z)|\{%\s*(?P<inline>.+?)\s*%\}',
+    re.MULTILINE
+)
+_FOR_PATTERN = re.compile(r'^for\s+(?P<var>\w+)\s+in\s+(?P<field>\S+)$')
+_IF_PATTERN = re.compile(r'^if\s+(?P<negate>not\s+)?(?P<field>\S+)$')
+
+_FORMATTER = string.Formatter()
+
+
+class TemplateError(ValueError):
+    """模板语法错误"""
+
+
+class Template:
+    """已编译模板: 文本段预解析为 (字面量, 字段, 转换, 格式) 序列"""
+
+    def __init__(self, source, name='<template>'):
+        self.name = name
+        self.nodes = self._compile(source)
+
+    def _compile(self, source):
+        root = []
+        stack = [('root', root)]
+        position = 0
+
+        for match in _TAG_PATTERN.finditer(source):
+            self._append_text(stack[-1][1], source[position:match.start()])
+            position = match.end()
+            tag = match.group('line') or match.group('inline')
+
+            if tag == 'endfor':
+                if stack[-1][0] != 'for':
+                    raise TemplateError(f"{self.name}: 多余的 endfor")
+                stack.pop()
+                continue
+
+            if tag == 'endif':
+                if stack[-1][0] not in ('if', 'else'):
+                    raise TemplateError(f"{self.name}: 多余的 endif")
+                stack.pop()
+                continue
+
+            if tag == 'else':
+                if stack[-1][0] != 'if':
+                    raise TemplateError(f"{self.name}: else 不在 if 块内")
+                stack.pop()
+                if_node = stack[-1][1][-1]
+                stack.append(('else', if_node[4]))
+                continue
+
+            for_match = _FOR_PATTERN.match(tag)
+            if for_match:
+                node = ('for', for_match['var'], for_match['field'], [])
+                stack[-1][1].append(node)
+                stack.append(('for', node[3]))
+                continue
+
+            if_match = _IF_PATTERN.match(tag)
+            if if_match:
+                node = ('if', if_match['field'], bool(if_match['negate']), [], [])
+                stack[-1][1].append(node)
+                stack.append(('if', node[3]))
+                continue
+
+            raise TemplateError(f"{self.name}: 无法识别的标签 {{% {tag} %}}")
+
+        self._append_text(stack[-1][1], source[position:])
+        if len(stack) != 1:
+            raise TemplateError(f"{self.name}: 未闭合的 {stack[-1][0]} 块")
+        return root
+
+    @staticmethod
+    def _append_text(nodes, text):
+        if text:
+            nodes.append(('text', [
+                (literal, field, conversion, spec or '')
+                for literal, field, spec, conversion in _FORMATTER.parse(text)
+            ]))
+
+    def render(self, context=None, **values):
+        """按数据模型渲染"""
+        scope = ChainMap(values, context or {})
+        out = []
+        _render_nodes(self.nodes, scope, out)
+        return ''.join(out)
+
+
+def _lookup(field, scope):
+    return _FORMATTER.get_field(field, (), scope)[0]
+
+
+def _render_nodes(nodes, scope, out):
+    for node in nodes:
+        kind = node[0]
+        if kind == 'text':
+            for literal, field, conversion, spec in node[1]:
+                out.append(literal)
+                if field is not None:
+                    value = _lookup(field, scope)
+                    if conversion:
+                        value = _FORMATTER.convert_field(value, conversion)
+                    out.append(format(value, spec))
+        elif kind == 'for':
+            _, var, field, body = node
+            for index, item in enumerate(_lookup(field, scope), 1):
+                _render_nodes(body, scope.new_child({var: item, 'loop': SimpleNamespace(index=index)}), out)
+        else:
+            _, field, negate, body, else_body = node
+            if bool(_lookup(field, scope)) != negate:
+                _render_nodes(body, scope, out)
+            else:
+                _render_nodes(else_body, scope, out)
+
+
+@lru_cache(maxsize=None)
+def compile_template(source, name='<template>'):
+    """编译模板 (同一文本只编译一次)"""
+    return Template(source, name)
+
+
+class TemplateSet:
+    """一组具名模板 (如某个生成器的全部章节), 按名称惰性编译"""
+
+    def __init__(self, templates):
+        self.templates = templates
+
+    def get(self, name):
+        if name not in self.templates:
+            raise KeyError(f"未定义的模板: {name}")
+        return compile_template(self.templates[name], name)
+
+    def render(self, name, context=None, **values):
+        return self.get(name).render(context, **values)
+
+
+def render_section(templates, name, context):
+    """渲染单个章节 (模块级函数, 可经进程池调用)"""
+    return TemplateSet(templates).render(name, context)
+
+
+def render_sections(templates, sections, executor=None):
+    """渲染多个独立章节 [(模板名, 数据模型), ...], 可传入执行器并行渲染, 结果保持顺序"""
+    if executor is None:
+        return [render_section(templates, name, context) for name, context in sections]
+    return list(executor.map(render_section, [templates] * len(sections),
+                             [name for name, _ in sections], [context for _, context in sections]))
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行指标记录
+
+为每个阶段与每周读取记录: 墙钟耗时、CPU耗时、峰值内存增量、输入/输出行数。
+结果以JSON运行记录写在报告旁, 可选实时控制台表格。
+多进程读取时由 measure_call 在子进程内计量, 指标随结果一并返回。
+"""
+
+import json
+import os
+import sys
+import time
+import unicodedata
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+# 实时表格列: (标题, 宽度)
+TABLE_COLUMNS = [('阶段', 30), ('状态', 8), ('耗时(秒)', 10), ('CPU(秒)', 10),
+                 ('内存增量(MB)', 14), ('输入行', 12), ('输出行', 12)]
+
+RECORD_FIELDS = ['stage', 'status', 'seconds', 'cpu_seconds', 'peak_rss_delta_mb', 'input_rows', 'output_rows']
+
+
+def peak_rss_mb():
+    """进程历史峰值内存(MB)"""
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def current_rss_mb():
+    """当前常驻内存(MB), 无/proc时回退为历史峰值"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError, AttributeError):
+        return peak_rss_mb()
+
+
+def count_rows(obj):
+    """结果中DataFrame/Series的总行数 (字典/列表递归累加, 不含表时返回None)"""
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return len(obj)
+
+    if isinstance(obj, dict):
+        obj = obj.values()
+    elif not isinstance(obj, (list, tuple)):
+        return None
+
+    counts = [count_rows(item) for item in obj]
+    counts = [count for count in counts if count is not None]
+    return sum(counts) if counts else None
+
+
+def _pad(text, width, left=False):
+    """按显示宽度补齐 (中文字符占两列)"""
+    text = str(text)
+    display = sum(2 if unicodedata.east_asian_width(ch) in 'WF' else 1 for ch in text)
+    padding = ' ' * max(width - display, 0)
+    return text + padding if left else padding + text
+
+
+class _Meter:
+    """单次计量: 墙钟、CPU与峰值内存起点"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        self.peak_start = peak_rss_mb()
+
+    def stop(self):
+        return {
+            'seconds': round(time.perf_counter() - self.start, 4),
+            'cpu_seconds': round(time.process_time() - self.cpu_start, 4),
+            'peak_rss_delta_mb': round(max(peak_rss_mb() - self.peak_start, 0.0), 1),
+        }
+
+
+def measure_call(func, *args, **kwargs):
+    """计量一次调用, 返回 (结果, 指标) (模块级函数, 可经进程池传递)"""
+    meter = _Meter()
+    result = func(*args, **kwargs)
+    metrics = meter.stop()
+    metrics['pid'] = os.getpid()
+    return result, metrics
+
+
+class RunRecorder:
+    """单次运行的阶段指标记录器"""
+
+    def __init__(self, name, live=False):
+        self.name = name
+        self.live = live
+        self.started_at = datetime.now()
+        self.records = []
+        self._meter = _Meter()
+        self._header_printed = False
+
+    @contextmanager
+    def stage(self, name, input_rows=None):
+        """计量代码块; 可在块内设置 record['output_rows'] / record['status']"""
+        record = {'stage': name, 'status': 'ok', 'input_rows': input_rows, 'output_rows': None}
+        meter = _Meter()
+        try:
+            yield record
+        except Exception:
+            record['status'] = 'error'
+            raise
+        finally:
+            record.update(meter.stop())
+            self._append(record)
+
+    def add(self, name, metrics, input_rows=None, output_rows=None, status='ok'):
+        """登记在别处(如子进程)计量的指标"""
+        record = {'stage': name, 'status': status, 'input_rows': input_rows, 'output_rows': output_rows}
+        record.update(metrics)
+        self._append(record)
+
+    def _append(self, record):
+        self.records.append(record)
+        if self.live:
+            self._print_row(record)
+
+    def _print_row(self, record):
+        """实时表格行"""
+        if not self._header_printed:
+            print("\n  " + "".join(_pad(title, width, left=i < 2) for i, (title, width) in enumerate(TABLE_COLUMNS)))
+            self._header_printed = True
+
+        def rows(value):
+            return '-' if value is None else f"{value:,}"
+
+        cells = [record['stage'], record['status'], f"{record['seconds']:.2f}", f"{record['cpu_seconds']:.2f}",
+                 f"{record['peak_rss_delta_mb']:.1f}", rows(record['input_rows']), rows(record['output_rows'])]
+        print("  " + "".join(_pad(cell, width, left=i < 2) for i, (cell, (_, width)) in enumerate(zip(cells, TABLE_COLUMNS))))
+
+    def summary(self):
+        """整次运行汇总"""
+        totals = self._meter.stop()
+        return {
+            'seconds': totals['seconds'],
+            'cpu_seconds': totals['cpu_seconds'],
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+            'stages': len(self.records),
+        }
+
+    def to_dict(self):
+        """可序列化的运行记录"""
+        return {
+            'run': self.name,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'summary': self.summary(),
+            'stages': [{field: record.get(field) for field in RECORD_FIELDS + ['pid'] if field in record}
+                       for record in self.records],
+        }
+
+    def write(self, folder, label=""):
+        """写出JSON运行记录, 返回文件路径"""
+        folder = Path(folder)
+        folder.mkdir(parents=True, exist_ok=True)
+        suffix = f"_{label}" if label else ""
+        path = folder / f"运行记录_{self.name}{suffix}.json"
+
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+        return path
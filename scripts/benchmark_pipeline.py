@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+周报流水线规模基准测试
+
+对每个数据规模: 生成合成明细表 (scripts/generate_synthetic_data.py, 已存在且参数一致时复用),
+再以独立子进程冷启动运行各入口, 记录总耗时、峰值内存及各阶段耗时/内存增量。
+子进程失败 (异常、超时、被OOM终止) 记为该规模的失败点, 不影响其余测试。
+
+入口:
+- trend: generate_report_v2.main
+- weekly: generate_report.main
+- truck: analyze_new_energy_trucks.main
+- truck_operating: new_energy_truck_analysis.NewEnergyTruckAnalyzer.run_analysis
+
+用法:
+    python scripts/benchmark_pipeline.py --sizes 100000 1000000 5000000
+    python scripts/benchmark_pipeline.py --sizes 1000000 --targets trend weekly --timeout 1800
+
+注: 阶段内存为本进程RSS采样, workers>1 时子进程读取的内存不计入。
+"""
+
+import argparse
+import importlib
+import json
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from functools import wraps
+from pathlib import Path
+
+SCRIPTS_FOLDER = Path(__file__).resolve().parent
+REPO_ROOT = SCRIPTS_FOLDER.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(SCRIPTS_FOLDER))
+
+from run_metrics import current_rss_mb, peak_rss_mb  # noqa: E402
+
+# =======================================
+# 配置区
+# =======================================
+SIZES = [100_000, 1_000_000, 5_000_000]
+START_WEEK = 38
+END_WEEK = 44
+WORK_FOLDER = "benchmark_runs"
+TIMEOUT_SECONDS = 3600
+SAMPLE_INTERVAL = 0.02          # 内存采样间隔(秒)
+RESULT_FILE = "benchmark_results.json"
+REPORT_FILE = "benchmark_report.md"
+
+# 各入口计时的阶段 (模块, 属性路径)
+TARGET_STAGES = {
+    'trend': ('generate_report_v2', [
+        'InsuranceDataLoaderV2.sync_warehouse',
+        'InsuranceDataLoaderV2.load_data_files',
+        'InsuranceDataLoaderV2.calculate_weekly_values',
+        'InsuranceKpiCalculatorV2.calculate_trend_kpis',
+        'InsuranceLossTrendTrackerV2.analyze_trends',
+        'NewEnergyTruckAnalyzer.analyze_new_energy_trucks',
+        'McKinseyReportGenerator.comprehensive_sections',
+        'ReportManifest.write',
+    ]),
+    'weekly': ('generate_report', [
+        'read_detail_csv',
+        'build_cube',
+        'drilldown_orgs',
+        'weekly_sections',
+        'ReportManifest.write',
+    ]),
+    'truck': ('analyze_new_energy_trucks', [
+        'NewEnergyTruckAnalyzer.load_data',
+        'NewEnergyTruckAnalyzer.calculate_weekly_kpis',
+        'NewEnergyTruckAnalyzer.analyze_regional_performance',
+        'NewEnergyTruckAnalyzer.analyze_business_types',
+        'NewEnergyTruckAnalyzer.analyze_trend',
+        'NewEnergyTruckAnalyzer.generate_report',
+    ]),
+    'truck_operating': ('new_energy_truck_analysis', [
+        'NewEnergyTruckAnalyzer.load_weekly_data',
+        'NewEnergyTruckAnalyzer.calculate_weekly_kpis',
+        'NewEnergyTruckAnalyzer.analyze_by_dimensions',
+        'NewEnergyTruckAnalyzer.create_visualizations',
+        'NewEnergyTruckAnalyzer.generate_markdown_report',
+    ]),
+}
+
+# =======================================
+# 内存采样与阶段计时 (子进程内)
+# =======================================
+
+class MemorySampler(threading.Thread):
+    """后台采样RSS, 为进行中的阶段记录峰值"""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.active = []
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.is_set():
+            rss = current_rss_mb()
+            for mark in list(self.active):
+                mark['peak'] = max(mark['peak'], rss)
+            self._stopped.wait(self.interval)
+
+    def stop(self):
+        self._stopped.set()
+
+
+class StageProfiler:
+    """替换模块属性为计时包装 (同一阶段多次调用时累计耗时, 内存取最大)"""
+
+    def __init__(self, sampler):
+        self.sampler = sampler
+        self.stages = {}
+
+    def instrument(self, module, path):
+        owner = module
+        *parents, attribute = path.split('.')
+        for parent in parents:
+            owner = getattr(owner, parent)
+
+        func = getattr(owner, attribute)
+        if isinstance(owner, type) and isinstance(owner.__dict__.get(attribute), staticmethod):
+            return
+        setattr(owner, attribute, self._wrap(path, func))
+
+    def _wrap(self, name, func):
+        record = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'peak_rss_mb': 0.0, 'rss_delta_mb': 0.0})
+
+        @wraps(func)
+        def timed(*args, **kwargs):
+            start_rss = current_rss_mb()
+            mark = {'peak': start_rss}
+            self.sampler.active.append(mark)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record['seconds'] += time.perf_counter() - start
+                self.sampler.active.remove(mark)
+                mark['peak'] = max(mark['peak'], current_rss_mb())
+                record['calls'] += 1
+                record['peak_rss_mb'] = max(record['peak_rss_mb'], mark['peak'])
+                record['rss_delta_mb'] = max(record['rss_delta_mb'], mark['peak'] - start_rss)
+
+        return timed
+
+# =======================================
+# 子进程: 运行单个入口
+# =======================================
+
+def run_target(target, data_folder, output_folder, start_week, end_week, workers):
+    """运行入口主函数, 返回是否成功"""
+    if target == 'trend':
+        import generate_report_v2
+        return generate_report_v2.main(
+            start_week=start_week, end_week=end_week, lookback_weeks=end_week - start_week + 1,
+            data_folder=data_folder, output_folder=output_folder, workers=workers
+        )
+
+    if target == 'weekly':
+        import generate_report
+        generate_report.main(end_week, data_folder, output_folder)
+        return True
+
+    if target == 'truck':
+        import analyze_new_energy_trucks
+        return analyze_new_energy_trucks.main(start_week, end_week, data_folder, output_folder, workers)
+
+    if target == 'truck_operating':
+        import new_energy_truck_analysis
+        analyzer = new_energy_truck_analysis.NewEnergyTruckAnalyzer(
+            data_folder=data_folder, start_week=start_week, end_week=end_week, output_folder=output_folder
+        )
+        return analyzer.run_analysis() is not False
+
+    raise ValueError(f"未知入口: {target}")
+
+
+def child_main(args):
+    """子进程入口: 运行并写出计时结果"""
+    module_name, stage_paths = TARGET_STAGES[args.target]
+    sampler = MemorySampler()
+    profiler = StageProfiler(sampler)
+    module = importlib.import_module(module_name)
+    for path in stage_paths:
+        profiler.instrument(module, path)
+
+    sampler.start()
+    start = time.perf_counter()
+    try:
+        success = run_target(args.target, args.data_folder, args.output_folder,
+                             args.start_week, args.end_week, args.workers)
+        status = 'ok' if success is not False else 'failed'
+    except Exception as e:
+        status = f"error: {e}"
+    seconds = time.perf_counter() - start
+    sampler.stop()
+
+    result = {
+        'target': args.target,
+        'status': status,
+        'seconds': seconds,
+        'peak_rss_mb': peak_rss_mb(),
+        'stages': profiler.stages
+    }
+    with open(args.result_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    return 0 if status == 'ok' else 1
+
+# =======================================
+# 主进程: 生成数据并逐规模运行
+# =======================================
+
+def ensure_dataset(data_folder, rows, start_week, end_week):
+    """生成合成数据 (清单参数一致时复用)"""
+    import generate_synthetic_data
+
+    manifest_path = data_folder / generate_synthetic_data.MANIFEST_NAME
+    if manifest_path.exists():
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if (manifest['rows'], manifest['start_week'], manifest['end_week']) == (rows, start_week, end_week):
+            print(f"♻️  复用合成数据: {data_folder}")
+            return 0.0
+
+    shutil.rmtree(data_folder, ignore_errors=True)
+    print(f"🧪 生成合成数据: {rows:,}行 → {data_folder}")
+    start = time.perf_counter()
+    generate_synthetic_data.generate_dataset(data_folder, rows, start_week, end_week)
+    return time.perf_counter() - start
+
+
+def run_benchmark_case(target, size_folder, data_folder, start_week, end_week, workers, timeout):
+    """冷启动运行单个入口 (清空缓存与输出), 返回结果字典"""
+    run_folder = size_folder / target
+    shutil.rmtree(run_folder, ignore_errors=True)
+    run_folder.mkdir(parents=True)
+    result_path = run_folder / "result.json"
+
+    command = [
+        sys.executable, str(Path(__file__).resolve()), "--child", target,
+        "--data-folder", str(data_folder.resolve()), "--output-folder", str((run_folder / "output").resolve()),
+        "--start-week", str(start_week), "--end-week", str(end_week),
+        "--workers", str(workers), "--result-path", str(result_path.resolve()),
+    ]
+
+    start = time.perf_counter()
+    with open(run_folder / "run.log", 'w', encoding='utf-8') as log:
+        try:
+            completed = subprocess.run(command, cwd=run_folder, stdout=log, stderr=subprocess.STDOUT, timeout=timeout)
+            returncode = completed.returncode
+        except subprocess.TimeoutExpired:
+            returncode = None
+    seconds = time.perf_counter() - start
+
+    if result_path.exists():
+        with open(result_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    status = f"timeout ({timeout}s)" if returncode is None else f"crashed (exit {returncode})"
+    return {'target': target, 'status': status, 'seconds': seconds, 'peak_rss_mb': None, 'stages': {}}
+
+
+def format_report(results, start_week, end_week):
+    """生成Markdown结果"""
+    md = [
+        "# 周报流水线规模基准",
+        "",
+        f"> 生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        f"> 周次范围: 第{start_week}-{end_week}周, Python {sys.version.split()[0]}",
+        "",
+        "## 总览",
+        "",
+        "| 规模(行) | 入口 | 状态 | 耗时(秒) | 峰值内存(MB) |",
+        "|---|---|---|---|---|",
+    ]
+    for size_result in results:
+        for case in size_result['cases']:
+            peak = '-' if case['peak_rss_mb'] is None else f"{case['peak_rss_mb']:,.0f}"
+            md.append(f"| {size_result['rows']:,} | {case['target']} | {case['status']} | "
+                      f"{case['seconds']:,.1f} | {peak} |")
+
+    md.extend(["", "## 阶段明细", ""])
+    for size_result in results:
+        for case in size_result['cases']:
+            if not case['stages']:
+                continue
+            md.extend([
+                f"### {size_result['rows']:,}行 · {case['target']}",
+                "",
+                "| 阶段 | 调用次数 | 耗时(秒) | 峰值内存(MB) | 内存增量(MB) |",
+                "|---|---|---|---|---|",
+            ])
+            for name, stage in case['stages'].items():
+                md.append(f"| {name} | {stage['calls']} | {stage['seconds']:,.2f} | "
+                          f"{stage['peak_rss_mb']:,.0f} | {stage['rss_delta_mb']:,.0f} |")
+            md.append("")
+
+    return "\n".join(md)
+
+
+def benchmark_main(args):
+    """逐规模运行全部入口"""
+    work_folder = Path(args.work_folder)
+    work_folder.mkdir(parents=True, exist_ok=True)
+    results = []
+
+    for rows in args.sizes:
+        size_folder = work_folder / f"rows_{rows}"
+        data_folder = size_folder / "data"
+        generate_seconds = ensure_dataset(data_folder, rows, args.start_week, args.end_week)
+
+        size_result = {'rows': rows, 'generate_seconds': generate_seconds, 'cases': []}
+        for target in args.targets:
+            print(f"⏱️  {rows:,}行 · {target} ...", flush=True)
+            case = run_benchmark_case(target, size_folder, data_folder, args.start_week, args.end_week,
+                                      args.workers, args.timeout)
+            size_result['cases'].append(case)
+
+            peak = '-' if case['peak_rss_mb'] is None else f"{case['peak_rss_mb']:,.0f}MB"
+            print(f"   {case['status']}: {case['seconds']:,.1f}秒, 峰值内存 {peak}")
+        results.append(size_result)
+
+        # 每个规模完成后即落盘, 大规模中途失败时保留已完成结果
+        with open(work_folder / RESULT_FILE, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        with open(work_folder / REPORT_FILE, 'w', encoding='utf-8') as f:
+            f.write(format_report(results, args.start_week, args.end_week))
+
+    print(f"\n✅ 基准结果: {(work_folder / REPORT_FILE).absolute()}")
+    return 0
+
+
+def build_parser():
+    """构建命令行解析器"""
+    parser = argparse.ArgumentParser(description="周报流水线规模基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="数据规模(结束周合计行数)")
+    parser.add_argument("--targets", nargs="+", choices=list(TARGET_STAGES), default=list(TARGET_STAGES),
+                        help="测试入口")
+    parser.add_argument("--start-week", type=int, default=START_WEEK, help="起始周")
+    parser.add_argument("--end-week", type=int, default=END_WEEK, help="结束周")
+    parser.add_argument("--workers", type=int, default=1, help="入口并行加载进程数")
+    parser.add_argument("--timeout", type=int, default=TIMEOUT_SECONDS, help="单次运行超时(秒)")
+    parser.add_argument("--work-folder", default=WORK_FOLDER, help="数据与结果目录")
+
+    # 子进程参数
+    parser.add_argument("--child", choices=list(TARGET_STAGES), dest="target", help=argparse.SUPPRESS)
+    parser.add_argument("--data-folder", help=argparse.SUPPRESS)
+    parser.add_argument("--output-folder", help=argparse.SUPPRESS)
+    parser.add_argument("--result-path", help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv=None):
+    """命令行入口"""
+    args = build_parser().parse_args(argv)
+    if args.target:
+        return child_main(args)
+    return benchmark_main(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合成变动成本明细表生成器
+
+按真实字段规范(26列)生成 {year}保单第{week}周变动成本明细表.csv:
+- 周累计口径: 每周文件为截至快照日的累计值, 满期保费/赔案随周次单调增长
+- 2025保单随周次陆续起保, 2024保单全部在上一年度起保
+- 枚举值取自维度字典, 机构保费与赔付结构参照 week_44_skill_input.json
+- 行数可调 (10万 ~ 5000万), 按块生成并追加写入, 内存占用与总行数无关
+
+用法:
+    python scripts/generate_synthetic_data.py --rows 1000000 --output-folder bench_data
+    python scripts/generate_synthetic_data.py --rows 50000000 --start-week 28 --end-week 44
+"""
+
+import argparse
+import json
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# =======================================
+# 配置区
+# =======================================
+ROWS = 1_000_000            # 结束周两个保单年度合计行数
+START_WEEK = 38
+END_WEEK = 44
+OUTPUT_FOLDER = "synthetic_data"
+CHUNK_ROWS = 500_000        # 每块生成的保单数
+SEED = 20251018
+YEAR_SHARE = {2024: 0.45, 2025: 0.55}   # 结束周各保单年度行数占比
+SIZING_REFERENCE = REPO_ROOT / "week_44_skill_input.json"
+MANIFEST_NAME = "synthetic_manifest.json"
+
+# 字段顺序 (与明细表规范一致)
+COLUMNS = [
+    'snapshot_date', 'policy_start_year', 'business_type_category', 'chengdu_branch',
+    'third_level_organization', 'customer_category_3', 'insurance_type', 'is_new_energy_vehicle',
+    'coverage_type', 'is_transferred_vehicle', 'renewal_status', 'vehicle_insurance_grade',
+    'highway_risk_grade', 'large_truck_score', 'small_truck_score', 'terminal_source',
+    'signed_premium_yuan', 'policy_count', 'matured_premium_yuan', 'claim_case_count',
+    'reported_claim_payment_yuan', 'expense_amount_yuan', 'commercial_premium_before_discount_yuan',
+    'premium_plan_yuan', 'marginal_contribution_amount_yuan', 'week_number',
+]
+
+# 机构 (参照文件缺失时均匀分布; 本部保留少量业务以覆盖剔除逻辑)
+DEFAULT_ORGS = ['本部', '达州', '德阳', '高新', '乐山', '泸州', '绵阳', '南充', '青羊', '天府', '武侯', '新都', '宜宾']
+CHENGDU_ORGS = {'本部', '高新', '青羊', '天府', '武侯', '新都'}
+
+# 业务类型: (占比, 客户类型候选, 件均保费, 年出险频率, 案均赔款, 新能源占比)
+BUSINESS_PROFILES = {
+    '非营业客车新车':       (0.16, ('非营业个人客车', '非营业企业客车'), 4200, 0.18, 5200, 0.45),
+    '非营业客车旧车非过户': (0.30, ('非营业个人客车', '非营业企业客车', '非营业机关客车'), 3300, 0.20, 4800, 0.25),
+    '非营业客车旧车过户车': (0.06, ('非营业个人客车',), 3000, 0.24, 5000, 0.15),
+    '非营业货车新车':       (0.02, ('非营业货车',), 3800, 0.16, 6000, 0.20),
+    '非营业货车旧车':       (0.04, ('非营业货车',), 3200, 0.18, 5800, 0.08),
+    '2吨以下营业货车':      (0.05, ('营业货车',), 4500, 0.30, 6500, 0.30),
+    '2-9吨营业货车':        (0.03, ('营业货车',), 8000, 0.35, 9000, 0.10),
+    '9-10吨营业货车':       (0.01, ('营业货车',), 11000, 0.38, 12000, 0.05),
+    '10吨以上-普货':        (0.02, ('营业货车',), 16000, 0.42, 18000, 0.03),
+    '10吨以上-牵引':        (0.02, ('营业货车', '挂车'), 18000, 0.45, 20000, 0.03),
+    '自卸':                 (0.01, ('营业货车',), 15000, 0.40, 16000, 0.05),
+    '出租车':               (0.02, ('营业出租租赁',), 6500, 0.55, 4200, 0.60),
+    '网约车':               (0.03, ('营业出租租赁',), 5200, 0.50, 4500, 0.70),
+    '特种车':               (0.01, ('特种车',), 6000, 0.15, 9000, 0.02),
+    '摩托车':               (0.18, ('摩托车',), 300, 0.03, 3500, 0.00),
+    '其他':                 (0.04, ('营业公路客运', '营业城市公交', '非营业企业客车'), 7000, 0.30, 8000, 0.20),
+}
+
+COVERAGE_SHARE = {'主全': 0.55, '交三': 0.25, '单交': 0.20}
+RENEWAL_SHARE = {'新保': 0.30, '续保': 0.50, '转保': 0.20}
+GRADES = {
+    'vehicle_insurance_grade': ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'X'],
+    'highway_risk_grade': ['A', 'B', 'C', 'D', 'E', 'F', 'X'],
+    'large_truck_score': ['A', 'B', 'C', 'D', 'E', 'X'],
+    'small_truck_score': ['A', 'B', 'C', 'D', 'E', 'X'],
+}
+TERMINAL_SOURCES = ['0101柜面', '0106移动展业(App)', '0107B2B', '0110融合销售',
+                    '0112AI出单', '0201PC', '0202APP', '0301电销']
+NEW_ENERGY_CLAIM_FACTOR = 1.3   # 新能源案均赔款系数
+BOOLEAN_COLUMNS = ['is_new_energy_vehicle', 'is_transferred_vehicle']
+UTF8_BOM = b'\xef\xbb\xbf'
+
+
+def load_org_profile(reference_path=SIZING_REFERENCE):
+    """机构保费占比与赔付系数 (参照第44周汇总, 缺失时均匀分布)"""
+    try:
+        with open(reference_path, 'r', encoding='utf-8') as f:
+            org_metrics = json.load(f)['org_metrics']
+    except (OSError, KeyError, ValueError):
+        return {org: (1 / len(DEFAULT_ORGS), 1.0) for org in DEFAULT_ORGS}
+
+    premium = {m['third_level_organization']: m['signed_premium_sum'] for m in org_metrics}
+    claims = {m['third_level_organization']: m['reported_claim_sum'] for m in org_metrics}
+    total_premium = sum(premium.values())
+    overall_ratio = sum(claims.values()) / total_premium
+
+    return {
+        org: (premium[org] / total_premium, (claims[org] / premium[org]) / overall_ratio)
+        for org in premium
+    }
+
+
+def week_snapshot(week, year=2025):
+    """周次快照日 (当年第week周的最后一天)"""
+    return date(year, 1, 1) + timedelta(days=7 * week - 1)
+
+
+def _choice(rng, options, size, weights=None):
+    """按权重抽取枚举值"""
+    options = list(options)
+    p = None if weights is None else np.asarray(weights, dtype=float) / np.sum(weights)
+    return np.asarray(options, dtype=object)[rng.choice(len(options), size=size, p=p)]
+
+
+def generate_policies(rng, n, policy_year, end_day, org_profile):
+    """生成一块保单的静态属性与出险事件 (起保日为相对2025-01-01的天数)"""
+    orgs = list(org_profile)
+    org = _choice(rng, orgs, n, [org_profile[o][0] for o in orgs])
+    org_factor = pd.Series({o: org_profile[o][1] for o in orgs}).reindex(org).to_numpy()
+
+    business_types = list(BUSINESS_PROFILES)
+    business = _choice(rng, business_types, n, [BUSINESS_PROFILES[b][0] for b in business_types])
+    profile = pd.DataFrame(BUSINESS_PROFILES, index=['share', 'customers', 'premium', 'frequency',
+                                                     'severity', 'nev_share']).T.reindex(business)
+
+    customer = np.empty(n, dtype=object)
+    for business_type, (_, customers, *_rest) in BUSINESS_PROFILES.items():
+        mask = business == business_type
+        # 首个候选为主要客户类型
+        weights = [len(customers) * 3] + [1] * (len(customers) - 1)
+        customer[mask] = _choice(rng, customers, int(mask.sum()), weights)
+
+    coverage = _choice(rng, COVERAGE_SHARE, n, list(COVERAGE_SHARE.values()))
+    insurance_type = np.where(
+        coverage == '单交', '交强险', _choice(rng, ['商业险', '交强险'], n, [0.7, 0.3])
+    )
+    is_new_energy = rng.random(n) < profile['nev_share'].to_numpy(dtype=float)
+
+    renewal = _choice(rng, RENEWAL_SHARE, n, list(RENEWAL_SHARE.values()))
+    new_car = np.char.find(business.astype(str), '新车') >= 0
+    renewal[new_car & (rng.random(n) < 0.8)] = '新保'
+
+    # 起保日: 2025保单在快照期内陆续起保, 2024保单分布在上一年度
+    if policy_year == 2025:
+        start_day = rng.integers(0, end_day + 1, n)
+    else:
+        start_day = rng.integers(-365, 0, n)
+
+    signed = rng.gamma(2.0, profile['premium'].to_numpy(dtype=float) / 2.0).round(2)
+    frequency = profile['frequency'].to_numpy(dtype=float)
+    severity = profile['severity'].to_numpy(dtype=float) * org_factor
+    severity = np.where(is_new_energy, severity * NEW_ENERGY_CLAIM_FACTOR, severity)
+
+    policies = pd.DataFrame({
+        'policy_start_year': policy_year,
+        'business_type_category': business,
+        'chengdu_branch': np.where(np.isin(org, list(CHENGDU_ORGS)), '成都', '中支'),
+        'third_level_organization': org,
+        'customer_category_3': customer,
+        'insurance_type': insurance_type,
+        'is_new_energy_vehicle': is_new_energy,
+        'coverage_type': coverage,
+        'is_transferred_vehicle': (business == '非营业客车旧车过户车') | (rng.random(n) < 0.02),
+        'renewal_status': renewal,
+        'terminal_source': _choice(rng, TERMINAL_SOURCES, n, [30, 25, 5, 10, 5, 10, 10, 5]),
+        'signed_premium_yuan': signed,
+        'policy_count': 1,
+        'expense_amount_yuan': (signed * rng.uniform(0.08, 0.24, n)).round(2),
+        'commercial_premium_before_discount_yuan': np.where(
+            insurance_type == '商业险', (signed * rng.uniform(1.0, 1.3, n)).round(2), 0.0
+        ),
+        'premium_plan_yuan': 0.0,
+    })
+    for column, values in GRADES.items():
+        weights = [1] * (len(values) - 1) + [len(values)]   # X(无评级)占比最高
+        policies[column] = _choice(rng, values, n, weights)
+
+    # 出险事件: 保险期间内至多一次, 发生在起保后第claim_day天
+    has_claim = rng.random(n) < frequency
+    claim_day = rng.integers(0, 365, n)
+    claim_amount = rng.gamma(1.5, severity / 1.5).round(2)
+
+    return policies, start_day, has_claim, claim_day, claim_amount
+
+
+def cumulative_snapshot(policies, start_day, has_claim, claim_day, claim_amount, week):
+    """单周累计快照: 已起保保单的满期保费、已报告赔案与边际贡献"""
+    snapshot = week_snapshot(week)
+    elapsed = (snapshot - date(2025, 1, 1)).days - start_day
+    present = elapsed >= 0
+
+    frame = policies[present].copy()
+    elapsed = elapsed[present]
+    matured_ratio = np.clip((elapsed + 1) / 365, 0, 1)
+    reported = has_claim[present] & (claim_day[present] <= elapsed)
+
+    frame['snapshot_date'] = snapshot.isoformat()
+    frame['matured_premium_yuan'] = (frame['signed_premium_yuan'] * matured_ratio).round(2)
+    frame['claim_case_count'] = reported.astype(int)
+    frame['reported_claim_payment_yuan'] = np.where(reported, claim_amount[present], 0.0)
+    frame['marginal_contribution_amount_yuan'] = (
+        frame['matured_premium_yuan'] - frame['reported_claim_payment_yuan'] - frame['expense_amount_yuan']
+    ).round(2)
+    frame['week_number'] = week
+
+    return frame[COLUMNS]
+
+
+def write_csv_chunk(frame, handle, header):
+    """追加写入一块明细 (有pyarrow时用其CSV写出器, 否则回退pandas; 枚举值不含逗号与引号, 无需加引号)"""
+    frame = frame.copy()
+    for column in BOOLEAN_COLUMNS:
+        frame[column] = np.where(frame[column], 'True', 'False')
+
+    if header:
+        handle.write(UTF8_BOM + (','.join(frame.columns) + '\n').encode('utf-8'))
+
+    if PYARROW_AVAILABLE:
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        pa_csv.write_csv(table, handle, pa_csv.WriteOptions(include_header=False, quoting_style='none'))
+    else:
+        handle.write(frame.to_csv(index=False, header=False).encode('utf-8'))
+
+
+def generate_dataset(output_folder=OUTPUT_FOLDER, rows=ROWS, start_week=START_WEEK, end_week=END_WEEK,
+                     chunk_rows=CHUNK_ROWS, seed=SEED):
+    """生成全部周度明细表, 返回各文件行数"""
+    output_folder = Path(output_folder)
+    output_folder.mkdir(parents=True, exist_ok=True)
+    org_profile = load_org_profile()
+    end_day = (week_snapshot(end_week) - date(2025, 1, 1)).days
+
+    handles = {}
+    row_counts = {}
+    try:
+        for year, share in YEAR_SHARE.items():
+            year_rows = int(rows * share)
+            for chunk_index, chunk_start in enumerate(range(0, year_rows, chunk_rows)):
+                n = min(chunk_rows, year_rows - chunk_start)
+                rng = np.random.default_rng([seed, year, chunk_index])
+                policies, *events = generate_policies(rng, n, year, end_day, org_profile)
+
+                for week in range(start_week, end_week + 1):
+                    frame = cumulative_snapshot(policies, *events, week)
+                    file_name = f"{year}保单第{week}周变动成本明细表.csv"
+                    if file_name not in handles:
+                        handles[file_name] = open(output_folder / file_name, 'wb')
+                        row_counts[file_name] = 0
+                        header = True
+                    else:
+                        header = False
+
+                    write_csv_chunk(frame, handles[file_name], header)
+                    row_counts[file_name] += len(frame)
+
+                print(f"  {year}保单: {chunk_start + n:,}/{year_rows:,} 行")
+    finally:
+        for handle in handles.values():
+            handle.close()
+
+    manifest = {
+        'rows': rows, 'start_week': start_week, 'end_week': end_week,
+        'chunk_rows': chunk_rows, 'seed': seed, 'files': row_counts
+    }
+    with open(output_folder / MANIFEST_NAME, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    return row_counts
+
+
+def main(argv=None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="生成合成变动成本明细表")
+    parser.add_argument("--rows", type=int, default=ROWS, help="结束周两个保单年度合计行数")
+    parser.add_argument("--start-week", type=int, default=START_WEEK, help="起始周")
+    parser.add_argument("--end-week", type=int, default=END_WEEK, help="结束周")
+    parser.add_argument("--output-folder", type=Path, default=Path(OUTPUT_FOLDER), help="输出目录")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="每块生成的保单数")
+    parser.add_argument("--seed", type=int, default=SEED, help="随机种子")
+    args = parser.parse_args(argv)
+
+    if args.rows < 1 or args.chunk_rows < 1:
+        parser.error("行数须为正整数")
+    if args.start_week > args.end_week:
+        parser.error(f"起始周({args.start_week})晚于结束周({args.end_week})")
+
+    print(f"🧪 生成合成数据: {args.rows:,}行, 第{args.start_week}-{args.end_week}周 → {args.output_folder}")
+    row_counts = generate_dataset(args.output_folder, args.rows, args.start_week, args.end_week,
+                                  args.chunk_rows, args.seed)
+    print(f"✅ 已生成 {len(row_counts)} 个文件, 合计 {sum(row_counts.values()):,} 行")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
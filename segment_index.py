@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+明细行分段位图索引
+
+每个 (列, 取值) 对应一个按行压缩的位图 (np.packbits), 任意分段交集
+(如 新能源 ∩ 货车 ∩ 机构X ∩ 主全) 只需位图按位与, 不再对明细逐行比较字符串。
+索引以CSV内容哈希为键持久化到 {cache_folder}/segments, 供各分析器共用; 按索引取分段时
+分块读取明细、逐块只保留命中行, 整表不会作为DataFrame出现。
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_io import CHUNK_ROWS, ColumnarCache, concat_frames, iter_detail_chunks
+from data_schema import SCHEMA_VERSION
+
+# 索引格式版本 (调整索引列或派生标记时递增)
+SEGMENT_INDEX_VERSION = 1
+
+# 建立位图的列
+SEGMENT_COLUMNS = [
+    'is_new_energy_vehicle',
+    'is_transferred_vehicle',
+    'customer_category_3',
+    'business_type_category',
+    'third_level_organization',
+    'coverage_type',
+]
+
+# 派生标记: 业务类型包含"货车"
+TRUCK_FLAG = 'is_truck'
+TRUCK_KEYWORD = '货车'
+
+# 持久化时列与取值的分隔符
+KEY_SEPARATOR = '\x1f'
+
+
+class SegmentIndex:
+    """分段位图索引 - 单个明细表 (行顺序与建索引时的DataFrame一致)"""
+
+    def __init__(self, n_rows, bitmaps):
+        self.n_rows = n_rows
+        self.bitmaps = bitmaps  # {(列, str(取值)): packed uint8}
+
+    @classmethod
+    def build(cls, df, columns=SEGMENT_COLUMNS):
+        """由明细表构建索引 (缺失值不建位图)"""
+        bitmaps = {}
+        for column in columns:
+            if column not in df.columns:
+                continue
+
+            codes, uniques = pd.factorize(df[column])
+            for code, value in enumerate(uniques):
+                bitmaps[(column, str(value))] = np.packbits(codes == code)
+
+        if 'business_type_category' in df.columns:
+            is_truck = df['business_type_category'].astype(str).str.contains(TRUCK_KEYWORD, na=False).to_numpy()
+            bitmaps[(TRUCK_FLAG, 'True')] = np.packbits(is_truck)
+            bitmaps[(TRUCK_FLAG, 'False')] = np.packbits(~is_truck)
+
+        return cls(len(df), bitmaps)
+
+    def values(self, column):
+        """某列已建索引的取值"""
+        return sorted(value for col, value in self.bitmaps if col == column)
+
+    def _packed(self, **criteria):
+        """条件位图: 同列多个取值取并集, 不同列取交集"""
+        result = None
+        for column, wanted in criteria.items():
+            if not isinstance(wanted, (list, tuple, set, frozenset)):
+                wanted = [wanted]
+
+            column_bits = None
+            for value in wanted:
+                bits = self.bitmaps.get((column, str(value)))
+                if bits is None:
+                    continue
+                column_bits = bits.copy() if column_bits is None else np.bitwise_or(column_bits, bits)
+
+            if column_bits is None:
+                return np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+            result = column_bits if result is None else np.bitwise_and(result, column_bits)
+
+        if result is None:
+            return np.packbits(np.ones(self.n_rows, dtype=bool))
+        return result
+
+    def mask(self, **criteria):
+        """命中行的布尔掩码"""
+        return np.unpackbits(self._packed(**criteria), count=self.n_rows).astype(bool)
+
+    def select(self, **criteria):
+        """命中行的行号"""
+        return np.flatnonzero(self.mask(**criteria))
+
+    def count(self, **criteria):
+        """命中行数"""
+        return int(np.unpackbits(self._packed(**criteria), count=self.n_rows).sum())
+
+    def take(self, df, **criteria):
+        """从建索引的明细表中取出命中行"""
+        if len(df) != self.n_rows:
+            raise ValueError(f"索引行数({self.n_rows})与明细行数({len(df)})不一致")
+        return df.iloc[self.select(**criteria)].reset_index(drop=True)
+
+    def save(self, path):
+        """保存为npz"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        keys = [f"{column}{KEY_SEPARATOR}{value}" for column, value in self.bitmaps]
+        np.savez_compressed(
+            path,
+            n_rows=np.int64(self.n_rows),
+            keys=np.array(keys, dtype=str),
+            bitmaps=np.stack(list(self.bitmaps.values())) if self.bitmaps else np.zeros((0, 0), np.uint8)
+        )
+        return path
+
+    @classmethod
+    def concat(cls, parts):
+        """按行顺序拼接各数据块的索引 (某块缺少的取值记为全0)"""
+        n_rows = sum(part.n_rows for part in parts)
+        keys = list(dict.fromkeys(key for part in parts for key in part.bitmaps))
+        bitmaps = {}
+        for key in keys:
+            bits = [
+                np.unpackbits(part.bitmaps[key], count=part.n_rows) if key in part.bitmaps
+                else np.zeros(part.n_rows, dtype=np.uint8)
+                for part in parts
+            ]
+            bitmaps[key] = np.packbits(np.concatenate(bits))
+        return cls(n_rows, bitmaps)
+
+    @classmethod
+    def load(cls, path):
+        """读取npz索引"""
+        with np.load(path) as data:
+            keys = [tuple(key.split(KEY_SEPARATOR, 1)) for key in data['keys']]
+            return cls(int(data['n_rows']), dict(zip(keys, data['bitmaps'])))
+
+
+# =======================================
+# 按明细文件持久化
+# =======================================
+
+def _index_path(csv_path, cache_folder):
+    """明细文件的索引路径 (以CSV内容哈希为键)"""
+    cache = ColumnarCache(cache_folder, namespace="segments")
+    variant = f"segments-v{SEGMENT_INDEX_VERSION}|schema-v{SCHEMA_VERSION}"
+    return cache.cache_folder / f"{cache.key(csv_path, variant)}.npz"
+
+
+def read_segment(csv_path, cache_folder=".cache", chunksize=CHUNK_ROWS, **criteria):
+    """读取明细文件中的指定分段: 分块读取, 每块只保留命中行, 不物化整表
+
+    已持久化的索引直接给出命中行; 尚无索引时在同一遍读取中逐块建立位图并持久化,
+    供后续运行与其他分段共用。
+    """
+    index_path = _index_path(csv_path, cache_folder)
+    index = SegmentIndex.load(index_path) if index_path.exists() else None
+    selected = index.mask(**criteria) if index is not None else None
+
+    kept, parts, offset = [], [], 0
+    for chunk in iter_detail_chunks(csv_path, chunksize=chunksize):
+        if selected is None:
+            part = SegmentIndex.build(chunk)
+            parts.append(part)
+            mask = part.mask(**criteria)
+        else:
+            mask = selected[offset:offset + len(chunk)]
+        offset += len(chunk)
+        kept.append(chunk[mask])
+
+    if index is None:
+        try:
+            SegmentIndex.concat(parts).save(index_path)
+        except OSError as e:
+            print(f"⚠️  索引写入失败 {Path(csv_path).name}: {e}")
+    elif index.n_rows != offset:
+        raise ValueError(f"索引行数({index.n_rows})与明细行数({offset})不一致: {Path(csv_path).name}")
+
+    rows = [chunk for chunk in kept if len(chunk) > 0] or kept[:1]
+    if not rows:
+        return pd.DataFrame()
+    return concat_frames(rows) if len(rows) > 1 else rows[0].reset_index(drop=True)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+切片级趋势分析
+
+输入为 (切片 × 周次) 的KPI矩阵 (见 kpi_cube.weekly_kpi_matrix), 对全部切片
+一次性向量化计算, 替代逐切片调用 np.polyfit。
+"""
+
+import numpy as np
+import pandas as pd
+
+# 趋势结果列
+TREND_COLUMNS = ['slope', 'intercept', 'r_squared', 'avg_weekly_change', 'n_weeks']
+
+
+def batch_trend(matrix, weeks=None, missing_weeks=()):
+    """批量线性趋势 (闭式最小二乘), 返回每个切片的斜率/截距/R²/周均变化
+
+    matrix 为 DataFrame(列为周次) 或二维数组; NaN 与 missing_weeks 中的周次不参与拟合。
+    有效周数少于2的切片结果为NaN。
+    """
+    if isinstance(matrix, pd.DataFrame):
+        index = matrix.index
+        weeks = list(matrix.columns) if weeks is None else list(weeks)
+        values = matrix.to_numpy(dtype=float)
+    else:
+        values = np.atleast_2d(np.asarray(matrix, dtype=float))
+        index = pd.RangeIndex(len(values))
+        weeks = list(range(values.shape[1])) if weeks is None else list(weeks)
+
+    x = np.asarray(weeks, dtype=float)
+    valid = ~np.isnan(values) & ~np.isin(weeks, list(missing_weeks))[np.newaxis, :]
+    w = valid.astype(float)
+    y = np.where(valid, values, 0.0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        n = w.sum(axis=1)
+        x_mean = (w * x).sum(axis=1) / n
+        y_mean = (w * y).sum(axis=1) / n
+
+        dx = np.where(valid, x - x_mean[:, np.newaxis], 0.0)
+        dy = np.where(valid, y - y_mean[:, np.newaxis], 0.0)
+        sxx = (dx * dx).sum(axis=1)
+        sxy = (dx * dy).sum(axis=1)
+        syy = (dy * dy).sum(axis=1)
+
+        slope = np.where(sxx > 0, sxy / sxx, np.nan)
+        intercept = y_mean - slope * x_mean
+
+        residual = np.where(valid, y - (intercept[:, np.newaxis] + slope[:, np.newaxis] * x), 0.0)
+        ss_res = (residual * residual).sum(axis=1)
+        r_squared = np.where(syy > 0, 1 - ss_res / syy, np.where(sxx > 0, 1.0, np.nan))
+
+        # 周均变化 = (末个有效值 - 首个有效值) / 有效周数
+        first_idx = valid.argmax(axis=1)
+        last_idx = valid.shape[1] - 1 - valid[:, ::-1].argmax(axis=1)
+        rows = np.arange(len(values))
+        avg_change = (values[rows, last_idx] - values[rows, first_idx]) / n
+
+    enough = n >= 2
+    result = pd.DataFrame({
+        'slope': np.where(enough, slope, np.nan),
+        'intercept': np.where(enough, intercept, np.nan),
+        'r_squared': np.where(enough, r_squared, np.nan),
+        'avg_weekly_change': np.where(enough, avg_change, np.nan),
+        'n_weeks': n.astype(int)
+    }, index=index)
+
+    return result
+
+
+# =======================================
+# 多规则异常扫描
+# =======================================
+
+# 规则名 → 报告用中文名
+ANOMALY_RULES = {
+    'jump': '单周突增',
+    'zscore': '离群值',
+    'run': '连续恶化',
+    'reversal': '趋势反转',
+}
+
+
+def _run_lengths(flags):
+    """逐行统计截至每个位置的连续True个数"""
+    positions = np.arange(flags.shape[1])
+    last_break = np.where(flags, -1, positions[np.newaxis, :])
+    last_break = np.maximum.accumulate(last_break, axis=1)
+    return np.where(flags, positions[np.newaxis, :] - last_break, 0)
+
+
+def scan_anomalies(matrix, jump_ratio=1.5, z_threshold=3.0, run_weeks=3,
+                   reversal_weeks=2, reversal_ratio=1.1, higher_is_worse=True):
+    """对 (切片 × 周次) KPI矩阵一次性应用四类异常规则, 返回命中明细表
+
+    - jump:     本周值 > 上周值 × jump_ratio
+    - zscore:   相对同切片其余周次(留一)的z值 ≥ z_threshold
+    - run:      连续 run_weeks 周及以上恶化 (在连续段的末周记录一次)
+    - reversal: 连续 reversal_weeks 周改善后本周转为恶化, 且本周值 > 上周值 × reversal_ratio
+
+    返回列: 切片维度列, week, rule, value, reference, severity;
+    severity 为超出阈值的倍数(≥1), 各规则间可比。
+    """
+    if not isinstance(matrix, pd.DataFrame):
+        matrix = pd.DataFrame(np.atleast_2d(np.asarray(matrix, dtype=float)))
+
+    values = matrix.to_numpy(dtype=float)
+    weeks = np.asarray(matrix.columns)
+    sign = 1.0 if higher_is_worse else -1.0
+    hits = []
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        previous, current = values[:, :-1], values[:, 1:]
+        worsening = sign * (current - previous)
+
+        # 单周突增 (仅对正值基数; ratio 为恶化方向的环比倍数)
+        ratio = current / previous
+        if not higher_is_worse:
+            ratio = previous / current
+        jump = (previous > 0) & (current > 0) & (ratio > jump_ratio)
+        hits.append(('jump', jump, 1, current, previous, ratio / jump_ratio))
+
+        # 留一z值: 与同切片其余有效周次的均值/标准差比较
+        valid = ~np.isnan(values)
+        filled = np.where(valid, values, 0.0)
+        n = valid.sum(axis=1, keepdims=True)
+        loo_n = n - 1
+        loo_mean = (filled.sum(axis=1, keepdims=True) - filled) / loo_n
+        loo_var = ((filled ** 2).sum(axis=1, keepdims=True) - filled ** 2) / loo_n - loo_mean ** 2
+        z = sign * (values - loo_mean) / np.sqrt(np.clip(loo_var, 0, None))
+        outlier = valid & (loo_n >= 2) & (loo_var > 0) & (z >= z_threshold)
+        hits.append(('zscore', outlier, 0, values, loo_mean, z / z_threshold))
+
+        # 连续恶化: 在连续段末周记录
+        rising = worsening > 0
+        runs = _run_lengths(rising)
+        run_end = rising & ~np.concatenate([rising[:, 1:], np.zeros((len(values), 1), bool)], axis=1)
+        run_hit = run_end & (runs + 1 >= run_weeks)
+        start = np.clip(np.arange(rising.shape[1])[np.newaxis, :] - runs + 1, 0, rising.shape[1] - 1)
+        run_start_value = np.take_along_axis(previous, start, axis=1)
+        hits.append(('run', run_hit, 1, current, run_start_value, (runs + 1) / run_weeks))
+
+        # 趋势反转: 此前连续改善, 本周转为恶化
+        improving_runs = _run_lengths(worsening < 0)
+        prior_improving = np.concatenate(
+            [np.zeros((len(values), 1), int), improving_runs[:, :-1]], axis=1
+        )
+        reversal = (prior_improving >= reversal_weeks) & (previous > 0) & (current > 0) & (ratio > reversal_ratio)
+        hits.append(('reversal', reversal, 1, current, previous, ratio / reversal_ratio))
+
+    index_frame = matrix.index.to_frame(index=False)
+    tables = []
+    for rule, mask, offset, value, reference, severity in hits:
+        rows, cols = np.nonzero(mask)
+        if len(rows) == 0:
+            continue
+
+        table = index_frame.iloc[rows].reset_index(drop=True)
+        table['week'] = weeks[cols + offset]
+        table['rule'] = rule
+        table['value'] = value[rows, cols]
+        table['reference'] = reference[rows, cols]
+        table['severity'] = severity[rows, cols]
+        tables.append(table)
+
+    columns = list(index_frame.columns) + ['week', 'rule', 'value', 'reference', 'severity']
+    if not tables:
+        return pd.DataFrame(columns=columns)
+
+    return pd.concat(tables, ignore_index=True)[columns]
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+赔付率变动因素分解 - 单元测试 (python -m pytest -q)
+"""
+
+import pandas as pd
+
+from kpi_cube import build_cube
+from loss_decomposition import EFFECT_COLUMNS, attribute_window, decompose_loss_ratio
+
+BY = ['third_level_organization']
+
+
+def _cube(claims, payments):
+    """单周立方体 (机构A、B, 保费与保单件数不变)"""
+    return build_cube(pd.DataFrame({
+        'third_level_organization': ['A', 'B'],
+        'signed_premium_yuan': [100.0, 100.0],
+        'matured_premium_yuan': [100.0, 100.0],
+        'reported_claim_payment_yuan': payments,
+        'expense_amount_yuan': [1.0, 1.0],
+        'claim_case_count': claims,
+        'policy_count': [10.0, 10.0],
+    }))
+
+
+def _window():
+    # A 第43周无赔案 → 不可分解; B 两周均可分解
+    cubes = {43: _cube([0.0, 2.0], [0.0, 50.0]), 44: _cube([1.0, 3.0], [30.0, 80.0])}
+    return attribute_window(decompose_loss_ratio(cubes, BY), BY).set_index('third_level_organization')
+
+
+def test_non_decomposable_slice_keeps_nan():
+    """全部周对不可分解: 效应与主导因素为NaN, 变动全部在残差中"""
+    row = _window().loc['A']
+    assert row[EFFECT_COLUMNS].isna().all()
+    assert pd.isna(row['main_driver'])
+    assert row['residual'] == row['delta'] == 30.0
+
+
+def test_decomposable_slice_effects_sum_to_delta():
+    row = _window().loc['B']
+    assert abs(row[EFFECT_COLUMNS].sum() - row['delta']) < 1e-9
+    assert row['main_driver'] == '出险频度'
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+评级配置与阶段缓存 - 单元测试 (python -m pytest -q)
+
+修改《率值指标区间状态值配置.md》的区间后, 调用评级器的阶段须重新计算。
+"""
+
+import shutil
+import sys
+from pathlib import Path
+
+import generate_report_v2
+import kpi_grading
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+from generate_synthetic_data import generate_dataset  # noqa: E402
+
+GRADED_STAGES = ('global_kpis', 'trend_kpis', 'trend_report')
+
+
+def _run(data_folder, output_folder, capsys):
+    assert generate_report_v2.main(end_week=44, lookback_weeks=2, data_folder=data_folder,
+                                   output_folder=output_folder, enable_truck=False, enable_yoy=False)
+    return capsys.readouterr().out
+
+
+def test_grade_config_change_recomputes_graded_stages(tmp_path, monkeypatch, capsys):
+    generate_dataset(tmp_path / "data", rows=2000, start_week=42, end_week=44)
+    config = tmp_path / kpi_grading.GRADE_CONFIG_PATH.name
+    shutil.copyfile(kpi_grading.GRADE_CONFIG_PATH, config)
+    monkeypatch.setattr(kpi_grading, 'GRADE_CONFIG_PATH', config)
+    monkeypatch.chdir(tmp_path)
+
+    _run(tmp_path / "data", tmp_path / "out", capsys)
+    unchanged = _run(tmp_path / "data", tmp_path / "out", capsys)
+    assert "♻️  复用阶段结果: trend_report" in unchanged
+    assert "♻️  复用阶段结果: global_kpis" in unchanged
+
+    # 满期赔付率卓越/健康分界 50% → 30%
+    text = config.read_text(encoding='utf-8')
+    config.write_text(text.replace("| < 50% |", "| < 30% |").replace("| 50-60% |", "| 30-60% |"), encoding='utf-8')
+    assert kpi_grading.load_grader().scale('loss_ratio').bounds[0] == 30
+
+    regraded = _run(tmp_path / "data", tmp_path / "out", capsys)
+    for stage in GRADED_STAGES:
+        assert f"⚙️  执行阶段: {stage}" in regraded
+    assert "♻️  复用阶段结果: weekly_data" in regraded
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+保单年度同比对比 - 单元测试 (python -m pytest -q)
+"""
+
+import pandas as pd
+
+from kpi_cube import build_cube
+from yoy_comparison import stack_years, yoy_compare
+
+
+def _detail(year, premium):
+    """单周明细 (两个机构)"""
+    return pd.DataFrame({
+        'policy_year': [year, year],
+        'third_level_organization': ['达州', '乐山'],
+        'business_type_category': ['非营业客车', '营业货车'],
+        'coverage_type': ['主全', '交三'],
+        'is_new_energy_vehicle': [False, True],
+        'renewal_status': ['续保', '新保'],
+        'signed_premium_yuan': [premium, premium * 2],
+        'matured_premium_yuan': [premium, premium * 2],
+        'reported_claim_payment_yuan': [premium / 2, premium],
+        'expense_amount_yuan': [premium / 10, premium / 5],
+        'claim_case_count': [1.0, 2.0],
+        'policy_count': [1.0, 1.0],
+    })
+
+
+def _weekly_data(years):
+    return {year: {'cube': {44: build_cube(_detail(year, 1000.0 * (index + 1)))}}
+            for index, year in enumerate(years)}
+
+
+def test_single_policy_year_returns_empty():
+    """仅一个保单年度时不生成同比表 (报告阶段据此跳过同比对比)"""
+    comparison = yoy_compare(stack_years(_weekly_data(['2025'])))
+    assert len(comparison) == 0
+
+
+def test_missing_requested_previous_year_returns_empty():
+    comparison = yoy_compare(stack_years(_weekly_data(['2024', '2025'])), previous_year='2023')
+    assert len(comparison) == 0
+
+
+def test_two_policy_years_align():
+    comparison = yoy_compare(stack_years(_weekly_data(['2024', '2025'])))
+    assert comparison.attrs == {'current_year': '2025', 'previous_year': '2024'}
+
+    total = comparison[comparison['grain'] == '合计'].iloc[0]
+    assert total['满期保费_本期'] == 0.6
+    assert total['满期保费_同期'] == 0.3
+    assert round(total['满期保费_同比'], 6) == 100.0
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+车险周报命令行入口
+
+用法:
+    python weekly_report.py weekly --week 44
+    python weekly_report.py trend --end-week 44 --lookback 5 --workers 4
+    python weekly_report.py trend --end-week 44 --org-reports --report-workers 4
+    python weekly_report.py truck --start-week 28 --end-week 43 [--operating]
+    python weekly_report.py truck --operating --chart-format png svg --chart-workers 2
+    python weekly_report.py backfill --data-folder .
+
+参数解析与校验只依赖标准库; pandas/numpy/matplotlib 等随子命令按需导入,
+--help 与参数错误可立即返回。trend 在导入 generate_report_v2 之前先比对运行戳
+(参数 + 明细表 + 代码 + 输出文件): 全部未变时直接返回, 不导入 pandas。
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+
+MIN_WEEK = 1
+MAX_WEEK = 53
+
+# trend 运行戳 (按输出目录记录)
+RUN_STAMP_PATH = Path(".cache") / "trend_runs.json"
+DETAIL_FILE_PATTERN = "*保单第*周变动成本明细表.csv"
+# 运行时读取的配置文件 (与代码一同参与运行戳)
+RUN_CONFIG_FILES = ("率值指标区间状态值配置.md",)
+
+# 分报告切片维度
+ORG_REPORT_DIMENSIONS = {
+    'org': ('third_level_organization',),
+    'org-business': ('third_level_organization', 'business_type_category'),
+}
+
+# =======================================
+# 参数校验
+# =======================================
+
+def week_number(value):
+    """周次参数 (1-53)"""
+    try:
+        week = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"周次须为整数: {value}")
+
+    if not MIN_WEEK <= week <= MAX_WEEK:
+        raise argparse.ArgumentTypeError(f"周次须在{MIN_WEEK}-{MAX_WEEK}之间: {week}")
+    return week
+
+
+def positive_int(value):
+    """正整数参数"""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"须为正整数: {value}")
+
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"须为正整数: {value}")
+    return number
+
+
+def existing_folder(value):
+    """已存在的目录"""
+    path = Path(value)
+    if not path.is_dir():
+        raise argparse.ArgumentTypeError(f"目录不存在: {value}")
+    return path
+
+
+def validate_week_range(parser, args):
+    """起止周次顺序校验"""
+    if args.start_week is not None and args.end_week is not None and args.start_week > args.end_week:
+        parser.error(f"起始周({args.start_week})晚于结束周({args.end_week})")
+
+# =======================================
+# trend 运行戳
+# =======================================
+
+def _file_stamp(path):
+    stat = path.stat()
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _output_stamps(output_folder):
+    """输出目录内各文件的大小与修改时间 (运行记录除外)"""
+    output_folder = Path(output_folder)
+    if not output_folder.is_dir():
+        return {}
+    return {
+        str(path.relative_to(output_folder)): _file_stamp(path)
+        for path in sorted(output_folder.rglob("*"))
+        if path.is_file() and not path.name.startswith("运行记录")
+    }
+
+
+def trend_run_stamp(args):
+    """trend 输入摘要: 参数 + 明细表(大小/修改时间) + 代码与配置文件内容"""
+    params = {key: str(value) if isinstance(value, Path) else value
+              for key, value in sorted(vars(args).items()) if key not in ("handler", "metrics_table")}
+    params["data_folder"] = str(Path(args.data_folder).resolve())
+
+    code_folder = Path(__file__).resolve().parent
+    code = hashlib.sha1()
+    for path in sorted(code_folder.glob("*.py")) + [code_folder / name for name in RUN_CONFIG_FILES]:
+        if path.exists():
+            code.update(path.name.encode("utf-8"))
+            code.update(path.read_bytes())
+
+    payload = {
+        "params": params,
+        "inputs": {path.name: _file_stamp(path) for path in sorted(Path(args.data_folder).glob(DETAIL_FILE_PATTERN))},
+        "code": code.hexdigest()
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+
+def _load_run_stamps():
+    try:
+        with open(RUN_STAMP_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def trend_is_current(args, stamp):
+    """上次成功运行的输入摘要一致, 且输出文件未被改动或删除"""
+    record = _load_run_stamps().get(str(Path(args.output_folder).resolve()))
+    return (record is not None and record["stamp"] == stamp
+            and record["outputs"] == _output_stamps(args.output_folder))
+
+
+def save_trend_run(args, stamp):
+    """记录本次成功运行的输入摘要与输出文件"""
+    stamps = _load_run_stamps()
+    stamps[str(Path(args.output_folder).resolve())] = {
+        "stamp": stamp,
+        "outputs": _output_stamps(args.output_folder)
+    }
+    RUN_STAMP_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = RUN_STAMP_PATH.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(stamps, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, RUN_STAMP_PATH)
+
+# =======================================
+# 子命令
+# =======================================
+
+def run_weekly(args):
+    """单周经营周报 (generate_report)"""
+    import generate_report
+
+    generate_report.main(args.week, args.data_folder, args.output_folder, metrics_table=args.metrics_table,
+                         use_report_manifest=not args.full_rewrite)
+    return True
+
+
+def run_trend(args):
+    """趋势追踪报告 (generate_report_v2); 输入、代码与输出均未变时直接返回"""
+    # 要求全部重算/重写时不比对运行戳
+    use_stamp = not (args.no_pipeline_cache or args.full_rewrite)
+    stamp = trend_run_stamp(args) if use_stamp else None
+    if use_stamp and trend_is_current(args, stamp):
+        print(f"✅ 参数、明细表与代码均未变, 报告已是最新: {Path(args.output_folder).absolute()}")
+        return True
+
+    import generate_report_v2
+
+    success = generate_report_v2.main(
+        start_week=args.start_week,
+        end_week=args.end_week,
+        lookback_weeks=args.lookback,
+        data_folder=args.data_folder,
+        output_folder=args.output_folder,
+        workers=args.workers,
+        enable_trend=not args.no_trend,
+        enable_truck=not args.no_truck,
+        use_cache=not args.no_cache,
+        use_warehouse=not args.no_warehouse,
+        use_pipeline_cache=not args.no_pipeline_cache,
+        metrics_table=args.metrics_table,
+        enable_yoy=not args.no_yoy,
+        enable_org_reports=args.org_reports is not None,
+        org_report_by=ORG_REPORT_DIMENSIONS[args.org_reports or 'org'],
+        report_workers=args.report_workers,
+        use_report_manifest=not args.full_rewrite,
+        streaming=args.streaming
+    )
+    if success and use_stamp:
+        save_trend_run(args, stamp)
+    return success
+
+
+def run_truck(args):
+    """新能源货车专项分析"""
+    if args.operating:
+        import new_energy_truck_analysis
+
+        analyzer = new_energy_truck_analysis.NewEnergyTruckAnalyzer(
+            data_folder=args.data_folder or new_energy_truck_analysis.DATA_FOLDER,
+            start_week=args.start_week or new_energy_truck_analysis.START_WEEK,
+            end_week=args.end_week or new_energy_truck_analysis.END_WEEK,
+            output_folder=args.output_folder or new_energy_truck_analysis.OUTPUT_FOLDER,
+            metrics_table=args.metrics_table,
+            chart_formats=args.chart_format or new_energy_truck_analysis.CHART_FORMATS,
+            chart_workers=args.chart_workers or new_energy_truck_analysis.CHART_WORKERS,
+            use_chart_cache=not args.no_chart_cache
+        )
+        return analyzer.run_analysis()
+
+    import analyze_new_energy_trucks
+
+    return analyze_new_energy_trucks.main(
+        start_week=args.start_week,
+        end_week=args.end_week,
+        data_folder=args.data_folder,
+        output_folder=args.output_folder,
+        workers=args.workers,
+        metrics_table=args.metrics_table
+    )
+
+
+def run_backfill(args):
+    """历史周次增量入库 (数据仓库)"""
+    from generate_report_v2 import InsuranceDataLoaderV2
+
+    loader = InsuranceDataLoaderV2(args.data_folder, use_warehouse=True)
+    ingested = loader.sync_warehouse()
+    weeks = loader.detect_available_weeks()
+
+    print(f"✅ 本次入库 {len(ingested)} 个文件, 仓库共 {len(weeks)} 周: {weeks}")
+    return True
+
+# =======================================
+# 参数定义
+# =======================================
+
+def build_parser():
+    """构建命令行解析器"""
+    parser = argparse.ArgumentParser(
+        prog="weekly-report",
+        description="车险周报生成工具"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    # 各报告子命令共用: 实时阶段指标表
+    metrics = argparse.ArgumentParser(add_help=False)
+    metrics.add_argument("--metrics-table", action="store_true", help="实时打印各阶段耗时/内存表")
+
+    # weekly/trend 共用: 章节清单 (默认只重写变化的章节与报告)
+    rewrite = argparse.ArgumentParser(add_help=False)
+    rewrite.add_argument("--full-rewrite", action="store_true", help="忽略章节清单, 全部重新渲染并重写")
+
+    # weekly: 单周经营周报
+    weekly = subparsers.add_parser("weekly", parents=[metrics, rewrite], help="生成单周经营周报 (2024/2025保单)")
+    weekly.add_argument("--week", type=week_number, default=44, help="目标周次 (默认44)")
+    weekly.add_argument("--data-folder", type=existing_folder, default=Path("."), help="明细表目录")
+    weekly.add_argument("--output-folder", type=Path, default=Path("周报"), help="输出目录")
+    weekly.set_defaults(handler=run_weekly)
+
+    # trend: V2趋势追踪报告
+    trend = subparsers.add_parser("trend", parents=[metrics, rewrite], help="生成趋势追踪报告 (V2)")
+    trend.add_argument("--start-week", type=week_number, help="起始周 (默认自动推断)")
+    trend.add_argument("--end-week", type=week_number, help="结束周 (默认最新可用周)")
+    trend.add_argument("--lookback", type=positive_int, default=5, help="回溯周数 (默认5)")
+    trend.add_argument("--data-folder", type=existing_folder, default=Path("."), help="明细表目录")
+    trend.add_argument("--output-folder", type=Path, default=Path("周报"), help="输出目录")
+    trend.add_argument("--workers", type=positive_int, default=1, help="并行加载进程数")
+    trend.add_argument("--no-trend", action="store_true", help="关闭趋势追踪")
+    trend.add_argument("--no-truck", action="store_true", help="关闭新能源货车分析")
+    trend.add_argument("--no-yoy", action="store_true", help="关闭保单年度同比对比")
+    trend.add_argument("--org-reports", nargs="?", const="org", choices=sorted(ORG_REPORT_DIMENSIONS),
+                       help="按切片扇出分报告: org = 每个三级机构, org-business = 机构×业务类型")
+    trend.add_argument("--report-workers", type=positive_int, default=1, help="分报告渲染进程数")
+    trend.add_argument("--streaming", action="store_true",
+                       help="流式分块加载 (超大明细表逐块汇入立方体, 不经列式缓存与数据仓库)")
+    trend.add_argument("--no-cache", action="store_true", help="关闭列式缓存")
+    trend.add_argument("--no-warehouse", action="store_true", help="关闭周度数据仓库")
+    trend.add_argument("--no-pipeline-cache", action="store_true", help="忽略阶段结果缓存, 全部重算")
+    trend.set_defaults(handler=run_trend)
+
+    # truck: 新能源货车专项
+    truck = subparsers.add_parser("truck", parents=[metrics], help="新能源货车专项分析")
+    truck.add_argument("--start-week", type=week_number, help="起始周 (默认28)")
+    truck.add_argument("--end-week", type=week_number, help="结束周 (默认43)")
+    truck.add_argument("--data-folder", type=existing_folder, help="明细表目录 (默认 2025年保单)")
+    truck.add_argument("--output-folder", type=Path, help="输出目录")
+    truck.add_argument("--workers", type=positive_int, help="并行加载进程数")
+    truck.add_argument("--operating", action="store_true",
+                       help="营业货车口径 (customer_category_3=营业货车, 含图表)")
+    truck.add_argument("--chart-format", nargs="+", choices=["png", "svg"],
+                       help="图表格式 (营业货车口径, 默认png; svg为矢量图并嵌入报告)")
+    truck.add_argument("--chart-workers", type=positive_int, help="图表绘制进程数 (营业货车口径)")
+    truck.add_argument("--no-chart-cache", action="store_true", help="忽略图表缓存, 全部重新绘制")
+    truck.set_defaults(handler=run_truck)
+
+    # backfill: 数据仓库入库
+    backfill = subparsers.add_parser("backfill", help="将明细表增量入库到周度数据仓库")
+    backfill.add_argument("--data-folder", type=existing_folder, default=Path("."), help="明细表目录")
+    backfill.set_defaults(handler=run_backfill)
+
+    return parser
+
+
+def main(argv=None):
+    """命令行主函数, 返回退出码"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if hasattr(args, "start_week"):
+        validate_week_range(parser, args)
+
+    success = args.handler(args)
+    return 0 if success is not False else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+周度数据仓库 - 增量入库
+
+目录结构:
+    {root}/catalog.json                      目录(周次 → 源文件绝对路径 → 内容哈希/行数/分区)
+    {root}/week={N}/{源文件名}-{路径哈希}.parquet  单周单文件分区 (无pyarrow时为.pkl)
+
+新周次文件仅在首次出现(或内容变更)时解析入库一次, 之后各次运行直接读取分区。
+仓库可被多个数据目录共用: 目录项以源文件绝对路径为键, 读取时只取当前数据目录的分区;
+源文件已删除(或改名)的目录项在入库时一并清除。
+"""
+
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+
+from data_io import concat_frames, file_digest, read_frame, read_week_file, write_frame
+from data_schema import SCHEMA_VERSION, exclude_headquarters
+from pipeline import source_fingerprint
+
+DETAIL_FILE_PATTERN = "*保单第*周变动成本明细表.csv"
+
+
+class WeeklyWarehouse:
+    """周度数据仓库 - 按周分区存储预处理后的明细 (按数据目录隔离)"""
+
+    def __init__(self, root, data_folder="."):
+        self.root = Path(root)
+        self.data_folder = Path(data_folder).resolve()
+        self.catalog_path = self.root / "catalog.json"
+        self.catalog = self._load_catalog()
+
+    def _layout(self, transform=None):
+        """分区口径标识 (字段规范、读取或预处理代码变更时全部重建)"""
+        transform_name = getattr(transform, '__qualname__', 'none')
+        code = source_fingerprint([read_week_file] + ([transform] if transform is not None else []))
+        return f"schema-v{SCHEMA_VERSION}|{transform_name}|{code[:12]}"
+
+    def _load_catalog(self):
+        """加载目录"""
+        try:
+            with open(self.catalog_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'layout': None, 'weeks': {}}
+
+    def _save_catalog(self):
+        """原子写入目录"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.catalog_path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.catalog, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.catalog_path)
+
+    def _in_scope(self, source):
+        """目录项的源文件是否位于当前数据目录"""
+        return Path(source).parent == self.data_folder
+
+    def _scoped_entries(self, week):
+        """当前数据目录中单周的目录项 {源文件名: 目录项}"""
+        entries = self.catalog['weeks'].get(str(week), {})
+        return {Path(source).name: entry for source, entry in entries.items() if self._in_scope(source)}
+
+    def _drop_partition(self, entry):
+        for suffix in ('.parquet', '.pkl'):
+            (self.root / entry['partition']).with_suffix(suffix).unlink(missing_ok=True)
+
+    def _prune(self):
+        """清除源文件已不存在的目录项及其分区; 返回清除的(周次, 源文件)列表"""
+        removed = []
+        for week, entries in self.catalog['weeks'].items():
+            for source in [source for source in entries if not Path(source).exists()]:
+                self._drop_partition(entries.pop(source))
+                removed.append((int(week), source))
+        self.catalog['weeks'] = {week: entries for week, entries in self.catalog['weeks'].items() if entries}
+        return removed
+
+    def sync(self, transform=None, pattern=DETAIL_FILE_PATTERN):
+        """扫描数据目录, 仅入库新增或内容变更的文件; 返回入库的(周次, 文件名)列表
+
+        transform 为入库前的单周预处理函数(如 InsuranceDataLoaderV2.preprocess_frame)。
+        """
+        layout = self._layout(transform)
+        if self.catalog.get('layout') != layout:
+            self.catalog = {'layout': layout, 'weeks': {}}
+
+        for week, source in self._prune():
+            print(f"🗑️ 移出第{week}周: {source} (源文件已不存在)")
+
+        ingested = []
+        for csv_file in sorted(self.data_folder.glob(pattern)):
+            match = re.search(r'第(\d+)周', csv_file.name)
+            if not match:
+                continue
+
+            week = int(match.group(1))
+            source = str(csv_file)
+            week_entries = self.catalog['weeks'].setdefault(str(week), {})
+            entry = week_entries.get(source)
+
+            stat = csv_file.stat()
+            stamp = f"{stat.st_size}:{stat.st_mtime_ns}"
+            if entry and entry['stamp'] == stamp:
+                continue
+
+            digest = file_digest(csv_file)
+            if entry and entry['digest'] == digest:
+                entry['stamp'] = stamp
+                continue
+
+            df = self._read_source(csv_file, week, transform)
+            # 不同数据目录的同名文件各自分区
+            source_hash = hashlib.sha1(source.encode('utf-8')).hexdigest()[:8]
+            partition = Path(f"week={week}") / f"{csv_file.stem}-{source_hash}"
+            written = write_frame(df, self.root / partition)
+
+            week_entries[source] = {
+                'stamp': stamp,
+                'digest': digest,
+                'rows': len(df),
+                'partition': str(written.relative_to(self.root))
+            }
+            ingested.append((week, csv_file.name))
+
+        self._save_catalog()
+        return ingested
+
+    def _read_source(self, csv_file, week, transform):
+        """解析单个源文件 (剔除本部, 补充周次与来源列)"""
+        df = read_week_file(csv_file, week, predicates=(exclude_headquarters,))
+        if transform is not None:
+            df = transform(df)
+        return df
+
+    def available_weeks(self):
+        """当前数据目录已入库的周次"""
+        return sorted(int(week) for week in self.catalog['weeks'] if self._scoped_entries(week))
+
+    def week_digests(self, week):
+        """单周各源文件内容哈希 (用于下游指纹)"""
+        entries = self._scoped_entries(week)
+        return {name: entry['digest'] for name, entry in sorted(entries.items())}
+
+    def load_week(self, week):
+        """读取当前数据目录的单周全部分区, 无数据时返回None"""
+        entries = self._scoped_entries(week)
+        frames = []
+        for name in sorted(entries):
+            partition = self.root / entries[name]['partition']
+            df = read_frame(partition.with_suffix(''))
+            if df is not None:
+                frames.append(df)
+
+        if not frames:
+            return None
+        return concat_frames(frames)
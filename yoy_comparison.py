@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+保单年度同比对比
+
+各年度的周立方体已在加载阶段构建 (kpi_cube.build_cube), 此处直接复用:
+全部年度、全部周次堆叠为一张长表, 在各下钻粒度上汇总后按 (粒度, 维度, 周次)
+与上一保单年度一次外连接对齐, 整列计算全部KPI的本期值、同期值与同比变动。
+"""
+
+import numpy as np
+import pandas as pd
+
+from kpi_cube import rollup, stack_cubes
+from report_templates import render_sections
+
+YEAR = 'policy_year'
+WEEK = 'week'
+GRAIN = 'grain'
+
+# 对比粒度: 名称 → 维度 (沿机构 → 能源类型 → 业务类型 → 险别 的下钻路径)
+YOY_GRAINS = {
+    '合计': (),
+    '机构': ('third_level_organization',),
+    '机构×能源类型': ('third_level_organization', 'is_new_energy_vehicle'),
+    '机构×业务类型': ('third_level_organization', 'business_type_category'),
+    '机构×业务类型×险别': ('third_level_organization', 'business_type_category', 'coverage_type'),
+    '业务类型': ('business_type_category',),
+    '险别': ('coverage_type',),
+    '新转续': ('renewal_status',),
+}
+
+# 粒度中未参与的维度取值
+ALL_MEMBERS = '全部'
+
+# 比率类KPI的同比为百分点差, 其余为增长率(%)
+RATIO_KPIS = ['满期赔付率', '费用率', '变动成本率', '满期边际贡献率', '出险率']
+AMOUNT_KPIS = ['签单保费', '满期保费', '已报告赔款', '费用总额', '保单件数', '赔案件数', '案均赔款', '单均保费']
+
+CURRENT_SUFFIX = '本期'
+PREVIOUS_SUFFIX = '同期'
+CHANGE_SUFFIX = '同比'
+
+
+def grain_dimensions(grains=YOY_GRAINS):
+    """各粒度涉及的全部维度 (保持首次出现顺序)"""
+    dims = []
+    for grain_dims in grains.values():
+        dims.extend(dim for dim in grain_dims if dim not in dims)
+    return dims
+
+
+def stack_years(weekly_data):
+    """{年度: {'cube': {周次: 立方体}}} → 带年度与周次列的长表立方体"""
+    frames = []
+    for year, year_data in sorted(weekly_data.items()):
+        cubes = year_data.get('cube') or {}
+        if not cubes:
+            continue
+        frame = stack_cubes(cubes, WEEK)
+        frame[YEAR] = year
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def kpi_frame(sums):
+    """可加指标汇总表 → KPI表 (整列计算, 分母不为正时记为NaN)"""
+    def ratio(numerator, denominator, scale=100.0):
+        base = sums[denominator]
+        return sums[numerator] / base.where(base > 0) * scale
+
+    kpis = pd.DataFrame(index=sums.index)
+    kpis['签单保费'] = sums['signed_premium_yuan'] / 10000
+    kpis['满期保费'] = sums['matured_premium_yuan'] / 10000
+    kpis['已报告赔款'] = sums['reported_claim_payment_yuan'] / 10000
+    kpis['费用总额'] = sums['expense_amount_yuan'] / 10000
+    kpis['保单件数'] = sums['policy_count']
+    kpis['赔案件数'] = sums['claim_case_count']
+    kpis['满期赔付率'] = ratio('reported_claim_payment_yuan', 'matured_premium_yuan')
+    kpis['费用率'] = ratio('expense_amount_yuan', 'signed_premium_yuan')
+    kpis['变动成本率'] = kpis['满期赔付率'] + kpis['费用率']
+    kpis['满期边际贡献率'] = 100 - kpis['变动成本率']
+    kpis['出险率'] = ratio('claim_case_count', 'policy_count')
+    kpis['案均赔款'] = ratio('reported_claim_payment_yuan', 'claim_case_count', scale=1.0)
+    kpis['单均保费'] = ratio('signed_premium_yuan', 'policy_count', scale=1.0)
+    return kpis
+
+
+def grain_sums(stacked, grains=YOY_GRAINS):
+    """各粒度 × 周次 × 年度的可加指标汇总, 纵向拼接为一张表 (未参与的维度记为'全部')"""
+    all_dims = grain_dimensions(grains)
+    frames = []
+    for name, dims in grains.items():
+        sums = rollup(stacked, list(dims) + [WEEK, YEAR])
+        for dim in all_dims:
+            if dim not in dims:
+                sums[dim] = ALL_MEMBERS
+        sums[GRAIN] = name
+        frames.append(sums)
+    return pd.concat(frames, ignore_index=True)
+
+
+def yoy_compare(stacked, current_year=None, previous_year=None, grains=YOY_GRAINS):
+    """同比对比表: 每行为 (粒度, 维度取值, 周次), 每个KPI含 本期/同期/同比 三列
+
+    current_year 默认取最新保单年度, previous_year 默认取其上一年度;
+    仅一方存在的组合另一方记为NaN (同比亦为NaN)。
+    两个年度任一方无数据 (如仅有一个保单年度) 时返回空表。
+    """
+    if len(stacked) == 0:
+        return pd.DataFrame()
+
+    years = sorted(stacked[YEAR].dropna().astype(str).unique())
+    current_year = str(current_year or years[-1])
+    previous_year = str(previous_year or int(current_year) - 1)
+    if current_year not in years or previous_year not in years:
+        return pd.DataFrame()
+
+    keys = [GRAIN] + grain_dimensions(grains) + [WEEK]
+    sums = grain_sums(stacked[stacked[YEAR].astype(str).isin([current_year, previous_year])], grains)
+    sums[keys[1:-1]] = sums[keys[1:-1]].astype(object).fillna('未知')
+
+    is_current = sums[YEAR].astype(str) == current_year
+    current = kpi_frame(sums[is_current].set_index(keys))
+    previous = kpi_frame(sums[~is_current].set_index(keys))
+
+    # 一次外连接对齐全部粒度与周次
+    aligned = current.join(previous, how='outer', lsuffix=f'_{CURRENT_SUFFIX}', rsuffix=f'_{PREVIOUS_SUFFIX}')
+
+    columns = {}
+    for kpi in current.columns:
+        now = aligned[f'{kpi}_{CURRENT_SUFFIX}']
+        before = aligned[f'{kpi}_{PREVIOUS_SUFFIX}']
+        if kpi in RATIO_KPIS:
+            change = now - before
+        else:
+            change = (now / before.where(before != 0) - 1) * 100
+        columns[f'{kpi}_{CURRENT_SUFFIX}'] = now
+        columns[f'{kpi}_{PREVIOUS_SUFFIX}'] = before
+        columns[f'{kpi}_{CHANGE_SUFFIX}'] = change
+
+    comparison = pd.DataFrame(columns, index=aligned.index).reset_index()
+    comparison.attrs.update({'current_year': current_year, 'previous_year': previous_year})
+
+    # 按粒度配置顺序排列
+    order = pd.Categorical(comparison[GRAIN], categories=list(grains), ordered=True)
+    return comparison.iloc[np.lexsort((comparison[WEEK].to_numpy(), order.codes))].reset_index(drop=True)
+
+
+# 同比摘要模板
+YOY_TEMPLATES = {
+    'summary': """# {current_year}保单 vs {previous_year}保单 同比对比 (第{week}周累计)
+
+> 同一报告周次下两个保单年度按相同维度对齐; 比率类指标同比为百分点(pp), 规模类指标同比为增长率(%)。
+
+## 整体
+
+| 指标 | {current_year}保单 | {previous_year}保单 | 同比 |
+|------|------|------|------|
+{% for row in total %}
+| {row[kpi]} | {row[current]} | {row[previous]} | {row[change]} |
+{% endfor %}
+{% if orgs %}
+
+## 各机构{org_kpi} (按同比变动降序)
+
+| 机构 | 满期保费(万元) | {current_year}保单 | {previous_year}保单 | 同比 |
+|------|------|------|------|------|
+{% for row in orgs %}
+| {row[org]} | {row[premium]} | {row[current]} | {row[previous]} | {row[change]} |
+{% endfor %}
+{% endif %}
+
+*完整对比 ({grain_count}个粒度 × {week_count}周, {row_count:,}行) 见同名CSV*
+""",
+}
+
+
+def _format_change(kpi, value):
+    """同比变动文本"""
+    if pd.isna(value):
+        return '-'
+    unit = 'pp' if kpi in RATIO_KPIS else '%'
+    return f"{value:+.1f}{unit}"
+
+
+def _format_value(kpi, value):
+    """本期/同期值文本"""
+    if pd.isna(value):
+        return '-'
+    if kpi in RATIO_KPIS:
+        return f"{value:.1f}%"
+    if kpi in ('保单件数', '赔案件数', '案均赔款', '单均保费'):
+        return f"{value:,.0f}"
+    return f"{value:,.2f}"
+
+
+def yoy_sections(comparison, week=None, kpis=('满期保费', '满期赔付率', '费用率', '满期边际贡献率', '出险率'),
+                 org_kpi='满期赔付率'):
+    """同比对比报告章节 [(模板名, 数据模型)] (最新周: 合计全部KPI + 各机构单一KPI)"""
+    if len(comparison) == 0:
+        return []
+
+    week = comparison[WEEK].max() if week is None else week
+    latest = comparison[comparison[WEEK] == week]
+
+    total = latest[latest[GRAIN] == '合计'].head(1).to_dict('records')
+    orgs = latest[latest[GRAIN] == '机构'].sort_values(f'{org_kpi}_{CHANGE_SUFFIX}', ascending=False,
+                                                       na_position='last', kind='stable')
+
+    model = {
+        'current_year': comparison.attrs.get('current_year', CURRENT_SUFFIX),
+        'previous_year': comparison.attrs.get('previous_year', PREVIOUS_SUFFIX),
+        'week': week,
+        'org_kpi': org_kpi,
+        'total': [
+            {
+                'kpi': kpi,
+                'current': _format_value(kpi, row[f'{kpi}_{CURRENT_SUFFIX}']),
+                'previous': _format_value(kpi, row[f'{kpi}_{PREVIOUS_SUFFIX}']),
+                'change': _format_change(kpi, row[f'{kpi}_{CHANGE_SUFFIX}'])
+            }
+            for row in total for kpi in kpis
+        ],
+        'orgs': [
+            {
+                'org': row['third_level_organization'],
+                'premium': _format_value('满期保费', row[f'满期保费_{CURRENT_SUFFIX}']),
+                'current': _format_value(org_kpi, row[f'{org_kpi}_{CURRENT_SUFFIX}']),
+                'previous': _format_value(org_kpi, row[f'{org_kpi}_{PREVIOUS_SUFFIX}']),
+                'change': _format_change(org_kpi, row[f'{org_kpi}_{CHANGE_SUFFIX}'])
+            }
+            for row in orgs.to_dict('records')
+        ],
+        'grain_count': comparison[GRAIN].nunique(),
+        'week_count': comparison[WEEK].nunique(),
+        'row_count': len(comparison)
+    }
+    return [('summary', model)]
+
+
+def yoy_markdown(comparison, week=None, **options):
+    """同比对比报告Markdown"""
+    return "".join(render_sections(YOY_TEMPLATES, yoy_sections(comparison, week, **options)))